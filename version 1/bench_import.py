@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+bench_import.py
+Benchmark of the importers on a synthetic capture (default 1,000,000 frames)
+
+Writes a capture with the frame mix of a live session (auction updates, new
+and deleted items, seller status, a few bad lines) and imports it into fresh
+databases three ways: the one-threaded importer, parallel_import and
+parallel_import --bulk. Everything happens in a temporary directory.
+"""
+
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import parallel_import
+
+AUCTIONS = 5000
+SELLERS = 500
+BIDDERS = 2000
+
+
+def write_capture(filename, frames, seed=1):
+    """Synthetic capture in capture_ws_cdp's format"""
+    rng = random.Random(seed)
+    state = {}
+    started = 1735689600
+    with open(filename, 'w', encoding='utf-8') as f:
+        for i in range(frames):
+            ts = started + i * 0.05
+            t = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts)) + f" (chrome_ts={ts:.6f})"
+            r = rng.random()
+            if r < 0.6:
+                updates = []
+                for _ in range(rng.randint(1, 3)):
+                    auction_id = rng.randint(1, AUCTIONS)
+                    bidder, bid, bids = state.get(auction_id, (None, 0, 0))
+                    if rng.random() < 0.7:
+                        bidder, bid, bids = rng.randint(1, BIDDERS), bid + rng.randint(1, 50), bids + 1
+                        state[auction_id] = (bidder, bid, bids)
+                    updates.append({
+                        "id": auction_id, "auction_highest_bid": bid, "auction_highest_bidder": bidder,
+                        "auction_number_of_bids": bids, "auction_ends_at": int(ts) + 180,
+                        "above_recommended_price": round(rng.uniform(-5, 15), 2),
+                    })
+                payload = '42["auction_update",' + json.dumps(updates, separators=(',', ':')) + ']'
+            elif r < 0.75:
+                item_id = rng.randint(1, AUCTIONS)
+                payload = ('42["new_item",[{"id":%d,"market_name":"Item %d","market_value":%d,'
+                           '"wear":0.%03d,"type":"Knife","item_search":{"category":"Knife","rarity":"Covert"}}]]'
+                           % (item_id, item_id % 700, rng.randint(100, 500000), rng.randint(0, 999)))
+            elif r < 0.85:
+                deleted = [rng.randint(1, AUCTIONS), rng.randint(1, AUCTIONS)]
+                payload = '42["deleted_item",' + json.dumps(deleted) + ']'
+                for item_id in deleted:
+                    state.pop(item_id, None)
+            elif r < 0.999:
+                payload = ('42["updated_seller_online_status",[{"deposit_id":%d,"current":%d}]]'
+                           % (rng.randint(1, SELLERS), rng.randint(0, 1)))
+            else:
+                payload = 'garbage"auction_update",[{bad'
+            f.write(json.dumps({"dir": "recv", "t": t, "requestId": "1234.5", "payload": payload}) + '\n')
+
+
+def timed(function, *args, **kwargs):
+    started = time.time()
+    with redirect_stdout(io.StringIO()):
+        function(*args, **kwargs)
+    return time.time() - started
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    mode = sys.argv[2] if len(sys.argv) > 2 else 'basic'
+    if mode == 'basic':
+        from create_csgoempire_db import create_database as create, parse_websocket_data as serial_import
+    else:
+        from robust_item_parser import create_enhanced_database as create, parse_robust_websocket_data as serial_import
+
+    # The importers use fixed database names in the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        capture = os.path.join(directory, 'capture.jsonl')
+        print(f"Writing {frames:,} synthetic frames...")
+        write_capture(capture, frames)
+        print(f"  {os.path.getsize(capture) / 1e6:,.0f} MB")
+
+        db_file = parallel_import.DB_FILES[mode]
+        runs = [
+            ('one-threaded importer', lambda: serial_import(capture)),
+            ('parallel_import', lambda: parallel_import.import_capture(capture, mode)),
+            ('parallel_import --bulk', lambda: parallel_import.import_capture(capture, mode, bulk=True)),
+        ]
+        results = []
+        for name, run in runs:
+            if os.path.exists(db_file):
+                os.remove(db_file)
+            with redirect_stdout(io.StringIO()):
+                create()
+            elapsed = timed(run)
+            conn = sqlite3.connect(db_file)
+            updates = conn.execute('SELECT COUNT(*) FROM auction_updates').fetchone()[0]
+            conn.close()
+            results.append(elapsed)
+            print(f"{name:<24} {elapsed:8.1f}s  {frames / elapsed:>9,.0f} frames/s  "
+                  f"{updates:,} auction updates  x{results[0] / elapsed:.1f}")
+        os.chdir(cwd)
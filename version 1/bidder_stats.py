@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Bidder Stats
+Shared by the monitors and importers: bidder totals from auction state transitions
+
+A bid counts when an auction_update changes the leader or raises the bid;
+repeated updates count nothing. total_spent grows by the final bid once per
+auction won (deleted with bids, or past its end time with a leader). Deltas
+are buffered in memory and written with one executemany per flush.
+Importers end auctions by the capture's clock (frame_seconds), not the
+wall clock, so an old capture does not close auctions still open in it.
+"""
+
+import time
+from datetime import datetime, timezone
+
+# Monitors flush buffered deltas at most this often
+FLUSH_SECONDS = 5
+
+UPSERT_SQL = '''
+    INSERT INTO bidders (bidder_id, total_bids, total_spent)
+    VALUES (?, ?, ?)
+    ON CONFLICT(bidder_id) DO UPDATE SET
+        last_seen = CASE WHEN excluded.total_bids > 0 THEN CURRENT_TIMESTAMP ELSE last_seen END,
+        total_bids = total_bids + excluded.total_bids,
+        total_spent = total_spent + excluded.total_spent
+'''
+
+# Importers resuming at a checkpoint carry open auctions over between runs
+OPEN_AUCTIONS_SQL = '''
+    CREATE TABLE IF NOT EXISTS bidder_open_auctions (
+        auction_id INTEGER PRIMARY KEY,
+        highest_bidder INTEGER,
+        highest_bid INTEGER,
+        number_of_bids INTEGER,
+        ends_at INTEGER
+    )
+'''
+
+
+def frame_seconds(timestamp):
+    """Epoch seconds of a capture "t" ('2024-01-01 12:00:00.000Z (chrome_ts=...)'); None if unparseable"""
+    try:
+        return datetime.strptime(timestamp[:23], '%Y-%m-%d %H:%M:%S.%f').replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class BidderStats:
+    """Leader of every open auction plus per-bidder [bids, spent] deltas"""
+
+    def __init__(self):
+        self.auctions = {}      # auction_id -> [bidder, bid, number_of_bids, ends_at]
+        self.deltas = {}        # bidder_id -> [bids, spent]
+        self.last_flush = time.time()
+
+    def _load(self, cursor, auction_id):
+        """Most advanced stored state of an auction (monitor restarts)"""
+        cursor.execute('''
+            SELECT highest_bidder, highest_bid, number_of_bids, ends_at
+            FROM auction_updates
+            WHERE auction_id = ?
+            ORDER BY number_of_bids DESC, highest_bid DESC
+            LIMIT 1
+        ''', (auction_id,))
+        row = cursor.fetchone()
+        return list(row) if row else None
+
+    def bid(self, auction_id, bidder, amount, number_of_bids, ends_at, cursor=None):
+        """Apply one auction_update (before it is stored); True if it counted as a bid
+
+        An auction without a bidder yet (auction_highest_bidder null) counts nothing.
+        """
+        if bidder is None:
+            return False
+        state = self.auctions.get(auction_id)
+        if state is None and cursor is not None:
+            state = self._load(cursor, auction_id)
+            if state is not None:
+                self.auctions[auction_id] = state
+
+        if state is not None:
+            if (number_of_bids or 0) < (state[2] or 0) or (amount or 0) < (state[1] or 0):
+                return False
+            if [bidder, amount, number_of_bids] == state[:3]:
+                return False
+
+        self.deltas.setdefault(bidder, [0, 0])[0] += 1
+        self.auctions[auction_id] = [bidder, amount, number_of_bids, ends_at]
+        return True
+
+    def won(self, auction_id):
+        """Auction left the market with a leader - credit the winning bid"""
+        state = self.auctions.pop(auction_id, None)
+        if state is not None and state[0] is not None:
+            self.deltas.setdefault(state[0], [0, 0])[1] += state[1] or 0
+
+    def end_auctions(self, now_seconds):
+        """Credit every auction whose end time has passed (nothing without a time)"""
+        if now_seconds is None:
+            return
+        for auction_id in [a for a, s in self.auctions.items() if s[3] and s[3] <= now_seconds]:
+            self.won(auction_id)
+
+    def save_open(self, cursor):
+        """Keep the leaders of still-open auctions for the next import run"""
+        cursor.execute(OPEN_AUCTIONS_SQL)
+        cursor.execute('DELETE FROM bidder_open_auctions')
+        cursor.executemany('INSERT INTO bidder_open_auctions VALUES (?, ?, ?, ?, ?)',
+                           [(auction_id, *state) for auction_id, state in self.auctions.items()])
+
+    def load_open(self, cursor):
+        """Continue from the open auctions saved by the previous import run"""
+        cursor.execute(OPEN_AUCTIONS_SQL)
+        cursor.execute('SELECT auction_id, highest_bidder, highest_bid, number_of_bids, ends_at FROM bidder_open_auctions')
+        for auction_id, *state in cursor.fetchall():
+            self.auctions[auction_id] = state
+
+    def due(self):
+        return bool(self.deltas) and time.time() - self.last_flush >= FLUSH_SECONDS
+
+    def flush(self, cursor):
+        """Write buffered deltas (caller commits); returns bidders written"""
+        rows = [(bidder, bids, spent) for bidder, (bids, spent) in self.deltas.items()]
+        if rows:
+            cursor.executemany(UPSERT_SQL, rows)
+        self.deltas = {}
+        self.last_flush = time.time()
+        return len(rows)
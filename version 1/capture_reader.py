@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+capture_reader.py
+Memory-mapped JSONL capture with a persistent line-offset index
+
+The capture is mmapped read-only. Line start offsets are kept as an
+array('Q') in a sidecar file (<capture>.idx), so reopening a capture, jumping
+to line 48213, sampling or splitting it across workers needs no scan. A
+capture that only grew since it was indexed (a running capture) is indexed
+from where the last run stopped. Lines come back as memoryviews into the map.
+No line data is copied until a line is decoded.
+"""
+
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+
+INDEX_SUFFIX = '.idx'
+
+# magic, version, bytes indexed, crc32 of the last indexed line
+INDEX_HEADER = struct.Struct('<4sIQI')
+INDEX_MAGIC = b'CIDX'
+INDEX_VERSION = 1
+
+
+class CaptureReader:
+    """Line-indexed view of a capture; reader[i] is line i + 1 (0-based index)"""
+
+    def __init__(self, filename, index_file=None, save_index=True):
+        self.filename = filename
+        self.index_file = index_file or filename + INDEX_SUFFIX
+        self.file = open(filename, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        # mmap cannot map an empty file
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+
+        self.offsets = self._load_index()
+        indexed = self.offsets[-1]
+        if indexed < self.size:
+            self._scan(indexed)
+            if save_index and self.offsets[-1] > indexed:
+                self.save_index()
+
+        # An unterminated last line (capture still being written) is readable,
+        # but not indexed until its newline arrives
+        self.tail = self.size if self.offsets[-1] < self.size else None
+
+    def _load_index(self):
+        """Stored offsets if they still describe this file, else [0]"""
+        try:
+            with open(self.index_file, 'rb') as f:
+                magic, version, indexed, crc = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                offsets = array('Q')
+                offsets.frombytes(f.read())
+        except (OSError, struct.error, ValueError):
+            return array('Q', [0])
+
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or sys.byteorder != 'little':
+            return array('Q', [0])
+        if not offsets or offsets[-1] != indexed or indexed > self.size:
+            return array('Q', [0])
+        # Same bytes at the end of the indexed part = same (possibly grown) file
+        last_start = offsets[-2] if len(offsets) > 1 else 0
+        if zlib.crc32(self.map[last_start:indexed]) != crc:
+            return array('Q', [0])
+        return offsets
+
+    def _scan(self, start):
+        """Append the start of every complete line after byte start"""
+        find = self.map.find
+        offsets = self.offsets
+        position = find(b'\n', start)
+        while position != -1:
+            offsets.append(position + 1)
+            position = find(b'\n', position + 1)
+
+    def save_index(self):
+        indexed = self.offsets[-1]
+        last_start = self.offsets[-2] if len(self.offsets) > 1 else 0
+        header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, indexed,
+                                   zlib.crc32(self.map[last_start:indexed]))
+        temp = self.index_file + '.tmp'
+        with open(temp, 'wb') as f:
+            f.write(header)
+            self.offsets.tofile(f)
+        os.replace(temp, self.index_file)
+
+    def __len__(self):
+        return len(self.offsets) - 1 + (self.tail is not None)
+
+    def span(self, i):
+        """(start, end) bytes of line i, without its newline"""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"no line {i + 1} (capture has {len(self)} lines)")
+        if i == len(self.offsets) - 1:
+            return self.offsets[-1], self.tail
+        return self.offsets[i], self.offsets[i + 1] - 1
+
+    def __getitem__(self, i):
+        """memoryview of line i, or a list of them for a slice"""
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        start, end = self.span(i)
+        return memoryview(self.map)[start:end]
+
+    def text(self, i):
+        return str(self[i], 'utf-8')
+
+    def record(self, i):
+        """Line i parsed as JSON"""
+        return json.loads(bytes(self[i]))
+
+    def lines(self, start=0, stop=None):
+        """Yield (index, memoryview) for lines start..stop-1"""
+        for i in range(*slice(start, stop).indices(len(self))):
+            yield i, self[i]
+
+    def sample(self, count, seed=None):
+        """count random line indexes, in file order"""
+        return sorted(random.Random(seed).sample(range(len(self)), min(count, len(self))))
+
+    def line_at(self, offset):
+        """Index of the first line starting at or after byte offset"""
+        return bisect_left(self.offsets, offset)
+
+    def chunks(self, chunk_bytes, first=0, stop=None):
+        """[(first line, end line, start byte, end byte)] - line-aligned ranges of about chunk_bytes
+
+        Covers lines first..stop-1 (default: all). Workers only need
+        (filename, start byte, end byte) to open their own map, so nothing but
+        four integers crosses the process boundary.
+        """
+        chunks = []
+        total = len(self) if stop is None else min(stop, len(self))
+        while first < total:
+            start = self.span(first)[0]
+            end = first + 1
+            # Binary search for the first line starting at or after start + chunk_bytes
+            low, high = end, len(self.offsets) - 1
+            while low < high:
+                middle = (low + high) // 2
+                if self.offsets[middle] < start + chunk_bytes:
+                    low = middle + 1
+                else:
+                    high = middle
+            end = max(end, min(low, total))
+            end_byte = self.offsets[end] if end < len(self.offsets) else self.size
+            chunks.append((first, end, start, end_byte))
+            first = end
+        return chunks
+
+    def close(self):
+        """Release the map (memoryviews returned earlier must be released first)"""
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def show(reader, i):
+    line = reader.text(i)
+    print(f"{i + 1:>10}: {line if len(line) <= 300 else line[:300] + '...'}")
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    if len(sys.argv) < 2:
+        print("Usage: python capture_reader.py capture.jsonl [line | first:last | sample N]")
+        sys.exit(1)
+
+    filename = sys.argv[1]
+    if not os.path.exists(filename):
+        print(f"ERROR - Capture not found: {filename}")
+        sys.exit(1)
+
+    with CaptureReader(filename) as reader:
+        print(f"{filename}: {len(reader):,} lines, {reader.size:,} bytes (index {reader.index_file})")
+        args = sys.argv[2:]
+        try:
+            # Line numbers on the command line are 1-based, like an editor's
+            if args[:1] == ['sample']:
+                for i in reader.sample(int(args[1]) if len(args) > 1 else 10):
+                    show(reader, i)
+            elif args and ':' in args[0]:
+                first, last = args[0].split(':')
+                for i in range(*slice(int(first or 1) - 1, int(last) if last else None).indices(len(reader))):
+                    show(reader, i)
+            elif args:
+                show(reader, int(args[0]) - 1)
+        except (IndexError, ValueError) as e:
+            print(f"ERROR - {e}")
+            sys.exit(1)
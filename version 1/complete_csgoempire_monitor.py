@@ -9,15 +9,29 @@ import json
 import re
 import time
 import argparse
+import sys
 from datetime import datetime
 from websocket import create_connection, WebSocketException
 import requests
 
+from bidder_stats import BidderStats
+
+# Leader of every open auction + buffered bidder deltas (persists across messages)
+BIDDER_STATS = BidderStats()
+
 def create_database():
     """Create complete database schema"""
     conn = sqlite3.connect('csgoempire_monitor.db')
     cursor = conn.cursor()
     
+    # Upgraded by version 2 (PRAGMA user_version set by its migrations) - different schema
+    cursor.execute('PRAGMA user_version')
+    if cursor.fetchone()[0] > 0:
+        conn.close()
+        print("ERROR - csgoempire_monitor.db uses the version 2 schema")
+        print("Use version_2/csgoempire_gui.py, or move the file to start a new version 1 database")
+        sys.exit(1)
+    
     # Items table with full details
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS items (
@@ -35,6 +49,7 @@ def create_database():
         purchase_price INTEGER,
         above_recommended_price REAL,
         published_at TEXT,
+        published_at_ms INTEGER,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     ''')
@@ -62,6 +77,7 @@ def create_database():
         number_of_bids INTEGER,
         ends_at INTEGER,
         above_recommended_price REAL,
+        timestamp_ms INTEGER,
         FOREIGN KEY (auction_id) REFERENCES auctions (auction_id),
         FOREIGN KEY (item_id) REFERENCES items (item_id)
     )
@@ -82,6 +98,21 @@ def create_database():
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_market_name ON items (market_name)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_type ON items (type)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_auction_updates_auction_id ON auction_updates (auction_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bidders_total_bids ON bidders (total_bids)')
+    
+    # Epoch-ms columns for time-window queries (added in place on older databases)
+    for table, column, source in [('items', 'published_at_ms', 'published_at'),
+                                  ('auction_updates', 'timestamp_ms', 'timestamp')]:
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER')
+            cursor.execute(f'''
+                UPDATE {table}
+                SET {column} = CAST(ROUND((julianday(substr({source}, 1, 23)) - 2440587.5) * 86400000) AS INTEGER)
+                WHERE {source} IS NOT NULL
+            ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auction_updates_timestamp_ms ON auction_updates (timestamp_ms, auction_id, highest_bid, number_of_bids)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_published_at_ms ON items (published_at_ms)')
     
     conn.commit()
     conn.close()
@@ -188,13 +219,16 @@ def process_websocket_message(payload, timestamp, chrome_timestamp, conn):
                 cursor.execute('''
                     INSERT OR REPLACE INTO items 
                     (item_id, market_name, type, category, sub_type, rarity, wear_name, wear_value,
-                     market_value, suggested_price, purchase_price, above_recommended_price, published_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                     market_value, suggested_price, purchase_price, above_recommended_price, published_at,
+                     published_at_ms)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                            CAST(ROUND((julianday(?) - 2440587.5) * 86400000) AS INTEGER))
                 ''', (
                     item_id, item.get('market_name'), item.get('type'), item.get('category'),
                     item.get('sub_type'), item.get('rarity'), item.get('wear_name'), item.get('wear'),
                     item.get('market_value'), item.get('suggested_price'), item.get('purchase_price'),
-                    item.get('above_recommended_price'), item.get('published_at')
+                    item.get('above_recommended_price'), item.get('published_at'),
+                    item.get('published_at')
                 ))
                 
                 print(f"[NEW ITEM] {item.get('market_name', 'Unknown')} - ${item.get('market_value', 0):,}")
@@ -212,35 +246,37 @@ def process_websocket_message(payload, timestamp, chrome_timestamp, conn):
                         # Insert auction
                         cursor.execute('INSERT OR IGNORE INTO auctions (auction_id) VALUES (?)', (auction_id,))
                         
+                        # Bid transition (before the update is stored)
+                        bidder_id = auction['auction_highest_bidder']
+                        BIDDER_STATS.bid(
+                            auction_id, bidder_id, auction['auction_highest_bid'],
+                            auction['auction_number_of_bids'], auction['auction_ends_at'], cursor
+                        )
+                        
                         # Insert auction update
                         cursor.execute('''
                             INSERT INTO auction_updates 
                             (auction_id, timestamp, chrome_timestamp, highest_bid, highest_bidder, 
-                             number_of_bids, ends_at, above_recommended_price)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                             number_of_bids, ends_at, above_recommended_price, timestamp_ms)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?,
+                                    CAST(ROUND((julianday(substr(?, 1, 23)) - 2440587.5) * 86400000) AS INTEGER))
                         ''', (
                             auction_id, timestamp, chrome_timestamp,
                             auction['auction_highest_bid'], auction['auction_highest_bidder'],
                             auction['auction_number_of_bids'], auction['auction_ends_at'],
-                            auction['above_recommended_price']
+                            auction['above_recommended_price'], timestamp
                         ))
                         
-                        # Update bidder stats
-                        bidder_id = auction['auction_highest_bidder']
-                        cursor.execute('INSERT OR IGNORE INTO bidders (bidder_id) VALUES (?)', (bidder_id,))
-                        cursor.execute('''
-                            UPDATE bidders SET 
-                                last_seen = CURRENT_TIMESTAMP,
-                                total_bids = total_bids + 1,
-                                total_spent = total_spent + ?
-                            WHERE bidder_id = ?
-                        ''', (auction['auction_highest_bid'], bidder_id))
-                        
                         print(f"[AUCTION] {auction_id}: ${auction['auction_highest_bid']:,} by {bidder_id} ({auction['auction_number_of_bids']} bids)")
                         
                 except json.JSONDecodeError:
                     pass
         
+        # Bidder stats are written in batches, not per update
+        if BIDDER_STATS.due():
+            BIDDER_STATS.end_auctions(time.time())
+            BIDDER_STATS.flush(cursor)
+        
         conn.commit()
         
     except Exception as e:
@@ -324,6 +360,9 @@ def monitor_websocket(port=9222, match_url="csgoempire"):
     except Exception as e:
         print(f"Unexpected error: {e}")
     finally:
+        BIDDER_STATS.end_auctions(time.time())
+        BIDDER_STATS.flush(conn.cursor())
+        conn.commit()
         conn.close()
         try:
             cdp.close()
@@ -335,92 +374,101 @@ def show_dashboard():
     conn = sqlite3.connect('csgoempire_monitor.db')
     cursor = conn.cursor()
     
-    while True:
-        # Clear screen
-        import os
-        os.system('cls' if os.name == 'nt' else 'clear')
+    try:
+        while True:
+            # Clear screen
+            import os
+            os.system('cls' if os.name == 'nt' else 'clear')
         
-        print("=" * 80)
-        print("CSGOEmpire Real-Time Monitor")
-        print("=" * 80)
-        print(f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print()
+            print("=" * 80)
+            print("CSGOEmpire Real-Time Monitor")
+            print("=" * 80)
+            print(f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            print()
         
-        # Recent items
-        cursor.execute('''
-            SELECT market_name, market_value, type, published_at
-            FROM items 
-            ORDER BY published_at DESC
-            LIMIT 10
-        ''')
+            # Recent items
+            cursor.execute('''
+                SELECT market_name, market_value, type, published_at
+                FROM items 
+                ORDER BY published_at_ms DESC
+                LIMIT 10
+            ''')
         
-        print("🆕 RECENT ITEMS")
-        print("-" * 80)
-        recent_items = cursor.fetchall()
-        if recent_items:
-            for row in recent_items:
-                print(f"{row[0]} - ${row[1]:,} ({row[2]}) - {row[3][:19]}")
-        else:
-            print("No recent items")
+            print("🆕 RECENT ITEMS")
+            print("-" * 80)
+            recent_items = cursor.fetchall()
+            if recent_items:
+                for row in recent_items:
+                    print(f"{row[0]} - ${row[1]:,} ({row[2]}) - {row[3][:19]}")
+            else:
+                print("No recent items")
         
-        print()
+            print()
         
-        # Active auctions with item names
-        cursor.execute('''
-            SELECT i.market_name, a.auction_id, COUNT(au.id) as update_count,
-                   MAX(au.highest_bid) as current_bid, MAX(au.number_of_bids) as total_bids
-            FROM items i
-            JOIN auctions a ON i.item_id = a.auction_id
-            JOIN auction_updates au ON a.auction_id = au.auction_id
-            WHERE au.timestamp > datetime('now', '-5 minutes')
-            GROUP BY a.auction_id
-            ORDER BY update_count DESC
-            LIMIT 5
-        ''')
+            # Active auctions with item names
+            cursor.execute('''
+                SELECT i.market_name, a.auction_id, COUNT(au.id) as update_count,
+                       MAX(au.highest_bid) as current_bid, MAX(au.number_of_bids) as total_bids
+                FROM items i
+                JOIN auctions a ON i.item_id = a.auction_id
+                JOIN auction_updates au ON a.auction_id = au.auction_id
+                WHERE au.timestamp_ms > ?
+                GROUP BY a.auction_id
+                ORDER BY update_count DESC
+                LIMIT 5
+            ''', (int(time.time() * 1000) - 5 * 60 * 1000,))
         
-        print("🔥 ACTIVE AUCTIONS")
-        print("-" * 80)
-        active_auctions = cursor.fetchall()
-        if active_auctions:
-            for row in active_auctions:
-                print(f"{row[0]} (Auction {row[1]}): ${row[3]:,} current bid ({row[4]} total bids)")
-        else:
-            print("No active auctions")
+            print("🔥 ACTIVE AUCTIONS")
+            print("-" * 80)
+            active_auctions = cursor.fetchall()
+            if active_auctions:
+                for row in active_auctions:
+                    print(f"{row[0]} (Auction {row[1]}): ${row[3]:,} current bid ({row[4]} total bids)")
+            else:
+                print("No active auctions")
         
-        print()
+            print()
         
-        # Top bidders
-        cursor.execute('''
-            SELECT bidder_id, total_bids, total_spent, last_seen
-            FROM bidders 
-            ORDER BY total_bids DESC
-            LIMIT 5
-        ''')
+            # Top bidders
+            cursor.execute('''
+                SELECT bidder_id, total_bids, total_spent, last_seen
+                FROM bidders 
+                ORDER BY total_bids DESC
+                LIMIT 5
+            ''')
         
-        print("👑 TOP BIDDERS")
-        print("-" * 80)
-        top_bidders = cursor.fetchall()
-        if top_bidders:
-            for row in top_bidders:
-                print(f"Bidder {row[0]}: {row[1]} bids, ${row[2]:,} spent")
-        else:
-            print("No bidder data")
+            print("👑 TOP BIDDERS")
+            print("-" * 80)
+            top_bidders = cursor.fetchall()
+            if top_bidders:
+                for row in top_bidders:
+                    print(f"Bidder {row[0]}: {row[1]} bids, ${row[2]:,} spent")
+            else:
+                print("No bidder data")
         
-        print()
-        print("Press Ctrl+C to exit, or wait for next update...")
+            print()
+            print("Press Ctrl+C to exit, or wait for next update...")
         
+            time.sleep(30)
+    finally:
         conn.close()
-        time.sleep(30)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="CSGOEmpire WebSocket Monitor")
     parser.add_argument("--port", type=int, default=9222, help="Chrome DevTools port")
     parser.add_argument("--match-url", type=str, default="csgoempire", help="URL filter")
     parser.add_argument("--dashboard", action="store_true", help="Show dashboard")
+    parser.add_argument("--live", action="store_true", help="Show live dashboard (delta refresh)")
     
     args = parser.parse_args()
     
-    if args.dashboard:
+    if args.live:
+        import live_dashboard
+        try:
+            live_dashboard.run(recent_items=10, active_minutes=5, active_auctions=5, top_bidders=5)
+        except KeyboardInterrupt:
+            pass
+    elif args.dashboard:
         show_dashboard()
     else:
         monitor_websocket(args.port, args.match_url)
@@ -9,6 +9,10 @@ import json
 import re
 from datetime import datetime
 
+from bidder_stats import BidderStats, frame_seconds
+from frame_dedup import FrameKeys
+from import_checkpoint import ImportCheckpoint
+
 def create_enhanced_database():
     """Create enhanced database schema with item details"""
     conn = sqlite3.connect('csgoempire_enhanced.db')
@@ -120,12 +124,23 @@ def parse_enhanced_websocket_data(filename):
     """Parse WebSocket data with full item details"""
     conn = sqlite3.connect('csgoempire_enhanced.db')
     cursor = conn.cursor()
+    bidder_stats = BidderStats()
+
+    # Only lines appended since the last run are imported
+    checkpoint = ImportCheckpoint(cursor, filename)
+    if checkpoint.resumed:
+        bidder_stats.load_open(cursor)
+        print(f"Resuming after line {checkpoint.lines:,} (byte {checkpoint.offset:,})")
+    first_line = checkpoint.lines
+    # Frames already imported from an overlapping capture are skipped
+    frame_keys = FrameKeys(cursor)
     
     # Map auction_id to item_id for auction updates
     auction_to_item = {}
     
-    with open(filename, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
+    timestamp = None
+    with open(filename, 'rb') as f:
+        for line_num, line in frame_keys.new_lines(checkpoint.new_lines(f)):
             try:
                 data = json.loads(line.strip())
                 payload = data['payload']
@@ -196,6 +211,12 @@ def parse_enhanced_websocket_data(filename):
                             cursor.execute('INSERT OR IGNORE INTO auctions (auction_id, item_id) VALUES (?, ?)', 
                                          (auction_id, item_id))
                             
+                            # Bid transition (before the update is stored)
+                            bidder_stats.bid(
+                                auction_id, auction['auction_highest_bidder'], auction['auction_highest_bid'],
+                                auction['auction_number_of_bids'], auction['auction_ends_at'], cursor
+                            )
+                            
                             # Insert auction update
                             cursor.execute('''
                                 INSERT INTO auction_updates 
@@ -208,19 +229,6 @@ def parse_enhanced_websocket_data(filename):
                                 auction['auction_number_of_bids'], auction['auction_ends_at'],
                                 auction['above_recommended_price']
                             ))
-                            
-                            # Update bidder stats
-                            bidder_id = auction['auction_highest_bidder']
-                            cursor.execute('''
-                                INSERT OR IGNORE INTO bidders (bidder_id) VALUES (?)
-                            ''', (bidder_id,))
-                            cursor.execute('''
-                                UPDATE bidders SET 
-                                    last_seen = CURRENT_TIMESTAMP,
-                                    total_bids = total_bids + 1,
-                                    total_spent = total_spent + ?
-                                WHERE bidder_id = ?
-                            ''', (auction['auction_highest_bid'], bidder_id))
                 
                 # Parse deleted items
                 elif 'deleted_item' in payload:
@@ -230,6 +238,8 @@ def parse_enhanced_websocket_data(filename):
                         item_ids = [int(x.strip()) for x in deleted_data.split(',')]
                         
                         for item_id in item_ids:
+                            # Deleted while it had a leader = sold to that bidder
+                            bidder_stats.won(item_id)
                             cursor.execute('''
                                 INSERT INTO item_deletions (item_id, timestamp, chrome_timestamp)
                                 VALUES (?, ?, ?)
@@ -239,8 +249,17 @@ def parse_enhanced_websocket_data(filename):
                 print(f"Error parsing line {line_num}: {e}")
                 continue
     
+    # Auctions ended by the last imported frame are won; the rest continue in the next run
+    bidder_stats.end_auctions(frame_seconds(timestamp))
+    bidder_stats.flush(cursor)
+    bidder_stats.save_open(cursor)
+    frame_keys.save()
+    checkpoint.save(cursor)
+    
     conn.commit()
     conn.close()
+    print(f"{checkpoint.lines - first_line:,} new line(s) imported")
+    frame_keys.report()
     print("Enhanced WebSocket data imported successfully!")
 
 def show_item_analysis():
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+frame_dedup.py
+Shared by the importers: skips capture lines whose frame was already imported
+
+Overlapping captures (two capture sessions on the same tab, a capture copied
+and appended to another) contain the same frames twice, and importing both
+would double-count bids and deletions. A frame is identified by its CDP
+requestId, its chrome_ts and the payload - the inputs of version 2's
+dedup.frame_key - read straight from the raw line, so no JSON parsing is
+needed to recognise a repeat. The line's "t" is not part of the key: its
+wall-clock part is stamped by the capture session, so the same frame seen by
+two sessions differs there. The keys of imported frames live in the
+frame_keys table and are written in the importer's transaction (save()), so
+rows and keys are committed together. Keys are checked in memory against a
+hot set: the keys imported by this run plus those found stored by one
+IN (...) lookup per 500 lines (load_stored), as version 2's FrameDedup does
+for bulk sources - no per-line INSERT OR IGNORE. Lines without a chrome_ts
+get no key and are always imported.
+"""
+
+import hashlib
+import re
+from itertools import islice
+
+CHROME_TS_RE = re.compile(rb'chrome_ts=([0-9.]+)')
+REQUEST_ID_RE = re.compile(rb'"requestId":\s*"([^"]*)"')
+# The payload is the last field the capture writes; its quotes are escaped, so
+# the first unescaped "payload": is the field itself
+PAYLOAD_RE = re.compile(rb'"payload":\s*')
+
+# Lines whose keys are looked up together
+LOOKUP_LINES = 500
+
+
+def create_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS frame_keys (
+        frame_key INTEGER PRIMARY KEY
+    )
+    ''')
+
+
+def line_key(line):
+    """63-bit key of a capture line (bytes) from requestId, chrome_ts and payload; None without CDP metadata"""
+    chrome_ts = CHROME_TS_RE.search(line)
+    payload = PAYLOAD_RE.search(line)
+    if chrome_ts is None or payload is None:
+        return None
+    request_id = REQUEST_ID_RE.search(line)
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(request_id.group(1) if request_id else b'')
+    digest.update(b'|' + chrome_ts.group(1) + b'|')
+    digest.update(line[payload.end():].rstrip(b'\r\n'))
+    # Fits SQLite's INTEGER PRIMARY KEY
+    return (int.from_bytes(digest.digest(), 'little') >> 1) or 1
+
+
+class FrameKeys:
+    """Frames already imported into this database; is_duplicate() also records new ones
+
+    New keys are held in memory until save() writes them in the importer's transaction.
+    """
+
+    def __init__(self, cursor):
+        create_table(cursor)
+        self.cursor = cursor
+        self.seen = set()       # hot set: keys imported by this run or found in frame_keys
+        self.pending = []       # keys imported by this run, not yet saved
+        self.checked = 0
+        self.skipped = 0
+
+    def load_stored(self, keys):
+        """Add the keys already in frame_keys to the hot set (one query per LOOKUP_LINES keys)"""
+        keys = sorted(key for key in keys if key is not None and key not in self.seen)
+        for start in range(0, len(keys), LOOKUP_LINES):
+            chunk = keys[start:start + LOOKUP_LINES]
+            self.cursor.execute(f"SELECT frame_key FROM frame_keys WHERE frame_key IN ({','.join('?' * len(chunk))})",
+                                chunk)
+            self.seen.update(key for (key,) in self.cursor.fetchall())
+
+    def is_duplicate(self, key):
+        """True if the frame was imported before; call load_stored() for its key first"""
+        if key is None:
+            return False
+        self.checked += 1
+        if key in self.seen:
+            self.skipped += 1
+            return True
+        self.seen.add(key)
+        self.pending.append(key)
+        return False
+
+    def new_lines(self, lines):
+        """(line number, line) pairs of lines not imported before, looked up LOOKUP_LINES at a time"""
+        lines = iter(lines)
+        while True:
+            chunk = list(islice(lines, LOOKUP_LINES))
+            if not chunk:
+                return
+            keys = [line_key(line) for _, line in chunk]
+            self.load_stored(keys)
+            for (line_num, line), key in zip(chunk, keys):
+                if not self.is_duplicate(key):
+                    yield line_num, line
+
+    def save(self):
+        """Write the keys of frames imported since the last save (caller commits)
+
+        In key order, so each frame_keys page is visited once rather than at random.
+        """
+        self.cursor.executemany('INSERT OR IGNORE INTO frame_keys (frame_key) VALUES (?)',
+                                [(key,) for key in sorted(self.pending)])
+        self.pending = []
+
+    def report(self):
+        if self.skipped:
+            print(f"{self.skipped:,} duplicate frame(s) skipped")
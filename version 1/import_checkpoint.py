@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+import_checkpoint.py
+Shared by the importers: per-capture checkpoints so a rerun only imports new lines
+
+The database remembers, per capture path, how far it was imported (byte
+offset and line count), the file's inode and size, and a hash of the bytes
+just before the offset. A rerun resumes at the offset if those bytes are
+unchanged; a replaced or rewritten capture is imported from the start. Only
+complete lines are imported - a line still being written is left for the
+next run. The checkpoint is saved in the importer's transaction, so rows and
+checkpoint are committed together.
+"""
+
+import hashlib
+import os
+
+# Bytes before the checkpoint that must be unchanged to resume
+TAIL_BYTES = 4096
+
+
+def create_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        path TEXT PRIMARY KEY,
+        inode INTEGER,
+        size INTEGER,
+        offset INTEGER,
+        lines INTEGER,
+        tail_hash TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def tail_hash(f, offset):
+    """sha1 of the TAIL_BYTES before offset"""
+    start = max(offset - TAIL_BYTES, 0)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+class ImportCheckpoint:
+    """Where the last import of a capture stopped; new_lines() continues from there"""
+
+    def __init__(self, cursor, filename):
+        create_table(cursor)
+        self.filename = filename
+        self.path = os.path.abspath(filename)
+        self.offset = 0
+        self.lines = 0
+        self.resumed = False
+
+        cursor.execute('SELECT size, offset, lines, tail_hash FROM import_checkpoints WHERE path = ?',
+                       (self.path,))
+        row = cursor.fetchone()
+        if row is None:
+            return
+        size, offset, lines, stored_hash = row
+        with open(filename, 'rb') as f:
+            current_size = os.fstat(f.fileno()).st_size
+            if current_size >= offset and tail_hash(f, offset) == stored_hash:
+                self.offset, self.lines, self.resumed = offset, lines, True
+            else:
+                print(f"Capture changed since the last import ({size:,} -> {current_size:,} bytes) "
+                      f"- importing from the start")
+
+    def new_lines(self, f):
+        """Yield (line number, line bytes) for complete lines after the checkpoint (f opened 'rb')"""
+        f.seek(self.offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                return    # still being written - picked up by the next run
+            self.offset += len(line)
+            self.lines += 1
+            yield self.lines, line
+
+    def advance(self, offset, lines):
+        """Record lines imported without new_lines() (e.g. parallel_import)"""
+        self.offset, self.lines = offset, lines
+
+    def save(self, cursor):
+        """Store the checkpoint (caller commits, together with the imported rows)"""
+        with open(self.filename, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            digest = tail_hash(f, self.offset)
+        cursor.execute('''
+            INSERT INTO import_checkpoints (path, inode, size, offset, lines, tail_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                inode = excluded.inode,
+                size = excluded.size,
+                offset = excluded.offset,
+                lines = excluded.lines,
+                tail_hash = excluded.tail_hash,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (self.path, stat.st_ino, stat.st_size, self.offset, self.lines, digest))
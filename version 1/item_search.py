@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+item_search.py
+Full-text item search (FTS5 index over items.market_name)
+
+market_name LIKE '%...%' reads every row. items_fts holds one entry per
+item_id, tokenized for skin names: letters and digits form words, '★' and
+'-' are kept inside words (so '★' can be searched and 'M4A1-S' / 'AK-47'
+stay whole), and '|', '™' and the parentheses around the wear split words.
+'★ StatTrak™ Bayonet | Tiger Tooth (Factory New)' indexes as
+★ stattrak bayonet tiger tooth factory new.
+
+The writers are not changed: sync() adds the items rows above a saved
+watermark (items rows are replaced on relisting, so the entry of a relisted
+item is replaced too). search() syncs first, so results are always current.
+
+Query syntax: whole words, the last one also as a prefix ('tiger to' finds
+Tiger Tooth), "double quotes" match a phrase, every word/phrase must match. The newest
+RANK_CANDIDATES matches (item ids grow with time) are ranked, best match
+first, then newest first. Every match holds every query word, about once
+(names don't repeat words), so bm25 orders matches by name length alone;
+they are sorted by their number of words instead of calling bm25(), which
+counts each word's matches over the whole index first (tens of ms for a
+common word). Searches stay in milliseconds however common the words.
+
+    python item_search.py "bayonet tiger" [limit] [csgoempire_monitor.db]
+    python item_search.py --rebuild [csgoempire_monitor.db]
+"""
+
+import re
+import sqlite3
+import sys
+import time
+
+DB_FILE = 'csgoempire_monitor.db'
+
+TOKENIZER = "unicode61 remove_diacritics 2 tokenchars '★-'"
+
+# Items rows indexed per transaction (the first sync of a large database takes several)
+SYNC_CHUNK_ROWS = 200000
+
+# Only the newest matches are ranked - a common word matches most of the table
+RANK_CANDIDATES = 1000
+
+# A query word/phrase: "a phrase" or a bare word
+TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# Characters that make up words (as the tokenizer sees them)
+WORD_RE = re.compile(r'[\w★-]+')
+
+
+def create_tables(cursor):
+    cursor.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5 (
+        market_name,
+        tokenize = "{TOKENIZER}",
+        prefix = '2 3'
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS items_fts_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        last_rowid INTEGER NOT NULL
+    )
+    ''')
+
+
+def sync(conn):
+    """Index items rows added since the last sync; returns rows indexed"""
+    cursor = conn.cursor()
+    create_tables(cursor)
+    conn.commit()
+
+    indexed = 0
+    while True:
+        # Holds the write lock: no rows can be added between reading the end and saving the watermark
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('SELECT last_rowid FROM items_fts_state WHERE id = 1')
+            row = cursor.fetchone()
+            low = row[0] if row else 0
+            cursor.execute('SELECT MAX(id) FROM items')
+            end = cursor.fetchone()[0] or 0
+            high = min(end, low + SYNC_CHUNK_ROWS)
+            if high <= low:
+                conn.rollback()
+                return indexed
+
+            # FTS rowid = item_id: a relisted item replaces its entry
+            cursor.execute('''
+                DELETE FROM items_fts WHERE rowid IN (
+                    SELECT item_id FROM items WHERE id > ? AND id <= ? AND item_id IS NOT NULL
+                )
+            ''', (low, high))
+            cursor.execute('''
+                INSERT INTO items_fts (rowid, market_name)
+                SELECT item_id, market_name FROM items
+                WHERE id > ? AND id <= ? AND item_id IS NOT NULL AND market_name IS NOT NULL
+            ''', (low, high))
+            cursor.execute('INSERT OR REPLACE INTO items_fts_state (id, last_rowid) VALUES (1, ?)', (high,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        indexed += high - low
+        if high == end:
+            return indexed
+
+
+def rebuild(conn):
+    """Drop and re-index everything (tokenizer change, damaged index)"""
+    cursor = conn.cursor()
+    cursor.execute('DROP TABLE IF EXISTS items_fts')
+    cursor.execute('DROP TABLE IF EXISTS items_fts_state')
+    conn.commit()
+    indexed = sync(conn)
+    cursor.execute("INSERT INTO items_fts (items_fts) VALUES ('optimize')")
+    conn.commit()
+    return indexed
+
+
+def match_query(text):
+    """FTS5 MATCH expression for a search box string; None if it has no words"""
+    terms = []
+    for phrase, word in TERM_RE.findall(text):
+        words = WORD_RE.findall(phrase or word)
+        if words:
+            # Quoted so FTS5 operators and punctuation in names are taken literally
+            terms.append(('"' + ' '.join(words) + '"', bool(phrase)))
+    if not terms:
+        return None
+    if not terms[-1][1]:
+        # The word being typed
+        terms[-1] = (terms[-1][0] + ' *', False)
+    return ' AND '.join(term for term, _ in terms)
+
+
+def search(conn, text, limit=5):
+    """Items whose name matches: (market_name, market_value, type, wear_name, published_at)"""
+    sync(conn)
+    query = match_query(text)
+    if query is None:
+        return []
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT i.market_name, i.market_value, i.type, i.wear_name, i.published_at, i.published_at_ms
+        FROM (
+            SELECT rowid FROM items_fts WHERE items_fts MATCH ? ORDER BY rowid DESC LIMIT ?
+        ) f
+        JOIN items i ON i.item_id = f.rowid
+    ''', (query, RANK_CANDIDATES))
+    rows = cursor.fetchall()
+    # bm25 order: fewest words first (see above), then newest
+    rows.sort(key=lambda row: (len(WORD_RE.findall(row[0] or '')), -(row[5] or 0)))
+    return [row[:5] for row in rows[:limit]]
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    args = sys.argv[1:]
+    if not args:
+        print('Usage: python item_search.py "search words" [limit] [db] | --rebuild [db]')
+        sys.exit(1)
+
+    if args[0] == '--rebuild':
+        conn = sqlite3.connect(args[1] if len(args) > 1 else DB_FILE, timeout=30)
+        started = time.time()
+        print(f"✓ {rebuild(conn):,} item row(s) indexed in {time.time() - started:.1f}s")
+        conn.close()
+        sys.exit(0)
+
+    limit = int(args[1]) if len(args) > 1 else 5
+    conn = sqlite3.connect(args[2] if len(args) > 2 else DB_FILE, timeout=30)
+    started = time.time()
+    results = search(conn, args[0], limit)
+    print(f"{len(results)} result(s) in {(time.time() - started) * 1000:.1f} ms")
+    for row in results:
+        print(f"📦 {row[0]} - ${row[1] or 0:,} ({row[2]}, {row[3]}) - {(row[4] or '')[:19]}")
+    conn.close()
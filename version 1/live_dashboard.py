@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+live_dashboard.py
+Live dashboard: delta reads, in-memory aggregates, only changed lines redrawn
+
+Keeps one read-only connection. Every tick (0.5s) it reads the items and
+auction_updates rows above the last id it has seen - normally none or a
+few - and folds them into in-memory aggregates: the newest listings,
+per-auction current bid and bid count, and sliding windows of update counts
+per auction. Only the auctions of the last hour are kept; the names of the
+active ones are looked up when they first show up (item_id index). Bidders
+are updated in place by the writers, so the top bidders are read through
+the total_bids index (a handful of rows). The screen is drawn once; after
+that only lines that changed are rewritten with ANSI cursor moves, so an
+idle dashboard costs next to nothing.
+
+At startup only the last hour of items and auction_updates is read
+(published_at_ms / timestamp_ms indexes).
+
+    python live_dashboard.py [csgoempire_monitor.db]
+"""
+
+import heapq
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter, deque
+from datetime import datetime
+from urllib.request import pathname2url
+
+DB_FILE = 'csgoempire_monitor.db'
+
+REFRESH_SECONDS = 0.5
+
+HOUR_MS = 60 * 60 * 1000
+
+# The total item count is a full count - refreshed this often, not every tick
+COUNT_SECONDS = 60
+
+WIDTH = 100
+
+
+class LiveDashboard:
+    """In-memory dashboard state, advanced from the rows added since the last poll"""
+
+    def __init__(self, db_file=DB_FILE, recent_items=8, active_minutes=10, active_auctions=6, top_bidders=6):
+        self.conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_file))}?mode=ro", uri=True, timeout=5)
+        self.recent_limit = recent_items
+        self.active_ms = active_minutes * 60 * 1000
+        self.active_minutes = active_minutes
+        self.active_limit = active_auctions
+        self.bidder_limit = top_bidders
+
+        self.last_item_id = 0
+        self.last_update_id = 0
+        self.item_count = 0
+        self.counted_at = 0
+        self.recent = []                # newest listings, (published_at_ms, row), newest first
+        self.listed_hour = deque()      # published_at_ms of listings in the last hour
+        self.auctions = {}              # auction_id -> [highest bid, number of bids, last update ms] (last hour)
+        self.names = {}                 # auction_id -> market_name, for the auctions in self.auctions
+        self.active_window = deque()    # (timestamp_ms, auction_id) in the active window
+        self.hour_window = deque()      # (timestamp_ms, auction_id) in the last hour
+        self.active_counts = Counter()  # updates per auction in the active window
+        self.hour_counts = Counter()    # updates per auction in the last hour
+        self.top_bidders = []
+
+        cursor = self.conn.cursor()
+        hour_ago = int(time.time() * 1000) - HOUR_MS
+        self.last_item_id = self._first_id(cursor, 'items', 'published_at_ms', hour_ago) - 1
+        self.last_update_id = self._first_id(cursor, 'auction_updates', 'timestamp_ms', hour_ago) - 1
+
+    @staticmethod
+    def _first_id(cursor, table, time_column, since_ms):
+        """First id of the rows since since_ms (past the end when there are none)"""
+        cursor.execute(f'SELECT MIN(id) FROM {table} WHERE {time_column} >= ?', (since_ms,))
+        first = cursor.fetchone()[0]
+        if first is None:
+            # Nothing in the last hour: start at the end
+            cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}')
+            first = cursor.fetchone()[0] + 1
+        return first
+
+    def poll(self, now_ms=None):
+        """Fold new rows and expire the windows; returns the number of new rows"""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        cursor = self.conn.cursor()
+
+        cursor.execute('''
+            SELECT id, item_id, market_name, market_value, type, wear_name, published_at, published_at_ms
+            FROM items WHERE id > ? ORDER BY id
+        ''', (self.last_item_id,))
+        new_items = cursor.fetchall()
+        for row in new_items:
+            self.last_item_id = row[0]
+            self._add_item(row, now_ms)
+
+        cursor.execute('''
+            SELECT id, auction_id, highest_bid, number_of_bids, timestamp_ms
+            FROM auction_updates WHERE id > ? ORDER BY id
+        ''', (self.last_update_id,))
+        new_updates = cursor.fetchall()
+        for row in new_updates:
+            self.last_update_id = row[0]
+            self._add_update(row, now_ms)
+
+        self._expire(now_ms)
+        self._lookup_names(cursor)
+
+        if now_ms - self.counted_at >= COUNT_SECONDS * 1000:
+            cursor.execute('SELECT COUNT(*) FROM items')
+            self.item_count = cursor.fetchone()[0]
+            self.counted_at = now_ms
+
+        cursor.execute('''
+            SELECT bidder_id, total_bids, total_spent
+            FROM bidders
+            ORDER BY total_bids DESC
+            LIMIT ?
+        ''', (self.bidder_limit,))
+        self.top_bidders = cursor.fetchall()
+        return len(new_items) + len(new_updates)
+
+    def _add_item(self, row, now_ms):
+        _, item_id, market_name, _, _, _, _, published_ms = row
+        if item_id in self.names:
+            self.names[item_id] = market_name
+        if published_ms is None:
+            return
+        if published_ms >= now_ms - HOUR_MS:
+            self.listed_hour.append(published_ms)
+        # A relisted item replaces its earlier row
+        recent = [entry for entry in self.recent if entry[1][1] != item_id]
+        recent.append((published_ms, row))
+        self.recent = heapq.nlargest(self.recent_limit, recent, key=lambda entry: entry[0])
+
+    def _add_update(self, row, now_ms):
+        _, auction_id, bid, bids, ts_ms = row
+        # Only auctions in the hour window are kept; _expire drops them when they leave it
+        if ts_ms is None or ts_ms < now_ms - HOUR_MS:
+            return
+        state = self.auctions.setdefault(auction_id, [bid, bids, ts_ms])
+        state[0] = max(state[0] or 0, bid or 0)
+        state[1] = max(state[1] or 0, bids or 0)
+        state[2] = max(state[2], ts_ms)
+        if ts_ms >= now_ms - self.active_ms:
+            self.active_window.append((ts_ms, auction_id))
+            self.active_counts[auction_id] += 1
+        self.hour_window.append((ts_ms, auction_id))
+        self.hour_counts[auction_id] += 1
+
+    def _expire(self, now_ms):
+        for window, counts, length_ms in ((self.active_window, self.active_counts, self.active_ms),
+                                          (self.hour_window, self.hour_counts, HOUR_MS)):
+            while window and window[0][0] < now_ms - length_ms:
+                _, auction_id = window.popleft()
+                counts[auction_id] -= 1
+                if not counts[auction_id]:
+                    del counts[auction_id]
+                    if counts is self.hour_counts:
+                        del self.auctions[auction_id]
+                        self.names.pop(auction_id, None)
+        while self.listed_hour and self.listed_hour[0] < now_ms - HOUR_MS:
+            self.listed_hour.popleft()
+
+    def _lookup_names(self, cursor):
+        """Names of active auctions not looked up yet (None if the item was never listed)"""
+        missing = [auction_id for auction_id in self.active_counts if auction_id not in self.names]
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            cursor.execute(f"SELECT item_id, market_name FROM items WHERE item_id IN ({','.join('?' * len(chunk))})",
+                           chunk)
+            found = dict(cursor.fetchall())
+            for auction_id in chunk:
+                self.names[auction_id] = found.get(auction_id)
+
+    def lines(self):
+        """The screen, one string per line"""
+        lines = ["=" * WIDTH, "🎮 CSGOEmpire Live Dashboard", "=" * WIDTH,
+                 f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ""]
+
+        lines += ["🆕 RECENT ITEMS LISTED", "-" * WIDTH]
+        for _, (_, _, name, value, item_type, wear_name, published_at, _) in self.recent:
+            lines.append(f"📦 {name} - ${value or 0:,} ({item_type}, {wear_name}) - {(published_at or '')[:19]}")
+        if not self.recent:
+            lines.append("No recent items found")
+        lines.append("")
+
+        lines += [f"🔥 ACTIVE AUCTIONS (Last {self.active_minutes} minutes)", "-" * WIDTH]
+        named = ((count, auction_id) for auction_id, count in self.active_counts.items() if self.names.get(auction_id))
+        active = heapq.nlargest(self.active_limit, named)
+        for count, auction_id in active:
+            bid, bids, last_ms = self.auctions[auction_id]
+            lines.append(f"⚔️  {self.names[auction_id]} (Auction {auction_id})")
+            lines.append(f"   💰 Current: ${bid:,} | 📊 {bids} total bids | 🔄 {count} updates | "
+                         f"⏰ {datetime.fromtimestamp(last_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')}")
+        if not active:
+            lines.append(f"No active auctions in the last {self.active_minutes} minutes")
+        lines.append("")
+
+        lines += ["👑 TOP BIDDERS", "-" * WIDTH]
+        for bidder_id, total_bids, total_spent in self.top_bidders:
+            avg_bid = total_spent / total_bids if total_bids > 0 else 0
+            lines.append(f"🎯 Bidder {bidder_id}: {total_bids} bids, ${total_spent:,} spent (avg: ${avg_bid:.0f})")
+        if not self.top_bidders:
+            lines.append("No bidder data available")
+        lines.append("")
+
+        lines += ["📊 MARKET STATS (Last Hour)", "-" * WIDTH,
+                  f"📦 Total items tracked: {self.item_count}",
+                  f"🆕 Items listed: {len(self.listed_hour)}",
+                  f"🔄 Auction updates: {len(self.hour_window)}",
+                  f"⚔️  Active auctions: {len(self.hour_counts)}",
+                  "", "Press Ctrl+C to exit"]
+        return lines
+
+    def close(self):
+        self.conn.close()
+
+
+class Screen:
+    """Rewrites only the lines that changed since the last draw (ANSI escapes)"""
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.shown = None
+        if os.name == 'nt':
+            # Turns on escape sequence processing in the Windows console
+            os.system('')
+
+    def draw(self, lines):
+        parts = []
+        if self.shown is None:
+            # Clear, hide the cursor
+            parts.append('\x1b[2J\x1b[?25l')
+            self.shown = []
+        for row, line in enumerate(lines):
+            if row >= len(self.shown) or self.shown[row] != line:
+                parts.append(f'\x1b[{row + 1};1H{line}\x1b[K')
+        if len(lines) < len(self.shown):
+            parts.append(f'\x1b[{len(lines) + 1};1H\x1b[J')
+        self.shown = list(lines)
+        if parts:
+            self.out.write(''.join(parts))
+            self.out.flush()
+
+    def close(self):
+        # Cursor back, below the dashboard
+        self.out.write(f'\x1b[{len(self.shown or []) + 1};1H\x1b[?25h\n')
+        self.out.flush()
+
+
+def run(db_file=DB_FILE, refresh_seconds=REFRESH_SECONDS, **layout):
+    """Live dashboard until Ctrl+C"""
+    dashboard = LiveDashboard(db_file, **layout)
+    screen = Screen()
+    try:
+        while True:
+            try:
+                dashboard.poll()
+            except sqlite3.OperationalError:
+                # Database busy (a writer holds the lock) - next tick
+                pass
+            screen.draw(dashboard.lines())
+            time.sleep(refresh_seconds)
+    finally:
+        screen.close()
+        dashboard.close()
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    db_file = sys.argv[1] if len(sys.argv) > 1 else DB_FILE
+    if not os.path.exists(db_file):
+        print(f"ERROR - Database not found: {db_file}")
+        sys.exit(1)
+    try:
+        run(db_file)
+    except KeyboardInterrupt:
+        print("Dashboard stopped.")
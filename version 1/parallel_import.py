@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+parallel_import.py
+Multi-process bulk import of a JSONL WebSocket capture
+
+Same tables and rows as parse_websocket_data (basic, csgoempire.db) or
+parse_robust_websocket_data (enhanced, csgoempire_enhanced.db), but faster:
+the capture is split into byte ranges ending on a newline, worker processes
+decode the ranges into row lists, and this process writes each range with
+one executemany per table. Ranges are written in file order, and bid changes
+and deletions are replayed in line order, so ids and bidder totals match the
+one-threaded importers.
+
+--bulk is for building a fresh database from many captures: secondary
+indexes the load does not read are dropped and rebuilt (plus ANALYZE) at the end,
+and the connection runs with an exclusive lock, an in-memory journal, no
+fsync and a large cache/mmap. The normal journal and sync settings are back
+before the database is closed. A crash during a bulk load can leave the
+database unusable - delete it and import again.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from bidder_stats import BidderStats, frame_seconds
+from capture_reader import CaptureReader
+from frame_dedup import FrameKeys, line_key
+from import_checkpoint import ImportCheckpoint
+
+# Bytes of capture per worker task
+CHUNK_BYTES = 8 * 1024 * 1024
+
+# Decoded ranges waiting for the writer, per worker (bounds memory)
+IN_FLIGHT_PER_WORKER = 2
+
+DB_FILES = {'basic': 'csgoempire.db', 'enhanced': 'csgoempire_enhanced.db'}
+
+# --bulk connection settings (per connection, except journal_mode)
+BULK_PRAGMAS = [
+    'PRAGMA locking_mode = EXCLUSIVE',
+    'PRAGMA journal_mode = MEMORY',     # rollback still works, nothing written to disk
+    'PRAGMA synchronous = OFF',
+    'PRAGMA cache_size = -524288',      # 512 MB
+    'PRAGMA mmap_size = 1073741824',    # 1 GB
+    'PRAGMA temp_store = MEMORY',       # index rebuild sorts
+]
+
+# Secondary indexes the import itself reads (BidderStats looks up reappearing auctions) - kept during --bulk
+BULK_KEEP_INDEXES = {'idx_auction_updates_auction_id'}
+
+
+def chunk_ranges(filename, chunk_bytes=CHUNK_BYTES, offset=0):
+    """[(start, end)] byte ranges of the complete lines after offset, each ending after a newline"""
+    # The line index (capture_reader) makes this free when the capture is reopened
+    with CaptureReader(filename) as reader:
+        chunks = reader.chunks(chunk_bytes, reader.line_at(offset), len(reader.offsets) - 1)
+        return [(start, end) for _, _, start, end in chunks]
+
+
+def chrome_ts(t):
+    return float(t.split('chrome_ts=')[1].split(')')[0]) if 'chrome_ts=' in t else None
+
+
+def new_batch():
+    return {
+        'lines': 0, 'errors': 0, 'first_error': None,
+        'last_t': None,         # "t" of the range's last decoded frame - the capture's clock
+        'keys': [],             # (line_num, frame key) - checked by the writer before the rows are used
+        'events': [],           # ('bid', auction_id, bidder, amount, number_of_bids, ends_at) / ('won', item_id)
+        'auctions': [], 'auction_updates': [], 'item_listings': [], 'item_deletions': [],
+        'sellers': [], 'seller_status': [], 'items': [],
+    }
+
+
+def add_auctions(batch, payload, timestamp, chrome_timestamp):
+    auction_match = re.search(r'"auction_update",\[(.*?)\]', payload)
+    if not auction_match:
+        return
+    for auction in json.loads('[' + auction_match.group(1) + ']'):
+        auction_id = auction['id']
+        batch['auctions'].append((auction_id,))
+        batch['events'].append((
+            'bid', auction_id, auction['auction_highest_bidder'], auction['auction_highest_bid'],
+            auction['auction_number_of_bids'], auction['auction_ends_at']
+        ))
+        batch['auction_updates'].append((
+            auction_id, timestamp, chrome_timestamp,
+            auction['auction_highest_bid'], auction['auction_highest_bidder'],
+            auction['auction_number_of_bids'], auction['auction_ends_at'],
+            auction['above_recommended_price']
+        ))
+
+
+def decode_basic(batch, line_num, payload, timestamp, chrome_timestamp):
+    """One line the way parse_websocket_data reads it"""
+    if 'auction_update' in payload:
+        add_auctions(batch, payload, timestamp, chrome_timestamp)
+
+    elif 'new_item' in payload:
+        if re.search(r'"new_item",\[(.*?)\]', payload):
+            batch['item_listings'].append((line_num, timestamp, chrome_timestamp, None))
+
+    elif 'deleted_item' in payload:
+        deleted_match = re.search(r'"deleted_item",\[(.*?)\]', payload)
+        if deleted_match:
+            for item_id in [int(x.strip()) for x in deleted_match.group(1).split(',')]:
+                batch['events'].append(('won', item_id))
+                batch['item_deletions'].append((item_id, timestamp, chrome_timestamp))
+
+    elif 'updated_seller_online_status' in payload:
+        status_match = re.search(r'"updated_seller_online_status",\[(.*?)\]', payload)
+        if status_match:
+            for status in json.loads('[' + status_match.group(1) + ']'):
+                batch['sellers'].append((status['deposit_id'],))
+                batch['seller_status'].append((status['deposit_id'], timestamp, chrome_timestamp, status['current']))
+
+
+def decode_enhanced(batch, line_num, payload, timestamp, chrome_timestamp):
+    """One line the way parse_robust_websocket_data reads it"""
+    from robust_item_parser import extract_item_info_from_payload
+
+    if 'new_item' in payload:
+        for item in extract_item_info_from_payload(payload):
+            if 'id' not in item:
+                continue
+            batch['items'].append((
+                item['id'], item.get('market_name'), item.get('type'), item.get('category'),
+                item.get('sub_type'), item.get('rarity'), item.get('wear_name'), item.get('wear'),
+                item.get('market_value'), item.get('suggested_price'), item.get('purchase_price'),
+                item.get('above_recommended_price'), None, item.get('preview_id'), item.get('name_color'),
+                item.get('is_commodity', 0), item.get('price_is_unreliable', 0), item.get('published_at')
+            ))
+
+    elif 'auction_update' in payload:
+        try:
+            add_auctions(batch, payload, timestamp, chrome_timestamp)
+        except json.JSONDecodeError:
+            # Skip malformed auction data
+            pass
+
+
+DECODERS = {'basic': decode_basic, 'enhanced': decode_enhanced}
+
+
+def decode_range(filename, start, end, mode, skip=()):
+    """Worker: decode one byte range, except the line numbers in skip; line numbers are relative to the range"""
+    decode = DECODERS[mode]
+    batch = new_batch()
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    for line_num, line in enumerate(data.splitlines(), 1):
+        batch['lines'] += 1
+        if line_num in skip:
+            continue
+        batch['keys'].append((line_num, line_key(line)))
+        try:
+            message = json.loads(line)
+            timestamp = batch['last_t'] = message['t']
+            decode(batch, line_num, message['payload'], timestamp, chrome_ts(timestamp))
+        except Exception as e:
+            # Rows decoded before the error stay, as in the one-threaded importers
+            batch['errors'] += 1
+            if batch['first_error'] is None:
+                batch['first_error'] = f"line {line_num}: {e}"
+    return batch
+
+
+class Writer:
+    """Single writer: one executemany per table per range, in file order"""
+
+    def __init__(self, conn, filename):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.bidder_stats = BidderStats()
+
+        # Only lines appended since the last import are written
+        self.checkpoint = ImportCheckpoint(self.cursor, filename)
+        if self.checkpoint.resumed:
+            self.bidder_stats.load_open(self.cursor)
+        self.lines = self.checkpoint.lines
+        self.frame_keys = FrameKeys(self.cursor)
+        self.rows = 0
+        self.errors = 0
+        self.last_t = None
+
+    def duplicates(self, batch):
+        """Line numbers of frames in the range that were already imported (their keys are recorded)"""
+        self.frame_keys.load_stored(key for _, key in batch['keys'])
+        return {line_num for line_num, key in batch['keys'] if self.frame_keys.is_duplicate(key)}
+
+    def write(self, batch):
+        cursor = self.cursor
+
+        # Bid changes are checked against earlier ranges before this range is stored;
+        # an auction deleted and updated again within the range has no stored rows
+        # yet, so its last state is kept here instead
+        auctions = self.bidder_stats.auctions
+        closed = {}
+        for event in batch['events']:
+            if event[0] == 'bid':
+                if event[1] in closed and event[1] not in auctions:
+                    auctions[event[1]] = closed.pop(event[1])
+                self.bidder_stats.bid(*event[1:], cursor)
+            else:
+                if event[1] in auctions:
+                    closed[event[1]] = list(auctions[event[1]])
+                self.bidder_stats.won(event[1])
+
+        if batch['items']:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO items
+                (item_id, market_name, type, category, sub_type, rarity, wear_name, wear_value,
+                 market_value, suggested_price, purchase_price, above_recommended_price,
+                 icon_url, preview_id, name_color, is_commodity, price_is_unreliable, published_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch['items'])
+        # First sighting order is kept, so new auctions get the same ids
+        cursor.executemany('INSERT OR IGNORE INTO auctions (auction_id) VALUES (?)', dict.fromkeys(batch['auctions']))
+        cursor.executemany('''
+            INSERT INTO auction_updates
+            (auction_id, timestamp, chrome_timestamp, highest_bid, highest_bidder,
+             number_of_bids, ends_at, above_recommended_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch['auction_updates'])
+
+        if batch['item_listings']:
+            # Range-relative line numbers -> capture line numbers
+            cursor.executemany('''
+                INSERT INTO item_listings (item_id, timestamp, chrome_timestamp, auction_ends_at)
+                VALUES (?, ?, ?, ?)
+            ''', [(self.lines + row[0],) + row[1:] for row in batch['item_listings']])
+        if batch['item_deletions']:
+            cursor.executemany('''
+                INSERT INTO item_deletions (item_id, timestamp, chrome_timestamp)
+                VALUES (?, ?, ?)
+            ''', batch['item_deletions'])
+        if batch['seller_status']:
+            cursor.executemany('INSERT OR IGNORE INTO sellers (deposit_id) VALUES (?)', dict.fromkeys(batch['sellers']))
+            cursor.executemany('''
+                INSERT INTO seller_status (deposit_id, timestamp, chrome_timestamp, is_online)
+                VALUES (?, ?, ?, ?)
+            ''', batch['seller_status'])
+            cursor.executemany('''
+                UPDATE sellers SET last_seen = CURRENT_TIMESTAMP WHERE deposit_id = ?
+            ''', dict.fromkeys(batch['sellers']))
+
+        self.rows += sum(len(batch[key]) for key in
+                         ('items', 'auction_updates', 'item_listings', 'item_deletions', 'seller_status'))
+        self.lines += batch['lines']
+        self.errors += batch['errors']
+        self.last_t = batch['last_t'] or self.last_t
+
+    def finish(self, offset):
+        """Commit everything up to byte offset, together with the checkpoint"""
+        # Auctions ended by the last imported frame are won; the rest continue in the next run
+        self.bidder_stats.end_auctions(frame_seconds(self.last_t))
+        self.bidder_stats.flush(self.cursor)
+        self.bidder_stats.save_open(self.cursor)
+        self.frame_keys.save()
+        self.checkpoint.advance(offset, self.lines)
+        self.checkpoint.save(self.cursor)
+        self.conn.commit()
+
+
+@contextmanager
+def bulk_load(conn):
+    """Fast, unsafe settings and no secondary indexes while the block runs; indexes rebuilt after"""
+    journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+    synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+    # UNIQUE/PRIMARY KEY indexes (no sql) stay - INSERT OR IGNORE depends on them
+    indexes = [(name, sql) for name, sql in
+               conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+               if name not in BULK_KEEP_INDEXES]
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX "{name}"')
+    conn.commit()
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        started = time.time()
+        for _, sql in indexes:
+            conn.execute(sql)
+        conn.execute('ANALYZE')
+        conn.commit()
+        print(f"Rebuilt {len(indexes)} index(es) and statistics in {time.time() - started:.1f}s")
+
+        conn.execute(f'PRAGMA journal_mode = {journal_mode}')
+        conn.execute(f'PRAGMA synchronous = {synchronous}')
+        conn.execute('PRAGMA mmap_size = 0')
+        conn.execute('PRAGMA locking_mode = NORMAL')
+        # The exclusive lock is only released by the next access
+        conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+
+
+def decoded_ranges(filename, ranges, mode, workers):
+    """Yield ((start, end), batch) in file order, decoding up to workers ranges ahead"""
+    if workers == 1:
+        for start, end in ranges:
+            yield (start, end), decode_range(filename, start, end, mode)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        ranges_left = iter(ranges)
+        while True:
+            # Keep a bounded window of ranges decoding; hand them out strictly in order
+            while len(pending) < workers * IN_FLIGHT_PER_WORKER:
+                start_end = next(ranges_left, None)
+                if start_end is None:
+                    break
+                pending.append((start_end, pool.submit(decode_range, filename, *start_end, mode)))
+            if not pending:
+                return
+            start_end, future = pending.pop(0)
+            yield start_end, future.result()
+
+
+def import_capture(filename, mode='basic', db_file=None, workers=None, chunk_bytes=CHUNK_BYTES, bulk=False):
+    """Import the new lines of a capture into an existing database; returns (lines, rows, errors, seconds)"""
+    conn = sqlite3.connect(db_file or DB_FILES[mode])
+    try:
+        with bulk_load(conn) if bulk else nullcontext():
+            return write_capture(conn, filename, mode, workers or os.cpu_count() or 1, chunk_bytes)
+    finally:
+        conn.close()
+
+
+def write_capture(conn, filename, mode, workers, chunk_bytes):
+    writer = Writer(conn, filename)
+    first_line = writer.lines
+    offset = writer.checkpoint.offset
+    if writer.checkpoint.resumed:
+        print(f"Resuming after line {first_line:,} (byte {offset:,})")
+    ranges = chunk_ranges(filename, chunk_bytes, offset)
+    total_bytes = sum(end - start for start, end in ranges)
+    done_bytes = 0
+    started = time.time()
+
+    for (start, end), batch in decoded_ranges(filename, ranges, mode, workers):
+        if batch['first_error']:
+            print(f"Error parsing range at byte {start:,}, {batch['first_error']} "
+                  f"({batch['errors']} bad line(s) in range)")
+        # Rare (overlapping captures): decode the range again without the repeated frames
+        skip = writer.duplicates(batch)
+        if skip:
+            batch = decode_range(filename, start, end, mode, skip)
+        writer.write(batch)
+        offset = end
+        done_bytes += end - start
+        elapsed = time.time() - started
+        print(f"  {done_bytes / max(total_bytes, 1):6.1%}  {writer.lines - first_line:,} lines  "
+              f"{(writer.lines - first_line) / max(elapsed, 1e-6):,.0f} lines/s")
+
+    writer.finish(offset)
+    writer.frame_keys.report()
+    return writer.lines - first_line, writer.rows, writer.errors, time.time() - started
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    bulk = '--bulk' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--bulk']
+    filename = args[0] if len(args) > 0 else "csgoempire_websocket_data.jsonl"
+    mode = args[1] if len(args) > 1 else 'basic'
+    workers = int(args[2]) if len(args) > 2 else None
+
+    if mode not in DB_FILES:
+        print("Usage: python parallel_import.py [capture.jsonl] [basic|enhanced] [workers] [--bulk]")
+        sys.exit(1)
+    if not os.path.exists(filename):
+        print(f"ERROR - Capture not found: {filename}")
+        sys.exit(1)
+
+    if mode == 'basic':
+        from create_csgoempire_db import create_database, show_database_stats
+        create_database()
+    else:
+        from robust_item_parser import create_enhanced_database, show_item_analysis
+        create_enhanced_database()
+
+    print(f"Importing {filename} ({mode}) with {workers or os.cpu_count()} worker(s)"
+          f"{' - bulk load' if bulk else ''}...")
+    lines, rows, errors, elapsed = import_capture(filename, mode, workers=workers, bulk=bulk)
+    print("WebSocket data imported successfully!")
+    print(f"  {lines:,} lines, {rows:,} rows, {errors:,} bad line(s) in {elapsed:.1f}s "
+          f"({lines / max(elapsed, 1e-6):,.0f} lines/s)")
+
+    if mode == 'basic':
+        show_database_stats()
+    else:
+        show_item_analysis()
@@ -5,8 +5,11 @@ Query and analyze the CSGOEmpire database
 """
 
 import sqlite3
+import time
 from datetime import datetime, timedelta
 
+import item_search
+
 def query_database():
     """Query database and show analysis"""
     conn = sqlite3.connect('csgoempire_monitor.db')
@@ -103,17 +106,19 @@ def query_database():
     
     print()
     
-    # Recent activity
+    # Recent activity (integer epoch-ms ranges - index range scans)
+    hour_ago_ms = int(time.time() * 1000) - 60 * 60 * 1000
+    
     cursor.execute('''
         SELECT COUNT(*) FROM auction_updates 
-        WHERE timestamp > datetime('now', '-1 hour')
-    ''')
+        WHERE timestamp_ms > ?
+    ''', (hour_ago_ms,))
     recent_updates = cursor.fetchone()[0]
     
     cursor.execute('''
         SELECT COUNT(*) FROM items 
-        WHERE published_at > datetime('now', '-1 hour')
-    ''')
+        WHERE published_at_ms > ?
+    ''', (hour_ago_ms,))
     recent_items = cursor.fetchone()[0]
     
     print("📊 RECENT ACTIVITY (Last Hour)")
@@ -126,23 +131,16 @@ def query_database():
 def get_item_details(item_name):
     """Get details for a specific item"""
     conn = sqlite3.connect('csgoempire_monitor.db')
-    cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT market_name, market_value, type, wear_name, published_at
-        FROM items 
-        WHERE market_name LIKE ?
-        ORDER BY published_at DESC
-        LIMIT 5
-    ''', (f'%{item_name}%',))
+    # Full-text index (prefix words, "phrases", best matches first)
+    results = item_search.search(conn, item_name, limit=5)
     
     print(f"\n🔍 SEARCH RESULTS FOR: {item_name}")
     print("-" * 80)
     
-    results = cursor.fetchall()
     if results:
         for row in results:
-            print(f"📦 {row[0]} - ${row[1]:,} ({row[2]}, {row[3]}) - {row[4][:19]}")
+            print(f"📦 {row[0]} - ${row[1] or 0:,} ({row[2]}, {row[3]}) - {(row[4] or '')[:19]}")
     else:
         print("No items found matching that name")
     
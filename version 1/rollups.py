@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+rollups.py
+Rollup tables for the dashboard, advanced from rowid watermarks
+
+The dashboard used to re-run GROUP BY joins over items and auction_updates
+on every refresh. Instead, refresh() folds only the rows added since the
+last call (auction_updates.id / items.id above the saved watermark) into:
+
+    rollup_minutes          per-minute counts per event type (new_item, auction_update)
+    rollup_auctions         per-auction current state: bid, leader, bids, updates, first/last update
+    rollup_auction_minutes  per-auction updates per minute, kept ROLLUP_KEEP_MINUTES
+    rollup_items            item ids seen (items rows are replaced on relisting - counted once)
+    rollup_state            watermark and row total per source table
+
+Per-bidder counters are the bidders table, already kept by bidder_stats.py.
+Any writer works (monitor, importers, parallel_import): the rollups and
+the watermark are written in one transaction, so a refresh that fails
+leaves nothing half-counted, and the next one picks up where it stopped.
+Window queries have minute resolution.
+
+    python rollups.py [csgoempire_monitor.db]     # build or advance the rollups
+"""
+
+import sqlite3
+import sys
+import time
+
+DB_FILE = 'csgoempire_monitor.db'
+
+# Rows folded per transaction (the first refresh of a large database takes several)
+REFRESH_CHUNK_ROWS = 200000
+
+# Per-auction minute counts older than this are dropped (the dashboard looks back 60 minutes)
+ROLLUP_KEEP_MINUTES = 120
+
+MINUTE_MS = 60 * 1000
+
+
+def create_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        source TEXT PRIMARY KEY,
+        last_rowid INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS rollup_minutes (
+        minute_ms INTEGER,
+        event_type TEXT,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (minute_ms, event_type)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS rollup_auctions (
+        auction_id INTEGER PRIMARY KEY,
+        updates INTEGER NOT NULL,
+        highest_bid INTEGER,
+        highest_bidder INTEGER,
+        number_of_bids INTEGER,
+        ends_at INTEGER,
+        first_update_ms INTEGER,
+        last_update_ms INTEGER
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS rollup_auction_minutes (
+        minute_ms INTEGER,
+        auction_id INTEGER,
+        updates INTEGER NOT NULL,
+        PRIMARY KEY (minute_ms, auction_id)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS rollup_items (
+        item_id INTEGER PRIMARY KEY
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_rollup_auctions_last_update_ms ON rollup_auctions (last_update_ms)')
+
+
+def _watermark(cursor, source):
+    cursor.execute('SELECT last_rowid FROM rollup_state WHERE source = ?', (source,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def _advance(cursor, source, last_rowid, added):
+    cursor.execute('''
+        INSERT INTO rollup_state (source, last_rowid, total) VALUES (?, ?, ?)
+        ON CONFLICT(source) DO UPDATE SET last_rowid = excluded.last_rowid, total = total + excluded.total
+    ''', (source, last_rowid, added))
+
+
+def _fold_auction_updates(cursor, low, high, keep_from_ms):
+    """Rows low < id <= high of auction_updates"""
+    cursor.execute('''
+        INSERT INTO rollup_minutes (minute_ms, event_type, count)
+        SELECT timestamp_ms / ? * ?, 'auction_update', COUNT(*)
+        FROM auction_updates
+        WHERE id > ? AND id <= ? AND timestamp_ms IS NOT NULL
+        GROUP BY 1
+        ON CONFLICT(minute_ms, event_type) DO UPDATE SET count = count + excluded.count
+    ''', (MINUTE_MS, MINUTE_MS, low, high))
+
+    cursor.execute('''
+        INSERT INTO rollup_auction_minutes (minute_ms, auction_id, updates)
+        SELECT timestamp_ms / ? * ?, auction_id, COUNT(*)
+        FROM auction_updates
+        WHERE id > ? AND id <= ? AND timestamp_ms >= ?
+        GROUP BY 1, 2
+        ON CONFLICT(minute_ms, auction_id) DO UPDATE SET updates = updates + excluded.updates
+    ''', (MINUTE_MS, MINUTE_MS, low, high, keep_from_ms))
+
+    # Bid and bid count never go down (max, like the old GROUP BY); leader and end time from the latest update
+    cursor.execute('''
+        WITH new AS (
+            SELECT auction_id, COUNT(*) AS updates, MAX(highest_bid) AS highest_bid,
+                   MAX(number_of_bids) AS number_of_bids, MIN(timestamp_ms) AS first_ms,
+                   MAX(timestamp_ms) AS last_ms, MAX(id) AS last_id
+            FROM auction_updates
+            WHERE id > ? AND id <= ?
+            GROUP BY auction_id
+        )
+        INSERT INTO rollup_auctions (auction_id, updates, highest_bid, highest_bidder, number_of_bids,
+                                     ends_at, first_update_ms, last_update_ms)
+        SELECT new.auction_id, new.updates, new.highest_bid, au.highest_bidder, new.number_of_bids,
+               au.ends_at, new.first_ms, new.last_ms
+        FROM new JOIN auction_updates au ON au.id = new.last_id
+        WHERE true
+        ON CONFLICT(auction_id) DO UPDATE SET
+            updates = updates + excluded.updates,
+            highest_bid = MAX(COALESCE(highest_bid, excluded.highest_bid), COALESCE(excluded.highest_bid, highest_bid)),
+            number_of_bids = MAX(COALESCE(number_of_bids, excluded.number_of_bids),
+                                 COALESCE(excluded.number_of_bids, number_of_bids)),
+            highest_bidder = excluded.highest_bidder,
+            ends_at = excluded.ends_at,
+            first_update_ms = COALESCE(MIN(first_update_ms, excluded.first_update_ms), first_update_ms, excluded.first_update_ms),
+            last_update_ms = COALESCE(MAX(last_update_ms, excluded.last_update_ms), last_update_ms, excluded.last_update_ms)
+    ''', (low, high))
+
+
+def _fold_items(cursor, low, high):
+    """Rows low < id <= high of items; returns the number of item ids not seen before"""
+    cursor.execute('''
+        INSERT INTO rollup_minutes (minute_ms, event_type, count)
+        SELECT published_at_ms / ? * ?, 'new_item', COUNT(*)
+        FROM items
+        WHERE id > ? AND id <= ? AND published_at_ms IS NOT NULL
+        GROUP BY 1
+        ON CONFLICT(minute_ms, event_type) DO UPDATE SET count = count + excluded.count
+    ''', (MINUTE_MS, MINUTE_MS, low, high))
+    cursor.execute('INSERT OR IGNORE INTO rollup_items (item_id) SELECT item_id FROM items WHERE id > ? AND id <= ?',
+                   (low, high))
+    return cursor.rowcount
+
+
+def refresh(conn, now_ms=None):
+    """Fold rows added since the last refresh into the rollups; returns rows folded"""
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    keep_from_ms = (now_ms - ROLLUP_KEEP_MINUTES * MINUTE_MS) // MINUTE_MS * MINUTE_MS
+    cursor = conn.cursor()
+    create_tables(cursor)
+    conn.commit()
+
+    folded = 0
+    for source in ('auction_updates', 'items'):
+        while True:
+            # Holds the write lock: no rows can be added between reading the end and saving the watermark
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                low = _watermark(cursor, source)
+                cursor.execute(f'SELECT MAX(id) FROM {source}')
+                end = cursor.fetchone()[0] or 0
+                high = min(end, low + REFRESH_CHUNK_ROWS)
+                if high <= low:
+                    conn.rollback()
+                    break
+                if source == 'auction_updates':
+                    # An id range can have gaps (rows deleted by hand)
+                    cursor.execute('SELECT COUNT(*) FROM auction_updates WHERE id > ? AND id <= ?', (low, high))
+                    added = cursor.fetchone()[0]
+                    _fold_auction_updates(cursor, low, high, keep_from_ms)
+                else:
+                    added = _fold_items(cursor, low, high)
+                _advance(cursor, source, high, added)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            folded += high - low
+            if high == end:
+                break
+
+    cursor.execute('DELETE FROM rollup_auction_minutes WHERE minute_ms < ?', (keep_from_ms,))
+    conn.commit()
+    return folded
+
+
+def total(cursor, source):
+    """Rows folded from auction_updates, or distinct items for 'items'"""
+    cursor.execute('SELECT total FROM rollup_state WHERE source = ?', (source,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def count_since(cursor, event_type, since_ms):
+    """Events of one type from the minute containing since_ms on"""
+    cursor.execute('SELECT COALESCE(SUM(count), 0) FROM rollup_minutes WHERE event_type = ? AND minute_ms >= ?',
+                   (event_type, since_ms // MINUTE_MS * MINUTE_MS))
+    return cursor.fetchone()[0]
+
+
+def active_auctions(cursor, since_ms, limit):
+    """Most-updated auctions since since_ms: (market_name, auction_id, updates, bid, bids, last_update_ms)"""
+    cursor.execute('''
+        SELECT i.market_name, m.auction_id, m.updates, a.highest_bid, a.number_of_bids, a.last_update_ms
+        FROM (
+            SELECT auction_id, SUM(updates) AS updates
+            FROM rollup_auction_minutes
+            WHERE minute_ms >= ?
+            GROUP BY auction_id
+        ) m
+        JOIN rollup_auctions a ON a.auction_id = m.auction_id
+        JOIN items i ON i.item_id = m.auction_id
+        ORDER BY m.updates DESC
+        LIMIT ?
+    ''', (since_ms // MINUTE_MS * MINUTE_MS, limit))
+    return cursor.fetchall()
+
+
+def active_auction_count(cursor, since_ms):
+    cursor.execute('SELECT COUNT(*) FROM rollup_auctions WHERE last_update_ms >= ?', (since_ms // MINUTE_MS * MINUTE_MS,))
+    return cursor.fetchone()[0]
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    db_file = sys.argv[1] if len(sys.argv) > 1 else DB_FILE
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        started = time.time()
+        folded = refresh(conn)
+        cursor = conn.cursor()
+        print(f"✓ {folded:,} row(s) folded in {time.time() - started:.1f}s")
+        print(f"  {total(cursor, 'auction_updates'):,} auction updates, {total(cursor, 'items'):,} items")
+    except sqlite3.Error as e:
+        print(f"✗ Refresh failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Bidder Tracker
+Bidder stats from auction state transitions, buffered in memory and flushed in batches
+
+An auction_update only counts as a bid when it changes the auction's state:
+a new bidder takes the lead (and the previous leader is outbid) or the
+leader raises. Repeated/stale updates count nothing. total_spent grows only
+when an auction is sold, by the winning bid.
+
+Changes made while a batch is being written are journaled (begin()) and
+undone by rollback() when its transaction fails, so a retried batch counts
+its bids and wins once.
+"""
+
+# Flush buffered bidder deltas after this many bid transitions or this long
+FLUSH_TRANSITIONS = 200
+FLUSH_MS = 5000
+
+# Forget open auctions this long after they were due to end
+STALE_AUCTION_MS = 24 * 60 * 60 * 1000
+
+# {table} is bidders, or the shadow table a rebuild fills (migrate_bidder_stats.py)
+UPSERT_SQL = '''
+    INSERT INTO {table} (
+        bidder_id, total_bids, total_spent, auctions_won, times_outbid,
+        highest_bid, first_seen_ms, last_seen_ms
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(bidder_id) DO UPDATE SET
+        total_bids = total_bids + excluded.total_bids,
+        total_spent = total_spent + excluded.total_spent,
+        auctions_won = auctions_won + excluded.auctions_won,
+        times_outbid = times_outbid + excluded.times_outbid,
+        highest_bid = MAX(highest_bid, excluded.highest_bid),
+        last_seen = CASE WHEN excluded.total_bids > 0 THEN CURRENT_TIMESTAMP ELSE last_seen END,
+        first_seen_ms = MIN(COALESCE(first_seen_ms, excluded.first_seen_ms), excluded.first_seen_ms),
+        last_seen_ms = MAX(COALESCE(last_seen_ms, 0), COALESCE(excluded.last_seen_ms, 0))
+'''
+
+# Delta slots: [bids, spent, won, outbid, highest_bid, first_ms, last_ms]
+BIDS, SPENT, WON, OUTBID, HIGHEST, FIRST_MS, LAST_MS = range(7)
+
+
+class BidderTracker:
+    """Per-auction leader state plus per-bidder deltas waiting to be flushed"""
+
+    def __init__(self, flush_transitions=FLUSH_TRANSITIONS, flush_ms=FLUSH_MS):
+        self.auctions = {}      # auction_id -> [bidder, bid, number_of_bids, ends_at]
+        self.deltas = {}        # bidder_id -> delta slots
+        self.transitions = 0
+        self.last_flush_ms = None
+        self.flush_transitions = flush_transitions
+        self.flush_ms = flush_ms
+        self.journal = None     # (auctions, deltas, transitions) before the open batch; None outside one
+
+    def begin(self):
+        """Start journaling: rollback() returns to this point"""
+        self.journal = ({}, {}, self.transitions)
+
+    def commit(self):
+        """Keep every change since begin()"""
+        self.journal = None
+
+    def rollback(self):
+        """Undo every change since begin()"""
+        if self.journal is None:
+            return
+        auctions, deltas, transitions = self.journal
+        for auction_id, state in auctions.items():
+            if state is None:
+                self.auctions.pop(auction_id, None)
+            else:
+                self.auctions[auction_id] = state
+        for bidder, delta in deltas.items():
+            if delta is None:
+                self.deltas.pop(bidder, None)
+            else:
+                self.deltas[bidder] = delta
+        self.transitions = transitions
+        self.journal = None
+
+    def _save_auction(self, auction_id):
+        # First change of an auction in the batch: keep its state (a copy, states are mutable lists)
+        if self.journal is not None and auction_id not in self.journal[0]:
+            state = self.auctions.get(auction_id)
+            self.journal[0][auction_id] = list(state) if state is not None else None
+
+    def _delta(self, bidder):
+        if self.journal is not None and bidder not in self.journal[1]:
+            delta = self.deltas.get(bidder)
+            self.journal[1][bidder] = list(delta) if delta is not None else None
+        delta = self.deltas.get(bidder)
+        if delta is None:
+            delta = self.deltas[bidder] = [0, 0, 0, 0, 0, None, None]
+        return delta
+
+    def _load(self, cursor, auction_id):
+        """Most advanced stored state of an auction not seen in this session (None if new)
+
+        Ordered by bid count, not arrival, so a late stale update is never the state.
+        """
+        cursor.execute('''
+            SELECT highest_bidder, highest_bid, number_of_bids, ends_at
+            FROM auction_updates
+            WHERE auction_id = ?
+            ORDER BY number_of_bids DESC, highest_bid DESC, update_time_ms DESC
+            LIMIT 1
+        ''', (auction_id,))
+        row = cursor.fetchone()
+        return list(row) if row else None
+
+    def observe(self, cursor, auction_id, bidder, bid, number_of_bids, ends_at, ts_ms):
+        """Apply one auction_update (call before storing it); returns the transition
+
+        'lead' - bidder took the lead, 'raise' - leader bid again,
+        'repeat' - no change, 'stale' - older than the known state,
+        'no_bid' - no bidder yet (a new auction), nothing is counted.
+        """
+        if bidder is None:
+            return 'no_bid'
+        self._save_auction(auction_id)
+        state = self.auctions.get(auction_id)
+        if state is None and cursor is not None:
+            state = self._load(cursor, auction_id)
+
+        if state is not None:
+            prev_bidder, prev_bid, prev_count, _ = state
+            if (number_of_bids or 0) < (prev_count or 0) or (bid or 0) < (prev_bid or 0):
+                self.auctions[auction_id] = state
+                return 'stale'
+            if bidder == prev_bidder and number_of_bids == prev_count and bid == prev_bid:
+                self.auctions[auction_id] = state
+                return 'repeat'
+
+        if state is not None and bidder != state[0] and state[0] is not None:
+            self._delta(state[0])[OUTBID] += 1
+            transition = 'lead'
+        else:
+            transition = 'raise' if state is not None else 'lead'
+
+        delta = self._delta(bidder)
+        delta[BIDS] += 1
+        delta[HIGHEST] = max(delta[HIGHEST], bid or 0)
+        # Min/max: a rebuild replays auction by auction, not in time order
+        delta[FIRST_MS] = min(delta[FIRST_MS] or ts_ms, ts_ms)
+        delta[LAST_MS] = max(delta[LAST_MS] or ts_ms, ts_ms)
+        self.auctions[auction_id] = [bidder, bid, number_of_bids, ends_at]
+        self.transitions += 1
+        return transition
+
+    def close(self, cursor, auction_id, sold):
+        """Auction removed from the market; credits the winner if sold
+
+        Returns (winner, winning bid) - the last known leader, even if unsold.
+        """
+        self._save_auction(auction_id)
+        state = self.auctions.pop(auction_id, None)
+        if state is None and cursor is not None:
+            state = self._load(cursor, auction_id)
+        if state is None:
+            return None, None
+        winner, bid = state[0], state[1]
+        if sold and winner is not None:
+            self.credit_win(winner, bid)
+        return winner, bid
+
+    def credit_win(self, winner, bid):
+        """Count a won auction and its winning bid"""
+        delta = self._delta(winner)
+        delta[WON] += 1
+        delta[SPENT] += bid or 0
+        delta[HIGHEST] = max(delta[HIGHEST], bid or 0)
+        self.transitions += 1
+
+    def forget(self, auction_id):
+        """Drop an auction's state without crediting anyone"""
+        self._save_auction(auction_id)
+        self.auctions.pop(auction_id, None)
+
+    def due(self, ts_ms):
+        """True when enough transitions or time have accumulated for a flush"""
+        if self.last_flush_ms is None:
+            self.last_flush_ms = ts_ms
+        return bool(self.deltas) and (
+            self.transitions >= self.flush_transitions or ts_ms - self.last_flush_ms >= self.flush_ms
+        )
+
+    def flush(self, conn, ts_ms=None):
+        """Write every buffered delta in one executemany + commit; returns bidders written
+
+        Deltas are only cleared once the commit succeeded.
+        """
+        if not self.deltas:
+            return 0
+        rows = self.rows()
+        conn.cursor().executemany(UPSERT_SQL.format(table='bidders'), rows)
+        conn.commit()
+        self.deltas = {}
+        self.transitions = 0
+        if ts_ms is not None:
+            self.last_flush_ms = ts_ms
+            self.prune(ts_ms)
+        return len(rows)
+
+    def rows(self):
+        """Buffered deltas as UPSERT_SQL parameter rows"""
+        return [
+            (bidder, d[BIDS], d[SPENT], d[WON], d[OUTBID], d[HIGHEST], d[FIRST_MS], d[LAST_MS])
+            for bidder, d in self.deltas.items()
+        ]
+
+    def prune(self, ts_ms):
+        """Forget auctions that ended long ago without a deleted_item event"""
+        cutoff = ts_ms - STALE_AUCTION_MS
+        for auction_id in [a for a, s in self.auctions.items() if s[3] and s[3] * 1000 < cutoff]:
+            del self.auctions[auction_id]
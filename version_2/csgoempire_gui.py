@@ -11,12 +11,23 @@ import time
 import threading
 import sqlite3
 import json
-import re
 import requests
 from datetime import datetime
 from websocket import create_connection, WebSocketException
 import sys
 
+from schema import DB_FILE
+import migrations
+from timestamps import now_ms
+from storage import open_backend
+from spool import Spool, SpoolConsumer, SPOOL_DIR
+from dedup import FrameDedup, frame_key
+from price_index import PriceIndex
+from frames import Frame, decode_frame
+import rules
+from watchlist import Watchlist, format_metrics
+import partitions
+
 class CSGOEmpireMonitorGUI:
     def __init__(self, root):
         self.root = root
@@ -37,6 +48,25 @@ class CSGOEmpireMonitorGUI:
         self.port = 9222
         self.url = "https://csgoempire.com/withdraw/steam/market"
 
+        # Time partitions: None keeps one growing database, 'day'/'week' rolls
+        # closed periods out of the hot database into partitions/
+        self.partition_period = None
+        self.rollover_key = None
+
+        # Columnar analytics copy of every record: None, 'duckdb' or 'parquet'
+        self.analytics_sink = None
+
+        # Fair prices (price_index.py) are kept in memory and saved every few minutes
+        self.price_checkpoint_seconds = 300
+        self.price_checkpoint_at = 0
+
+        # Deal alerts: a rules file (python rules.py --example), a watchlist file
+        # (watchlist.py - re-read when it changes) and where alerts go
+        # (file:PATH, unix:PATH, http://...); None turns either off
+        self.rules_file = None
+        self.watchlist_file = None
+        self.alert_sinks = ['file:sniper_alerts.jsonl']
+
         # Price values from API are already in USD cents, just need to divide by 100
         # No conversion needed - values are stored as cents
 
@@ -45,6 +75,7 @@ class CSGOEmpireMonitorGUI:
 
         self.setup_ui()
         self.setup_database()
+        self.setup_alerts()
 
         # Auto-check for existing Chrome instance on startup
         self.root.after(500, self.auto_detect_chrome)
@@ -251,137 +282,42 @@ class CSGOEmpireMonitorGUI:
         
     def setup_database(self):
         """Create enhanced database schema for snapshot tracking"""
-        conn = sqlite3.connect('csgoempire_monitor.db')
-        cursor = conn.cursor()
-        
-        # Items master table - one row per unique item ID
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS items (
-            item_id INTEGER PRIMARY KEY,
-            market_name TEXT,
-            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            total_snapshots INTEGER DEFAULT 0,
-            deleted_at TIMESTAMP DEFAULT NULL
-        )
-        ''')
-        
-        # Item snapshots - every state change
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS item_snapshots (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            item_id INTEGER NOT NULL,
-            snapshot_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            
-            -- Item details
-            market_name TEXT,
-            market_value INTEGER,
-            suggested_price INTEGER,
-            purchase_price INTEGER,
-            above_recommended_price REAL,
-            
-            -- Item classification
-            type TEXT,
-            category TEXT,
-            sub_type TEXT,
-            rarity TEXT,
-            
-            -- Wear info
-            wear REAL,
-            wear_name TEXT,
-            
-            -- Auction state
-            auction_ends_at INTEGER,
-            auction_highest_bid INTEGER,
-            auction_highest_bidder INTEGER,
-            auction_number_of_bids INTEGER,
-            
-            -- Seller info
-            seller_online_status INTEGER,
-            seller_delivery_rate_recent REAL,
-            seller_delivery_rate_long REAL,
-            seller_delivery_time_recent INTEGER,
-            seller_delivery_time_long INTEGER,
-            seller_steam_level_min INTEGER,
-            seller_steam_level_max INTEGER,
-            
-            -- Other
-            published_at TEXT,
-            is_commodity INTEGER,
-            price_is_unreliable INTEGER,
-            
-            FOREIGN KEY (item_id) REFERENCES items(item_id)
-        )
-        ''')
-        
-        # Auction updates - real-time bidding activity
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS auction_updates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            auction_id INTEGER NOT NULL,
-            item_id INTEGER,
-            market_name TEXT,
-            update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-            highest_bid INTEGER,
-            highest_bidder INTEGER,
-            number_of_bids INTEGER,
-            above_recommended_price REAL,
-            ends_at INTEGER,
-
-            FOREIGN KEY (item_id) REFERENCES items(item_id)
-        )
-        ''')
-        
-        # Bidders - track bidder activity
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS bidders (
-            bidder_id INTEGER PRIMARY KEY,
-            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            total_bids INTEGER DEFAULT 0,
-            highest_bid INTEGER DEFAULT 0,
-            total_spent INTEGER DEFAULT 0
+        conn = sqlite3.connect(DB_FILE)
+
+        # Versioned in-place upgrade (PRAGMA user_version); copying old rows runs
+        # later in chunks on the consumer thread, between spool batches
+        self.pending_backfills = migrations.upgrade(conn, self.log)
+        for name in self.pending_backfills:
+            self.log(f"Upgrading existing rows in the background ({name})...")
+        self.prices = PriceIndex.load(conn)
+        conn.close()
+
+        # Every write goes through the storage backend (+ optional analytics sink)
+        self.storage = open_backend(
+            DB_FILE, self.analytics_sink,
+            on_error=lambda sink, e: self.log(f"✗ {type(sink).__name__} error: {e}")
         )
-        ''')
-        
-        # Deleted items - track when items are removed with sale type classification
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS deleted_items (
-            item_id INTEGER,
-            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-            -- Sale classification
-            sale_type TEXT,
-            had_bids INTEGER DEFAULT 0,
-            final_bid_count INTEGER DEFAULT 0,
-            final_bid_amount INTEGER DEFAULT NULL,
-            final_bidder INTEGER DEFAULT NULL,
-
-            -- Original listing info
-            was_auction INTEGER DEFAULT 0,
-            original_price INTEGER,
-
-            FOREIGN KEY (item_id) REFERENCES items(item_id)
+
+        # Capture only appends to the spool; the consumer thread writes the database
+        # (and first catches up on anything left from the last session). Replayed
+        # frames are dropped on both sides: in memory here, against frame_keys there
+        self.capture_dedup = FrameDedup(store=False)
+        self.spool = Spool(SPOOL_DIR)
+        self.consumer = SpoolConsumer(
+            SPOOL_DIR, self.storage,
+            on_records=self.show_records,
+            on_error=lambda e: self.log(f"Error processing (will retry): {e}"),
+            before_write=self.before_batch,
+            on_idle=self.run_backfill
         )
-        ''')
-        
-        # Create indexes for performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_item_id ON item_snapshots(item_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_time ON item_snapshots(snapshot_time)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_market_name ON item_snapshots(market_name)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_auction_updates_item_id ON auction_updates(item_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_auction_updates_time ON auction_updates(update_time)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_items_market_name ON items(market_name)')
-        
-        conn.commit()
-        conn.close()
+        self.consumer.start()
         self.log("✓ Enhanced database initialized with snapshot tracking")
         self.log("  - items: Master item registry")
         self.log("  - item_snapshots: Every state change")
         self.log("  - auction_updates: Real-time bids")
         self.log("  - bidders: Bidder profiles")
         self.log("  - deleted_items: Sale type tracking (auction_sold/auction_expired/delisted)")
+        self.log("  - dim_*: Lookup tables for names/types/categories/rarities/wear")
         
     def setup_log_file(self):
         """Setup log file for persistent logging"""
@@ -671,6 +607,33 @@ class CSGOEmpireMonitorGUI:
         # Run in background thread
         threading.Thread(target=run_launcher, daemon=True).start()
     
+    def setup_alerts(self):
+        """Deal rules and watchlist; matched in the capture thread, before anything is stored"""
+        self.rules = None
+        self.watchlist = None
+        self.alert_outputs = []
+        if not self.rules_file and not self.watchlist_file:
+            return
+        on_error = lambda source, e: self.log(f"✗ {type(source).__name__} error: {e}")
+        try:
+            # Shared by both
+            self.alert_outputs = [rules.CallbackSink(lambda alert: self.log(rules.format_alert(alert)))]
+            self.alert_outputs += [rules.open_alert_sink(spec, on_error) for spec in self.alert_sinks]
+        except Exception as e:
+            self.log(f"✗ Alert sink not opened: {e}")
+        if self.rules_file:
+            try:
+                compiled = rules.load_rules(self.rules_file)
+                self.rules = rules.RuleEngine(compiled, self.alert_outputs, on_error)
+                self.log(f"✓ {len(compiled)} deal rule(s) loaded from {self.rules_file}")
+            except Exception as e:
+                self.log(f"✗ Deal rules not loaded: {e}")
+        if self.watchlist_file:
+            self.watchlist = Watchlist(
+                self.watchlist_file, self.alert_outputs, on_error,
+                on_reload=lambda index: self.log(f"✓ Watchlist loaded: {index.size:,} entries from {self.watchlist_file}")
+            )
+
     def start_tracking(self):
         """Start WebSocket monitoring"""
         if self.is_monitoring:
@@ -696,6 +659,11 @@ class CSGOEmpireMonitorGUI:
         self.status_label.config(text="● READY", fg="#27ae60")
         self.status_detail.config(text="Tracking stopped")
         self.log("Tracking stopped by user")
+        skipped = self.capture_dedup.skipped + self.consumer.dedup.skipped
+        if skipped:
+            self.log(f"  Skipped {skipped:,} duplicate frame(s)")
+        if self.watchlist:
+            self.log(f"  Watchlist: {format_metrics(self.watchlist.metrics())}")
         
     def monitor_websocket(self):
         """Monitor WebSocket traffic"""
@@ -735,6 +703,7 @@ class CSGOEmpireMonitorGUI:
             message_count = 0
             while self.is_monitoring:
                 raw = cdp.recv()
+                received = time.perf_counter()
                 if not raw:
                     continue
 
@@ -750,6 +719,11 @@ class CSGOEmpireMonitorGUI:
                     payload = frame.get("payloadData", "")
 
                     if payload:
+                        # Replayed frame (same requestId, timestamp and payload) - drop before any work
+                        key = frame_key(payload, params.get("requestId"), params.get("timestamp"))
+                        if self.capture_dedup.is_duplicate(key):
+                            continue
+
                         message_count += 1
                         # Log first message to confirm we're receiving data
                         if message_count == 1:
@@ -771,7 +745,7 @@ class CSGOEmpireMonitorGUI:
                         self.log_raw(event_type, payload)
 
                         # Process the message
-                        self.process_message(payload)
+                        self.process_message(payload, key, received)
             
             cdp.close()
             self.log("WebSocket connection closed")
@@ -780,262 +754,119 @@ class CSGOEmpireMonitorGUI:
             self.log(f"✗ Monitor error: {type(e).__name__}: {e}")
             self.stop_tracking()
     
-    def process_message(self, payload):
-        """Process WebSocket message and store snapshots"""
-        conn = sqlite3.connect('csgoempire_monitor.db')
-        cursor = conn.cursor()
-        
+    def process_message(self, payload, key=None, received=None):
+        """Spool a WebSocket message - stored by the consumer thread, never blocks on the database"""
+        ts_ms = now_ms()
         try:
-            # NEW ITEM - Create full snapshot
-            if '"new_item"' in payload:
-                # Extract all available fields
-                id_match = re.search(r'"id":(\d+)', payload)
-                
-                if id_match:
-                    item_id = int(id_match.group(1))
-                    
-                    # Register item in master table
-                    name_match = re.search(r'"market_name":"([^"]+)"', payload)
-                    market_name = name_match.group(1) if name_match else None
-                    
-                    cursor.execute('''
-                        INSERT INTO items (item_id, market_name, total_snapshots)
-                        VALUES (?, ?, 1)
-                        ON CONFLICT(item_id) DO UPDATE SET
-                            market_name = COALESCE(excluded.market_name, market_name),
-                            last_seen = CURRENT_TIMESTAMP,
-                            total_snapshots = total_snapshots + 1
-                    ''', (item_id, market_name))
-                    
-                    # Create snapshot with ALL fields
-                    cursor.execute('''
-                        INSERT INTO item_snapshots (
-                            item_id, market_name, market_value, suggested_price, purchase_price,
-                            above_recommended_price, type, category, sub_type, rarity,
-                            wear, wear_name, auction_ends_at, auction_highest_bid,
-                            auction_highest_bidder, auction_number_of_bids,
-                            seller_online_status, seller_delivery_rate_recent, seller_delivery_rate_long,
-                            seller_delivery_time_recent, seller_delivery_time_long,
-                            seller_steam_level_min, seller_steam_level_max,
-                            published_at, is_commodity, price_is_unreliable
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        item_id,
-                        market_name,
-                        int(re.search(r'"market_value":(\d+)', payload).group(1)) if re.search(r'"market_value":(\d+)', payload) else None,
-                        int(re.search(r'"suggested_price":(\d+)', payload).group(1)) if re.search(r'"suggested_price":(\d+)', payload) else None,
-                        int(re.search(r'"purchase_price":(\d+)', payload).group(1)) if re.search(r'"purchase_price":(\d+)', payload) else None,
-                        float(re.search(r'"above_recommended_price":([\d.-]+)', payload).group(1)) if re.search(r'"above_recommended_price":([\d.-]+)', payload) else None,
-                        re.search(r'"type":"([^"]+)"', payload).group(1) if re.search(r'"type":"([^"]+)"', payload) else None,
-                        re.search(r'"category":"([^"]+)"', payload).group(1) if re.search(r'"category":"([^"]+)"', payload) else None,
-                        re.search(r'"sub_type":"([^"]+)"', payload).group(1) if re.search(r'"sub_type":"([^"]+)"', payload) else None,
-                        re.search(r'"rarity":"([^"]+)"', payload).group(1) if re.search(r'"rarity":"([^"]+)"', payload) else None,
-                        float(re.search(r'"wear":([\d.]+)', payload).group(1)) if re.search(r'"wear":([\d.]+)', payload) else None,
-                        re.search(r'"wear_name":"([^"]+)"', payload).group(1) if re.search(r'"wear_name":"([^"]+)"', payload) else None,
-                        int(re.search(r'"auction_ends_at":(\d+)', payload).group(1)) if re.search(r'"auction_ends_at":(\d+)', payload) else None,
-                        int(re.search(r'"auction_highest_bid":(\d+)', payload).group(1)) if re.search(r'"auction_highest_bid":(\d+)', payload) else None,
-                        int(re.search(r'"auction_highest_bidder":(\d+)', payload).group(1)) if re.search(r'"auction_highest_bidder":(\d+)', payload) else None,
-                        int(re.search(r'"auction_number_of_bids":(\d+)', payload).group(1)) if re.search(r'"auction_number_of_bids":(\d+)', payload) else None,
-                        int(re.search(r'"user_online_status":(\d+)', payload).group(1)) if re.search(r'"user_online_status":(\d+)', payload) else None,
-                        float(re.search(r'"delivery_rate_recent":([\d.]+)', payload).group(1)) if re.search(r'"delivery_rate_recent":([\d.]+)', payload) else None,
-                        float(re.search(r'"delivery_rate_long":([\d.]+)', payload).group(1)) if re.search(r'"delivery_rate_long":([\d.]+)', payload) else None,
-                        int(re.search(r'"delivery_time_minutes_recent":(\d+)', payload).group(1)) if re.search(r'"delivery_time_minutes_recent":(\d+)', payload) else None,
-                        int(re.search(r'"delivery_time_minutes_long":(\d+)', payload).group(1)) if re.search(r'"delivery_time_minutes_long":(\d+)', payload) else None,
-                        int(re.search(r'"steam_level_min_range":(\d+)', payload).group(1)) if re.search(r'"steam_level_min_range":(\d+)', payload) else None,
-                        int(re.search(r'"steam_level_max_range":(\d+)', payload).group(1)) if re.search(r'"steam_level_max_range":(\d+)', payload) else None,
-                        re.search(r'"published_at":"([^"]+)"', payload).group(1) if re.search(r'"published_at":"([^"]+)"', payload) else None,
-                        1 if re.search(r'"is_commodity":true', payload) else 0,
-                        1 if re.search(r'"price_is_unreliable":true', payload) else 0
-                    ))
-                    
-                    conn.commit()
-
-                    if market_name:
-                        value_cents = int(re.search(r'"market_value":(\d+)', payload).group(1)) if re.search(r'"market_value":(\d+)', payload) else 0
-                        value_usd = value_cents / 100.0
-                        self.log(f"📦 {market_name} - ${value_usd:,.2f} (ID: {item_id})")
-                    else:
-                        self.log(f"📦 Item ID: {item_id}")
-
-                    self.update_stats()
-            
-            # AUCTION UPDATE - Track bid changes
-            elif '"auction_update"' in payload:
-                auction_match = re.search(
-                    r'"id":(\d+).*?"auction_highest_bid":(\d+).*?"auction_highest_bidder":(\d+).*?"auction_number_of_bids":(\d+)',
-                    payload
-                )
-                if auction_match:
-                    auction_id = int(auction_match.group(1))
-                    bid = int(auction_match.group(2))
-                    bidder = int(auction_match.group(3))
-                    num_bids = int(auction_match.group(4))
-                    
-                    # Extract additional fields
-                    above_match = re.search(r'"above_recommended_price":([\d.-]+)', payload)
-                    ends_match = re.search(r'"auction_ends_at":(\d+)', payload)
-
-                    # Try to get item name from database
-                    cursor.execute('SELECT market_name FROM items WHERE item_id = ?', (auction_id,))
-                    result = cursor.fetchone()
-                    item_name = result[0] if result and result[0] else None
-
-                    # Insert auction update
-                    cursor.execute('''
-                        INSERT INTO auction_updates
-                        (auction_id, item_id, market_name, highest_bid, highest_bidder, number_of_bids,
-                         above_recommended_price, ends_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        auction_id,
-                        auction_id,  # Auction ID = Item ID
-                        item_name,   # Store market name if available
-                        bid,
-                        bidder,
-                        num_bids,
-                        float(above_match.group(1)) if above_match else None,
-                        int(ends_match.group(1)) if ends_match else None
-                    ))
-
-                    # Update/create bidder
-                    cursor.execute('''
-                        INSERT INTO bidders (bidder_id, total_bids, highest_bid)
-                        VALUES (?, 1, ?)
-                        ON CONFLICT(bidder_id) DO UPDATE SET
-                            total_bids = total_bids + 1,
-                            highest_bid = MAX(highest_bid, excluded.highest_bid),
-                            total_spent = total_spent + excluded.highest_bid,
-                            last_seen = CURRENT_TIMESTAMP
-                    ''', (bidder, bid))
-
-                    conn.commit()
-
-                    # Use item name for logging
-                    display_name = item_name if item_name else f"Item #{auction_id}"
-
-                    bid_usd = bid / 100.0
-                    self.log(f"⚔️  {display_name}: ${bid_usd:,.2f} by #{bidder} ({num_bids} bids)")
-                    self.update_stats()
-            
-            # DELETED ITEM - Track removal with sale type classification
-            elif '"deleted_item"' in payload:
-                deleted_match = re.findall(r'\d{6,}', payload)  # Find all item IDs
-                for item_id_str in deleted_match:
-                    item_id = int(item_id_str)
-
-                    # Check if item had auction updates (bids)
-                    cursor.execute('''
-                        SELECT
-                            COUNT(*) as bid_count,
-                            MAX(highest_bid) as final_bid,
-                            MAX(highest_bidder) as final_bidder
-                        FROM auction_updates
-                        WHERE auction_id = ?
-                    ''', (item_id,))
-
-                    auction_data = cursor.fetchone()
-                    bid_count = auction_data[0] if auction_data else 0
-                    final_bid = auction_data[1] if auction_data and auction_data[1] else None
-                    final_bidder = auction_data[2] if auction_data and auction_data[2] else None
-
-                    # Get original listing info
-                    cursor.execute('''
-                        SELECT auction_ends_at, purchase_price
-                        FROM item_snapshots
-                        WHERE item_id = ?
-                        ORDER BY snapshot_time ASC
-                        LIMIT 1
-                    ''', (item_id,))
-
-                    listing_data = cursor.fetchone()
-                    original_price = listing_data[1] if listing_data else None
-
-                    # Determine if it was an auction:
-                    # 1. If we have snapshot data, check auction_ends_at
-                    # 2. If no snapshot but has auction_updates, it's an auction
-                    if listing_data and listing_data[0] is not None:
-                        was_auction = 1  # Has auction_ends_at in snapshot
-                    elif bid_count > 0:
-                        was_auction = 1  # Has bids = must be auction
+            self.spool.append(payload, ts_ms, key)
+        except Exception as e:
+            self.log(f"Error spooling: {e}")
+        if self.rules or self.watchlist:
+            try:
+                for record in decode_frame(Frame(ts_ms, payload)):
+                    if self.rules:
+                        self.rules.evaluate(record, received)
+                    if self.watchlist:
+                        self.watchlist.match(record, received)
+            except Exception as e:
+                self.log(f"Error matching deal alerts: {e}")
+
+    def show_records(self, records):
+        """Log a stored batch and refresh the counters (consumer thread)"""
+        for record in records:
+            self.log_record(record)
+        if records:
+            self.update_stats()
+
+    def log_record(self, record):
+        """Log one stored record"""
+        data = record.data
+
+        # NEW ITEM - full snapshot
+        if record.kind == 'new_item':
+            market_name = data['market_name']
+            if market_name:
+                value_usd = (data['market_value'] or 0) / 100.0
+                fair = self.prices.quote(market_name, data['wear_name'] or '')
+                fair_str = f" [fair ${fair.median / 100:,.2f}]" if fair else ""
+                self.log(f"📦 {market_name} - ${value_usd:,.2f}{fair_str} (ID: {data['item_id']})")
+            else:
+                self.log(f"📦 Item ID: {data['item_id']}")
+
+        # AUCTION UPDATE - bid change
+        elif record.kind == 'auction_update':
+            display_name = data['market_name'] if data['market_name'] else f"Item #{data['auction_id']}"
+            bid_usd = data['highest_bid'] / 100.0
+            self.log(f"⚔️  {display_name}: ${bid_usd:,.2f} by #{data['highest_bidder']} ({data['number_of_bids']} bids)")
+
+        # DELETED ITEM - removal with sale type classification
+        elif record.kind == 'deleted_item':
+            item_id = data['item_id']
+            item_name = data['market_name']
+            sale_type = data['sale_type']
+            if sale_type == 'auction_sold':
+                # Always log auction sales (even without name) - important event
+                display_name = item_name if item_name else f"Item #{item_id}"
+                final_bid_usd = data['final_bid_amount'] / 100.0
+                self.log(f"🔨 {display_name} - AUCTION SOLD (${final_bid_usd:,.2f} - {data['final_bid_count']} bids) [ID: {item_id}]")
+            elif sale_type == 'auction_expired':
+                # Only log if we have the item name
+                if item_name:
+                    self.log(f"⏱️ {item_name} - AUCTION EXPIRED (no bids) [ID: {item_id}]")
+            else:
+                # For delisted items, only log if we have the item name
+                if item_name:
+                    original_price = data['original_price']
+                    if original_price:
+                        price_usd = original_price / 100.0
+                        price_str = f" (${price_usd:,.2f})"
                     else:
-                        was_auction = 0  # No snapshot, no bids = assume fixed price
+                        price_str = ""
+                    self.log(f"❌ {item_name}{price_str} - DELISTED [ID: {item_id}]")
+                # Skip logging items without names (not tracked from the start)
+
+    def before_batch(self):
+        """Runs on the consumer thread before each spool batch"""
+        conn = self.storage.connection()
+        self.check_rollover(conn)
+        self.update_prices(conn)
+        self.run_backfill()
+
+    def update_prices(self, conn):
+        """Fold newly stored rows into the price index; checkpoint it when due"""
+        self.prices.advance(conn)
+        if time.time() >= self.price_checkpoint_at:
+            self.prices.checkpoint(conn)
+            self.price_checkpoint_at = time.time() + self.price_checkpoint_seconds
+
+    def run_backfill(self):
+        """One chunk of a pending migration backfill; True if there was work"""
+        if not self.pending_backfills:
+            return False
+        # Rebuilds read bidder totals - write the buffered deltas first
+        self.storage.flush()
+        rows, name = migrations.backfill_step(self.storage.connection())
+        if name is None:
+            self.pending_backfills = []
+            self.log("✓ Database upgrade complete")
+            return False
+        return True
+
+    def check_rollover(self, conn):
+        """Roll closed periods into partition files once per new day/week"""
+        if not self.partition_period:
+            return
+        key = partitions.partition_key(now_ms(), self.partition_period)
+        if key == self.rollover_key:
+            return
+        for partition, rows in partitions.rollover(conn, self.partition_period, prices=self.prices).items():
+            self.log(f"🗄️  Rolled {rows:,} rows into partition {partition}")
+        self.rollover_key = key
 
-                    # Determine sale type based on logic
-                    if was_auction:
-                        if bid_count > 0:
-                            sale_type = 'auction_sold'
-                            icon = '🔨'
-                        else:
-                            sale_type = 'auction_expired'
-                            icon = '⏱️'
-                    else:
-                        # Fixed price item deleted - seller delisted it
-                        sale_type = 'delisted'
-                        icon = '❌'
-
-                    # Insert with classification
-                    cursor.execute('''
-                        INSERT INTO deleted_items (
-                            item_id, sale_type, had_bids, final_bid_count,
-                            final_bid_amount, final_bidder, was_auction, original_price
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        item_id,
-                        sale_type,
-                        1 if bid_count > 0 else 0,
-                        bid_count,
-                        final_bid,
-                        final_bidder,
-                        was_auction,
-                        original_price
-                    ))
-
-                    # Update items table
-                    cursor.execute('''
-                        UPDATE items
-                        SET deleted_at = CURRENT_TIMESTAMP
-                        WHERE item_id = ?
-                    ''', (item_id,))
-
-                    # Get item name for logging
-                    cursor.execute('SELECT market_name FROM items WHERE item_id = ?', (item_id,))
-                    result = cursor.fetchone()
-                    item_name = result[0] if result and result[0] else None
-
-                    # Log with sale type
-                    if sale_type == 'auction_sold':
-                        # Always log auction sales (even without name) - important event
-                        display_name = item_name if item_name else f"Item #{item_id}"
-                        final_bid_usd = final_bid / 100.0
-                        self.log(f"{icon} {display_name} - AUCTION SOLD (${final_bid_usd:,.2f} - {bid_count} bids) [ID: {item_id}]")
-                    elif sale_type == 'auction_expired':
-                        # Only log if we have the item name
-                        if item_name:
-                            self.log(f"{icon} {item_name} - AUCTION EXPIRED (no bids) [ID: {item_id}]")
-                    else:
-                        # For delisted items, only log if we have the item name
-                        if item_name:
-                            if original_price:
-                                price_usd = original_price / 100.0
-                                price_str = f" (${price_usd:,.2f})"
-                            else:
-                                price_str = ""
-                            self.log(f"{icon} {item_name}{price_str} - DELISTED [ID: {item_id}]")
-                        # Skip logging items without names (not tracked from the start)
-
-                conn.commit()
-                self.update_stats()
-        
-        except Exception as e:
-            self.log(f"Error processing: {e}")
-        
-        finally:
-            conn.close()
-    
     def update_stats(self):
         """Update statistics display"""
         try:
-            conn = sqlite3.connect('csgoempire_monitor.db')
+            conn = sqlite3.connect(DB_FILE)
             cursor = conn.cursor()
             
             cursor.execute('SELECT COUNT(*) FROM items')
@@ -1075,6 +906,14 @@ if __name__ == "__main__":
             app.raw_log_file.write(f"RAW SESSION ENDED: {session_end}\n")
             app.raw_log_file.write(f"{'='*80}\n\n")
             app.raw_log_file.close()
+
+            app.consumer.stop()
+            app.spool.close()
+            app.prices.advance(app.storage.connection())
+            app.prices.checkpoint(app.storage.connection())
+            app.storage.close()
+            for sink in app.alert_outputs:
+                sink.close()
         except:
             pass
         root.destroy()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Frame Dedup
+Drops WebSocket frames that were already seen - overlapping captures, reconnect replays, re-imports
+
+A frame's key is 63 bits of blake2b over its CDP requestId, chrome timestamp
+and payload; frames without CDP metadata get no key and are never dropped
+(identical payloads are legitimate there). A rolling Bloom filter answers
+"definitely new" for the hot window without I/O; a hit is confirmed against
+the recent keys kept in memory and, when a cursor is given, the frame_keys
+table (unique key), so a false positive never drops a frame. Keys of stored
+frames are written in the same transaction as their records.
+"""
+
+import hashlib
+import math
+from collections import deque
+
+from timestamps import now_ms
+
+# Keys per Bloom generation; two generations = the hot window
+BLOOM_KEYS = 200000
+BLOOM_ERROR_RATE = 0.001
+
+# Keys kept exactly in memory (confirms Bloom hits without the database)
+RECENT_KEYS = 50000
+
+# frame_keys rows older than this are pruned by the retention job
+FRAME_KEY_MAX_AGE_MS = 7 * 24 * 60 * 60 * 1000
+
+# Bloom warm-up on start: keys stored in the last ...
+WARM_WINDOW_MS = 6 * 60 * 60 * 1000
+
+
+def frame_key(payload, request_id=None, chrome_ts=None):
+    """63-bit key of a frame, or None without CDP metadata"""
+    if request_id is None and chrome_ts is None:
+        return None
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{request_id}|{chrome_ts}|".encode('utf-8'))
+    digest.update(payload.encode('utf-8') if isinstance(payload, str) else payload)
+    # Fits SQLite's INTEGER PRIMARY KEY; 0 is kept free for "no key"
+    return (int.from_bytes(digest.digest(), 'little') >> 1) or 1
+
+
+class RollingBloom:
+    """Two Bloom generations - once the current one holds `capacity` keys the older is dropped"""
+
+    def __init__(self, capacity=BLOOM_KEYS, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        # Optimal size/hash count for the target false-positive rate
+        self.bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 64)
+        self.hashes = max(int(round(self.bits / capacity * math.log(2))), 1)
+        self.current = bytearray((self.bits + 7) // 8)
+        self.previous = bytearray(len(self.current))
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing from the two halves of the key
+        h1, h2 = key & 0xFFFFFFFF, (key >> 32) | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        positions = self._positions(key)
+        for bits in (self.current, self.previous):
+            if all(bits[p >> 3] & (1 << (p & 7)) for p in positions):
+                return True
+        return False
+
+    def add(self, key):
+        if self.count >= self.capacity:
+            self.previous, self.current = self.current, bytearray(len(self.current))
+            self.count = 0
+        for p in self._positions(key):
+            self.current[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class FrameDedup:
+    """Duplicate check for frame keys plus the keys to store with the current batch
+
+    is_duplicate() marks new keys as seen at once (duplicates inside a batch are
+    caught too); the caller saves take_batch() with its records, or calls
+    rollback() when that write failed so the retry is not mistaken for a replay.
+    With store=False (capture side, memory only) nothing is queued.
+    """
+
+    def __init__(self, bloom_keys=BLOOM_KEYS, recent_keys=RECENT_KEYS, store=True):
+        self.store = store
+        self.bloom = RollingBloom(bloom_keys)
+        self.recent = set()
+        self.recent_order = deque()
+        self.recent_keys = recent_keys
+        self.batch = {}          # key -> seen_ms, not yet stored
+        self.checked = 0
+        self.skipped = 0
+        self.unkeyed = 0
+        self.false_positives = 0
+
+    def _remember(self, key):
+        self.bloom.add(key)
+        self.recent.add(key)
+        self.recent_order.append(key)
+        while len(self.recent_order) > self.recent_keys:
+            self.recent.discard(self.recent_order.popleft())
+
+    def warm(self, cursor, window_ms=WARM_WINDOW_MS):
+        """Load the keys stored in the last window_ms into the Bloom filter; returns keys loaded"""
+        cursor.execute('SELECT frame_key FROM frame_keys WHERE seen_ms >= ? ORDER BY seen_ms',
+                       (now_ms() - window_ms,))
+        loaded = 0
+        for (key,) in cursor:
+            self._remember(key)
+            loaded += 1
+        return loaded
+
+    def load_stored(self, cursor, keys):
+        """Remember which of keys are already in frame_keys (one query per 500 keys)
+
+        For bulk sources (log replay, extension exports) that may repeat
+        anything ever stored - a cold Bloom filter alone would call those keys
+        new. Returns keys found.
+        """
+        keys = [key for key in keys if key is not None]
+        found = 0
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            cursor.execute(f"SELECT frame_key FROM frame_keys WHERE frame_key IN ({','.join('?' * len(chunk))})",
+                           chunk)
+            for (key,) in cursor.fetchall():
+                self._remember(key)
+                found += 1
+        return found
+
+    def is_duplicate(self, key, cursor=None, seen_ms=None):
+        """True if the frame was seen before; a new key is remembered and queued for storage"""
+        if key is None:
+            self.unkeyed += 1
+            return False
+        self.checked += 1
+        if key in self.bloom:
+            duplicate = key in self.recent
+            if not duplicate and cursor is not None:
+                cursor.execute('SELECT 1 FROM frame_keys WHERE frame_key = ?', (key,))
+                duplicate = cursor.fetchone() is not None
+            if duplicate:
+                self.skipped += 1
+                return True
+            self.false_positives += 1
+        self._remember(key)
+        if self.store:
+            self.batch[key] = seen_ms if seen_ms is not None else now_ms()
+        return False
+
+    def take_batch(self):
+        """[(frame_key, seen_ms)] for the frames accepted since the last call"""
+        rows, self.batch = list(self.batch.items()), {}
+        return rows
+
+    def rollback(self):
+        """Forget the keys of a batch that was not stored"""
+        for key in self.batch:
+            self.recent.discard(key)
+        self.batch = {}
+
+    def stats(self):
+        return {
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'unkeyed': self.unkeyed,
+            'false_positives': self.false_positives,
+        }
+
+
+def save_keys(cursor, rows):
+    """Store accepted frame keys (caller commits with the frames' records)"""
+    cursor.executemany('INSERT OR IGNORE INTO frame_keys (frame_key, seen_ms) VALUES (?, ?)', rows)
+
+
+def prune_frame_keys(conn, max_age_ms=FRAME_KEY_MAX_AGE_MS, now=None):
+    """Delete keys older than max_age_ms; returns rows deleted"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM frame_keys WHERE seen_ms < ?',
+                   ((now if now is not None else now_ms()) - max_age_ms,))
+    deleted = max(cursor.rowcount, 0)
+    conn.commit()
+    return deleted
+
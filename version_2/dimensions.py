@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Dimension Tables
+Integer surrogate keys for the repeated text columns of item_snapshots/auction_updates
+"""
+
+# Original column name -> dimension table
+DIMENSIONS = {
+    'market_name': 'dim_market_names',
+    'type': 'dim_types',
+    'category': 'dim_categories',
+    'sub_type': 'dim_sub_types',
+    'rarity': 'dim_rarities',
+    'wear_name': 'dim_wear_names',
+}
+
+
+def create_dimension_tables(cursor):
+    """Create one (id, value) lookup table per dimension"""
+    for table in DIMENSIONS.values():
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            value TEXT NOT NULL UNIQUE
+        )
+        ''')
+
+
+class DimensionCache:
+    """Resolves dimension strings to surrogate keys without a round-trip per row
+
+    Every known value is loaded once; only the first sighting of a new value
+    touches the database. Keys handed out inside a transaction that is later
+    rolled back are forgotten via rollback() so the cache never points at a
+    row that was not committed.
+    """
+
+    def __init__(self, cursor=None):
+        self.ids = {column: {} for column in DIMENSIONS}
+        self.pending = []
+        if cursor is not None:
+            self.load(cursor)
+
+    def load(self, cursor):
+        """Load every existing dimension value"""
+        for column, table in DIMENSIONS.items():
+            cursor.execute(f'SELECT value, id FROM {table}')
+            self.ids[column] = dict(cursor.fetchall())
+        self.pending = []
+
+    def resolve(self, cursor, column, value):
+        """Return the surrogate key for value, inserting it on first sighting"""
+        if value is None:
+            return None
+        ids = self.ids[column]
+        key = ids.get(value)
+        if key is None:
+            table = DIMENSIONS[column]
+            cursor.execute(f'INSERT OR IGNORE INTO {table} (value) VALUES (?)', (value,))
+            cursor.execute(f'SELECT id FROM {table} WHERE value = ?', (value,))
+            key = cursor.fetchone()[0]
+            ids[value] = key
+            self.pending.append((column, value))
+        return key
+
+    def resolve_row(self, cursor, row):
+        """Map {column: text} to {column_id: key} for every dimension column present"""
+        return {
+            f"{column}_id": self.resolve(cursor, column, row.get(column))
+            for column in DIMENSIONS
+            if column in row
+        }
+
+    def commit(self):
+        """Keep keys created since the last commit/rollback"""
+        self.pending = []
+
+    def rollback(self):
+        """Forget keys created in a transaction that was rolled back"""
+        for column, value in self.pending:
+            self.ids[column].pop(value, None)
+        self.pending = []
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Parquet Export
+Incrementally exports item_snapshots, auction_updates and deleted_items to Parquet
+partitioned by event type and day
+
+Each run only exports rows above the per-table rowid high-water mark recorded
+in <export dir>/_export_state.json. Rows are read in keyset-paginated chunks
+and every chunk is written straight to its own file, so memory stays bounded
+by CHUNK_ROWS whatever the size of the database.
+
+Layout: export/event_type=<table>/day=<YYYY-MM-DD>/part-<first rowid>.parquet
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+from schema import DB_FILE, table_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_DIR = 'export'
+STATE_FILE = '_export_state.json'
+CHUNK_ROWS = 50000
+
+# table -> (source relation, rowid column, epoch-ms column used for the day partition)
+# The *_named views carry the dimension text so files need no lookups
+EXPORT_TABLES = {
+    'item_snapshots': ('item_snapshots_named', 'id', 'snapshot_time_ms'),
+    'auction_updates': ('auction_updates_named', 'id', 'update_time_ms'),
+    'deleted_items': ('deleted_items', 'id', 'deleted_at_ms'),
+}
+
+# Second-resolution CURRENT_TIMESTAMP text duplicated by the *_ms columns
+DROPPED_COLUMNS = {'snapshot_time', 'update_time', 'deleted_at'}
+
+# Low-cardinality text columns stored dictionary-encoded
+DICTIONARY_COLUMNS = {'market_name', 'type', 'category', 'sub_type', 'rarity', 'wear_name', 'sale_type'}
+
+
+def load_state(directory):
+    """{table: last exported rowid}"""
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(directory, state):
+    """Write the high-water marks atomically"""
+    path = os.path.join(directory, STATE_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def export_columns(cursor, table):
+    """[(column, arrow type)] exported for one table"""
+    source, _, _ = EXPORT_TABLES[table]
+    cursor.execute(f"PRAGMA table_info({table})")
+    declared = {col[1]: (col[2] or '').upper() for col in cursor.fetchall()}
+
+    columns = []
+    for column in table_columns(cursor, source):
+        if column in DROPPED_COLUMNS or (column.endswith('_id') and column[:-3] in DICTIONARY_COLUMNS):
+            continue
+        if column.endswith('_ms'):
+            arrow_type = pa.timestamp('ms', tz='UTC')
+        elif column in DICTIONARY_COLUMNS:
+            arrow_type = pa.dictionary(pa.int32(), pa.string())
+        elif 'INT' in declared.get(column, ''):
+            arrow_type = pa.int64()
+        elif 'REAL' in declared.get(column, ''):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        columns.append((column, arrow_type))
+    return columns
+
+
+def day_of(ms):
+    """Day partition of an epoch-ms value"""
+    if ms is None:
+        return 'unknown'
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def write_chunk(directory, table, schema, rows, day_index):
+    """Write one chunk as one file per day it spans"""
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(day_of(row[day_index]), []).append(row)
+
+    for day, day_rows in by_day.items():
+        arrays = [
+            pa.array([row[i + 1] for row in day_rows], type=field.type)
+            for i, field in enumerate(schema)
+        ]
+        part_dir = os.path.join(directory, f"event_type={table}", f"day={day}")
+        os.makedirs(part_dir, exist_ok=True)
+        # Named after the first rowid - re-exporting a chunk overwrites, never duplicates
+        path = os.path.join(part_dir, f"part-{day_rows[0][0]}.parquet")
+        pq.write_table(pa.Table.from_arrays(arrays, schema=schema), path, compression='zstd')
+    return len(by_day)
+
+
+def export_table(conn, table, directory=EXPORT_DIR, state=None, chunk_rows=CHUNK_ROWS):
+    """Export rows above the high-water mark; returns (rows, files)"""
+    state = state if state is not None else load_state(directory)
+    source, rowid, ms_column = EXPORT_TABLES[table]
+    cursor = conn.cursor()
+    columns = export_columns(cursor, table)
+    schema = pa.schema(columns)
+    names = [name for name, _ in columns]
+    day_index = names.index(ms_column) + 1
+
+    select = f"SELECT {rowid}, {', '.join(names)} FROM {source} WHERE {rowid} > ? ORDER BY {rowid} LIMIT ?"
+    exported = files = 0
+    while True:
+        cursor.execute(select, (state.get(table, 0), chunk_rows))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        files += write_chunk(directory, table, schema, rows, day_index)
+        exported += len(rows)
+        state[table] = rows[-1][0]
+        save_state(directory, state)
+    return exported, files
+
+
+def export_all(conn, directory=EXPORT_DIR, chunk_rows=CHUNK_ROWS):
+    """Export every table; returns {table: (rows, files)}"""
+    if pa is None:
+        raise ImportError("Parquet export needs the pyarrow package (pip install pyarrow)")
+    os.makedirs(directory, exist_ok=True)
+    state = load_state(directory)
+    return {
+        table: export_table(conn, table, directory, state, chunk_rows)
+        for table in EXPORT_TABLES
+    }
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    db_file = sys.argv[1] if len(sys.argv) > 1 else DB_FILE
+    directory = sys.argv[2] if len(sys.argv) > 2 else EXPORT_DIR
+
+    if not os.path.exists(db_file):
+        print(f"ERROR - Database not found: {db_file}")
+        sys.exit(1)
+
+    try:
+        # Read-only: exporting never blocks the tracker's writes
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        results = export_all(conn, directory)
+        conn.close()
+
+        print("✓ Export complete!")
+        for table, (rows, files) in results.items():
+            print(f"  {table}: {rows:,} new rows -> {files} file(s)")
+        print(f"  Output: {os.path.abspath(directory)}")
+
+    except Exception as e:
+        print(f"✗ Export failed: {e}")
+        sys.exit(1)
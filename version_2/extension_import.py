@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Extension Import
+Stores the frames of a browser-extension export (csgoempire_websocket_data.json)
+
+The extension's popup exports its stored messages as one pretty-printed JSON
+array of {data, url, timestamp}. The array is parsed one element at a time
+from a bounded text buffer, so memory stays flat however large the export.
+Each message becomes a Frame (timestamp = receive time in epoch ms, data = the
+raw Socket.IO payload) and goes through the same batched dedup -> decode ->
+write path as a log replay. The extension keeps a rolling window of messages,
+so consecutive exports overlap: frames are keyed by url, timestamp and
+payload, and importing every export stores each frame once.
+
+    python extension_import.py [csgoempire_websocket_data.json ...] [--db csgoempire_monitor.db]
+"""
+
+import json
+import os
+import sys
+import time
+
+from schema import DB_FILE
+from frames import Frame
+from dedup import frame_key
+from storage import open_backend, store_frames
+
+EXPORT_FILE = 'csgoempire_websocket_data.json'
+
+# Characters read per refill of the parse buffer
+CHUNK_CHARS = 1024 * 1024
+
+# One array element larger than this is treated as a broken export
+MAX_ELEMENT_CHARS = 64 * 1024 * 1024
+
+WHITESPACE = ' \t\r\n'
+
+# Characters that can continue a JSON number ('4' may be the start of '4.5e-3')
+NUMBER_CHARS = '0123456789+-.eE'
+
+
+def iter_json_array(f, chunk_chars=CHUNK_CHARS):
+    """Yield the elements of the top-level JSON array in text file f, one at a time"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def next_char():
+        """Skip whitespace; the next character (refilling as needed), '' at the end of the file"""
+        nonlocal buffer, pos, eof
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer[pos] if pos < len(buffer) else ''
+            chunk = f.read(chunk_chars)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+    if next_char() != '[':
+        raise ValueError("not a JSON array")
+    pos += 1
+    if next_char() == ']':
+        return
+
+    while True:
+        next_char()
+        try:
+            element, end = decoder.raw_decode(buffer, pos)
+            # An element ending at the buffer end may continue - a number
+            # even if what follows it is a '.' or 'e' that is still part of it
+            tail = end
+            if isinstance(element, (int, float)) and not isinstance(element, bool):
+                while tail < len(buffer) and buffer[tail] in NUMBER_CHARS:
+                    tail += 1
+            complete = tail < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            if len(buffer) - pos > MAX_ELEMENT_CHARS:
+                raise ValueError(f"array element over {MAX_ELEMENT_CHARS:,} characters")
+            chunk = f.read(chunk_chars)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        yield element
+        pos = end
+        separator = next_char()
+        pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f"expected ',' or ']' in the array, found {separator or 'end of file'!r}")
+
+
+class ExportReader:
+    """Streams (Frame, key) from an extension export; counts messages without a text payload"""
+
+    def __init__(self, path):
+        self.path = path
+        self.messages = 0
+        self.skipped = 0
+
+    def __iter__(self):
+        with open(self.path, encoding='utf-8') as f:
+            for message in iter_json_array(f):
+                self.messages += 1
+                data = message.get('data') if isinstance(message, dict) else None
+                # Binary frames are exported as {} - nothing to decode
+                if not isinstance(data, str) or not data:
+                    self.skipped += 1
+                    continue
+                timestamp = message.get('timestamp')
+                ts_ms = int(timestamp) if isinstance(timestamp, (int, float)) else None
+                yield Frame(ts_ms, data), frame_key(data, message.get('url'), timestamp)
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    import sqlite3
+
+    import migrations
+
+    args = sys.argv[1:]
+    db_file = DB_FILE
+    if '--db' in args:
+        index = args.index('--db')
+        db_file = args[index + 1] if index + 1 < len(args) else DB_FILE
+        del args[index:index + 2]
+    exports = args or [EXPORT_FILE]
+
+    for path in exports:
+        if not os.path.exists(path):
+            print(f"ERROR - Export not found: {path}")
+            sys.exit(1)
+
+    try:
+        # A new database is created; an old one is upgraded first
+        conn = sqlite3.connect(db_file, timeout=30)
+        migrations.upgrade(conn, log=lambda message: None)
+        migrations.backfill_all(conn)
+        conn.close()
+
+        storage = open_backend(db_file)
+        for path in exports:
+            started = time.time()
+            reader = ExportReader(path)
+            frames, records, skipped = store_frames(storage, reader)
+            elapsed = time.time() - started
+            print(f"✓ {path}: {reader.messages:,} message(s), {records:,} record(s) in {elapsed:.1f}s")
+            print(f"  {skipped:,} already stored, {reader.skipped:,} without a text payload")
+        storage.close()
+
+    except Exception as e:
+        print(f"✗ Import failed: {e}")
+        sys.exit(1)
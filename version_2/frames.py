@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Frames and Records
+Decodes captured WebSocket frames into typed records that storage backends write
+
+A Frame is one raw Socket.IO message as received (live, from a capture file or
+from an extension export); decode_frame() turns it into Records - one per
+new item snapshot, auction update or deleted item - using the same field
+extraction the GUI has always used.
+"""
+
+import re
+from collections import namedtuple
+
+from timestamps import now_ms, to_epoch_ms
+
+# ts_ms: receive time (epoch ms); request_id/chrome_ts: CDP metadata when captured
+Frame = namedtuple('Frame', 'ts_ms payload request_id chrome_ts', defaults=(None, None))
+
+# kind: 'new_item' | 'auction_update' | 'deleted_item'
+# data: column -> value; backends may add derived fields (e.g. sale_type)
+Record = namedtuple('Record', 'kind ts_ms data')
+
+RECORD_KINDS = ('new_item', 'auction_update', 'deleted_item')
+
+# Snapshot column -> (regex, converter); first match in the payload wins
+NEW_ITEM_FIELDS = [
+    ('market_name', r'"market_name":"([^"]+)"', str),
+    ('market_value', r'"market_value":(\d+)', int),
+    ('suggested_price', r'"suggested_price":(\d+)', int),
+    ('purchase_price', r'"purchase_price":(\d+)', int),
+    ('above_recommended_price', r'"above_recommended_price":([\d.-]+)', float),
+    ('type', r'"type":"([^"]+)"', str),
+    ('category', r'"category":"([^"]+)"', str),
+    ('sub_type', r'"sub_type":"([^"]+)"', str),
+    ('rarity', r'"rarity":"([^"]+)"', str),
+    ('wear', r'"wear":([\d.]+)', float),
+    ('wear_name', r'"wear_name":"([^"]+)"', str),
+    ('auction_ends_at', r'"auction_ends_at":(\d+)', int),
+    ('auction_highest_bid', r'"auction_highest_bid":(\d+)', int),
+    ('auction_highest_bidder', r'"auction_highest_bidder":(\d+)', int),
+    ('auction_number_of_bids', r'"auction_number_of_bids":(\d+)', int),
+    ('seller_online_status', r'"user_online_status":(\d+)', int),
+    ('seller_delivery_rate_recent', r'"delivery_rate_recent":([\d.]+)', float),
+    ('seller_delivery_rate_long', r'"delivery_rate_long":([\d.]+)', float),
+    ('seller_delivery_time_recent', r'"delivery_time_minutes_recent":(\d+)', int),
+    ('seller_delivery_time_long', r'"delivery_time_minutes_long":(\d+)', int),
+    ('seller_steam_level_min', r'"steam_level_min_range":(\d+)', int),
+    ('seller_steam_level_max', r'"steam_level_max_range":(\d+)', int),
+    ('published_at', r'"published_at":"([^"]+)"', str),
+]
+NEW_ITEM_PATTERNS = [(column, re.compile(pattern), convert) for column, pattern, convert in NEW_ITEM_FIELDS]
+
+ID_RE = re.compile(r'"id":(\d+)')
+AUCTION_RE = re.compile(
+    r'"id":(\d+).*?"auction_highest_bid":(\d+).*?"auction_highest_bidder":(\d+).*?"auction_number_of_bids":(\d+)'
+)
+ABOVE_RE = re.compile(r'"above_recommended_price":([\d.-]+)')
+ENDS_RE = re.compile(r'"auction_ends_at":(\d+)')
+DELETED_ID_RE = re.compile(r'\d{6,}')
+
+
+def decode_new_item(payload, ts_ms):
+    """Snapshot record for a new_item frame (None without an item id)"""
+    id_match = ID_RE.search(payload)
+    if not id_match:
+        return None
+    data = {'item_id': int(id_match.group(1))}
+    for column, pattern, convert in NEW_ITEM_PATTERNS:
+        match = pattern.search(payload)
+        data[column] = convert(match.group(1)) if match else None
+    data['is_commodity'] = 1 if '"is_commodity":true' in payload else 0
+    data['price_is_unreliable'] = 1 if '"price_is_unreliable":true' in payload else 0
+    data['published_at_ms'] = to_epoch_ms(data['published_at'])
+    return Record('new_item', ts_ms, data)
+
+
+def decode_auction_update(payload, ts_ms):
+    """Bid record for an auction_update frame (None without a complete bid)"""
+    match = AUCTION_RE.search(payload)
+    if not match:
+        return None
+    above_match = ABOVE_RE.search(payload)
+    ends_match = ENDS_RE.search(payload)
+    return Record('auction_update', ts_ms, {
+        'auction_id': int(match.group(1)),
+        'highest_bid': int(match.group(2)),
+        'highest_bidder': int(match.group(3)),
+        'number_of_bids': int(match.group(4)),
+        'above_recommended_price': float(above_match.group(1)) if above_match else None,
+        'ends_at': int(ends_match.group(1)) if ends_match else None,
+    })
+
+
+def decode_deleted_items(payload, ts_ms):
+    """One record per item id in a deleted_item frame"""
+    return [
+        Record('deleted_item', ts_ms, {'item_id': int(item_id)})
+        for item_id in DELETED_ID_RE.findall(payload)
+    ]
+
+
+def decode_frame(frame):
+    """Records carried by one frame (empty for other events)"""
+    payload = frame.payload
+    ts_ms = frame.ts_ms if frame.ts_ms is not None else now_ms()
+    if '"new_item"' in payload:
+        record = decode_new_item(payload, ts_ms)
+        return [record] if record else []
+    if '"auction_update"' in payload:
+        record = decode_auction_update(payload, ts_ms)
+        return [record] if record else []
+    if '"deleted_item"' in payload:
+        return decode_deleted_items(payload, ts_ms)
+    return []
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Index Advisor
+Runs EXPLAIN QUERY PLAN for every SQL statement shipped in the project against a
+generated large database, flags full scans and proposes covering indexes
+
+SQL is collected from literal execute()/executemany() arguments, module-level
+string constants passed to them and f-strings built only from such constants;
+other f-strings and .format() calls are counted as skipped. Targets are
+discovered: every version_2 module runs against schema.py, and each version 1
+database is checked with the files that name it plus the helper modules they
+import, its schema built from their CREATE statements.
+"""
+
+import ast
+import os
+import re
+import sqlite3
+import sys
+import random
+
+from schema import create_schema
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+V1 = os.path.join(ROOT, 'version 1')
+V2 = os.path.join(ROOT, 'version_2')
+
+# Generated rows per table (dimension tables get fewer)
+ROWS = 20000
+DIM_ROWS = 200
+
+# Files never checked: this tool and the tests
+EXCLUDED = ('index_advisor.py',)
+
+DB_NAME_RE = re.compile(r"""['"](\w+\.db)['"]""")
+
+
+def _modules(directory):
+    """{module name: path} of the project modules in a directory (tests excluded)"""
+    return {
+        name[:-3]: os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.endswith('.py') and not name.startswith('test_') and name not in EXCLUDED
+    }
+
+
+def _imports(path, modules):
+    """Project modules a file imports (anywhere in it)"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.add(node.module)
+    return sorted(names & set(modules))
+
+
+def discover_targets():
+    """({name: (schema: callable, or files whose CREATE statements build it, query files)},
+    paths of the files that open more than one database)"""
+    targets = {'v2 csgoempire_monitor.db': (create_schema, list(_modules(V2).values()))}
+
+    modules = _modules(V1)
+    databases = {}
+    for name, path in modules.items():
+        with open(path, encoding='utf-8') as f:
+            databases[name] = sorted(set(DB_NAME_RE.findall(f.read())))
+    shared = {path for name, path in modules.items() if len(databases[name]) > 1}
+    # Files that name a database, then the helpers (modules naming none) they import
+    for db in sorted({db for names in databases.values() for db in names}):
+        files = [name for name in modules if db in databases[name]]
+        pending = list(files)
+        while pending:
+            for imported in _imports(modules[pending.pop()], modules):
+                if not databases[imported] and imported not in files:
+                    files.append(imported)
+                    pending.append(imported)
+        paths = [modules[name] for name in files]
+        targets[f'v1 {db}'] = (paths, paths)
+    return targets, shared
+
+
+TARGETS, SHARED_FILES = discover_targets()
+
+# Tables that only exist while a migration runs (moved aside by
+# migrations.move_aside) -> the table whose columns they have
+ASIDE_TABLES = {
+    'deleted_items_rowid': 'deleted_items',
+    'time_to_sale_sketch_flat': 'time_to_sale_sketch',
+}
+
+# (file name, function) pairs that run per message or per dashboard refresh;
+# a table scan in any of these is a regression
+HOT_PATHS = {
+    ('csgoempire_gui.py', 'update_stats'),
+    ('storage.py', '_write_new_item'),
+    ('storage.py', '_write_auction_update'),
+    ('storage.py', '_write_deleted_item'),
+    ('dedup.py', 'is_duplicate'),
+    ('dedup.py', 'load_stored'),
+    ('frame_dedup.py', 'is_duplicate'),
+    ('frame_dedup.py', 'load_stored'),
+    ('bidder_tracker.py', '_load'),
+    ('bidder_stats.py', '_load'),
+    ('csgoempire_monitor.py', 'process_websocket_message'),
+    ('final_csgoempire_monitor.py', 'process_websocket_message'),
+    ('complete_csgoempire_monitor.py', 'process_websocket_message'),
+    ('complete_csgoempire_monitor.py', 'show_dashboard'),
+    ('dashboard.py', 'show_dashboard'),
+    ('live_dashboard.py', 'poll'),
+    ('item_search.py', 'search'),
+}
+
+SCAN_RE = re.compile(r'^SCAN (\w+)(?: USING (COVERING )?INDEX (\w+))?')
+# A virtual table (FTS5) with constraints passed to it: 'VIRTUAL TABLE INDEX 192:M1' is a
+# full-text lookup, 'INDEX 0:' with nothing after the colon reads every row
+VIRTUAL_SEARCH_RE = re.compile(r' VIRTUAL TABLE INDEX \d+:\S')
+ALIAS_RE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|JOIN|LEFT|INNER|ON|GROUP|ORDER|LIMIT|SET)(\w+))?', re.I)
+
+
+class Query:
+    """One SQL statement found in the source"""
+
+    def __init__(self, path, line, function, sql):
+        self.path = path
+        self.line = line
+        self.function = function
+        self.sql = sql
+        self.plan = []
+        self.scans = []          # [(kind, table, alias)] - kind 'table' or 'index'
+        self.error = None
+        self.suggestions = []
+
+    @property
+    def location(self):
+        return f"{os.path.basename(self.path)}:{self.line} ({self.function})"
+
+    @property
+    def skipped(self):
+        """Not literal SQL - no plan to check"""
+        return self.sql is None
+
+    @property
+    def hot(self):
+        return (os.path.basename(self.path), self.function) in HOT_PATHS
+
+
+class _Collector(ast.NodeVisitor):
+    """Collects SQL passed to execute()/executemany() with its enclosing function (None if not literal)"""
+
+    def __init__(self, path, constants):
+        self.path = path
+        self.constants = constants
+        self.stack = ['<module>']
+        self.statements = []
+
+    def visit_FunctionDef(self, node):
+        self.stack.append(node.name)
+        self.generic_visit(node)
+        self.stack.pop()
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr in ('execute', 'executemany') and node.args:
+            self.statements.append((node.lineno, self.stack[-1], self._string(node.args[0])))
+        self.generic_visit(node)
+
+    def _string(self, node):
+        """Text of a literal, a known constant or an f-string of known constants; else None"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name):
+            return self.constants.get(node.id)
+        if isinstance(node, ast.JoinedStr):
+            parts = []
+            for value in node.values:
+                if isinstance(value, ast.FormattedValue):
+                    if value.conversion != -1 or value.format_spec is not None:
+                        return None
+                    value = value.value
+                part = self._string(value)
+                if part is None:
+                    return None
+                parts.append(part)
+            return ''.join(parts)
+        return None
+
+
+def _module_constants(tree):
+    """{NAME: sql} of module-level string assignments (e.g. OPEN_AUCTIONS_SQL = '''...''')"""
+    constants = {}
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant)
+                and isinstance(node.value.value, str)):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    constants[target.id] = node.value.value
+    return constants
+
+
+def collect_sql(path):
+    """[(line, function, sql)] for every execute() in a file; sql is None when it is not literal"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    collector = _Collector(path, _module_constants(tree))
+    collector.visit(tree)
+    return collector.statements
+
+
+def is_query(sql):
+    """True for statements with a plan worth checking (reads, updates, deletes)"""
+    words = sql.split()
+    first = words[0].upper() if words else ''
+    if first in ('SELECT', 'WITH', 'UPDATE', 'DELETE'):
+        return True
+    return first == 'INSERT' and re.search(r'\bSELECT\b', sql, re.I) is not None
+
+
+def collect_queries(paths):
+    """Query objects for every checkable statement in the given files (and every skipped one)"""
+    queries = []
+    for path in paths:
+        for line, function, sql in collect_sql(path):
+            if sql is None:
+                queries.append(Query(path, line, function, None))
+            elif is_query(sql):
+                queries.append(Query(path, line, function, sql.strip()))
+    return queries
+
+
+def _build_schema(cursor, schema):
+    """Create a target's tables/indexes from a callable or its source files' DDL"""
+    if callable(schema):
+        schema(cursor)
+    else:
+        for path in ([schema] if isinstance(schema, str) else schema):
+            for _, _, sql in collect_sql(path):
+                if sql and re.match(r'\s*CREATE\s+(TABLE|INDEX|UNIQUE INDEX|VIEW|VIRTUAL TABLE)', sql, re.I):
+                    cursor.execute(sql)
+    tables = _tables(cursor)
+    for aside, table in ASIDE_TABLES.items():
+        if table in tables:
+            cursor.execute(f"CREATE TABLE {aside} AS SELECT * FROM {table} WHERE 0")
+
+
+def _fake_value(column, col_type, i, rows, rng):
+    """Deterministic synthetic value with realistic selectivity"""
+    col_type = (col_type or '').upper()
+    if column.endswith('_ms'):
+        return 1_700_000_000_000 + i * 1000
+    if 'INT' in col_type:
+        return rng.randrange(max(rows // 10, 1))
+    if 'REAL' in col_type:
+        return rng.random()
+    if 'TIME' in col_type or column.endswith(('_at', '_seen', 'timestamp')):
+        return f"2025-01-{1 + i * 28 // rows:02d} 12:00:00"
+    return f"{column}_{i if column == 'value' else rng.randrange(500)}"
+
+
+def generate_database(schema, path=':memory:', rows=ROWS, seed=0):
+    """Build a target schema and fill every table with synthetic rows, then ANALYZE"""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    _build_schema(cursor, schema)
+    rng = random.Random(seed)
+
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+    tables = cursor.fetchall()
+    # Full-text tables are filled through their own INSERTs; their shadow tables are left alone
+    virtual = [name for name, sql in tables if re.match(r'\s*CREATE\s+VIRTUAL', sql or '', re.I)]
+    for table, _ in tables:
+        if any(table.startswith(f"{name}_") for name in virtual):
+            continue
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = [(col[1], col[2], col[5]) for col in cursor.fetchall()]
+        count = DIM_ROWS if table.startswith('dim_') else rows
+        names = [name for name, _, _ in columns]
+        values = []
+        for i in range(count):
+            row = []
+            for name, col_type, pk in columns:
+                row.append(i + 1 if pk else _fake_value(name, col_type, i, count, rng))
+            values.append(row)
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+            values
+        )
+    conn.commit()
+    cursor.execute("ANALYZE")
+    return conn
+
+
+def _tables(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def aliases(sql):
+    """{name used in the plan: table} for every FROM/JOIN in a statement"""
+    names = {}
+    for table, alias in ALIAS_RE.findall(sql):
+        names[table] = table
+        if alias:
+            names[alias] = table
+    return names
+
+
+def explain(cursor, query):
+    """Fill query.plan and query.scans from EXPLAIN QUERY PLAN"""
+    params = tuple(0 for _ in range(query.sql.count('?')))
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {query.sql}", params)
+    except sqlite3.Error as e:
+        query.error = str(e)
+        return
+    query.plan = [row[3] for row in cursor.fetchall()]
+    tables = _tables(cursor)
+    names = aliases(query.sql)
+    # Walking an index in ORDER BY order stops after LIMIT rows
+    early_exit = (re.search(r'\bLIMIT\b', query.sql, re.I)
+                  and not any('TEMP B-TREE' in detail for detail in query.plan))
+    query.scans = []
+    for detail in query.plan:
+        match = SCAN_RE.match(detail)
+        if not match:
+            continue
+        table = names.get(match.group(1), match.group(1))
+        if table not in tables or table.startswith('sqlite_'):
+            continue  # CTEs, subqueries, constant rows, SQLite's own tables
+        if match.group(3) and early_exit:
+            continue
+        if VIRTUAL_SEARCH_RE.search(detail):
+            continue
+        kind = 'index' if match.group(3) else 'table'
+        query.scans.append((kind, table, match.group(1)))
+
+
+def _column_refs(sql, table, alias, columns):
+    """(equality, range, ordering, other) columns of table referenced by the statement"""
+    prefix = rf"\b{re.escape(alias)}\." if alias != table and re.search(rf"\b{re.escape(alias)}\.", sql) else r"(?<![.\w])"
+    tail = re.search(r"\b(?:GROUP|ORDER)\s+BY\b(.*)", sql, re.I | re.S)
+    tail = tail.group(1) if tail else ''
+    equality, ranges, ordering, other = [], [], [], []
+    for column in columns:
+        ref = rf"{prefix}{re.escape(column)}\b"
+        if not re.search(ref, sql, re.I):
+            continue
+        if re.search(ref + r"\s*(=|IN\b|IS\b)", sql, re.I) or re.search(r"=\s*" + ref, sql, re.I):
+            equality.append(column)
+        elif re.search(ref + r"\s*(<|>|BETWEEN\b)", sql, re.I):
+            ranges.append(column)
+        elif re.search(ref, tail, re.I):
+            ordering.append(column)
+        else:
+            other.append(column)
+    # GROUP BY / ORDER BY columns in statement order
+    ordering.sort(key=lambda c: re.search(rf"{prefix}{re.escape(c)}\b", tail, re.I).start())
+    return equality, ranges, ordering, other
+
+
+def candidate_indexes(cursor, query, table, alias):
+    """Index column lists to try for one scanned table, most specific first"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    info = cursor.fetchall()
+    # An INTEGER PRIMARY KEY is the rowid - every index already carries it
+    rowid = [col[1] for col in info if col[5] and col[2].upper() == 'INTEGER']
+    columns = [col[1] for col in info if col[1] not in rowid]
+    equality, ranges, ordering, other = _column_refs(query.sql, table, alias, columns)
+    key = equality + (ranges[:1] if ranges else ordering)
+    if not key:
+        return []
+
+    # Skip keys an existing index already leads with - the scan is the planner's choice
+    cursor.execute(f"PRAGMA index_list({table})")
+    for index in cursor.fetchall():
+        cursor.execute(f"PRAGMA index_info({index[1]})")
+        existing = [col[2] for col in cursor.fetchall()]
+        if existing[:len(key)] == key:
+            return []
+
+    candidates = []
+    covering = key + [c for c in ranges[1:] + ordering + other if c not in key]
+    if covering != key and len(covering) <= 5:
+        candidates.append(covering)
+    candidates.append(key)
+    return candidates
+
+
+def advise(conn, query):
+    """Try candidate indexes for every table scan; keep the ones that remove it"""
+    cursor = conn.cursor()
+    for kind, table, alias in list(query.scans):
+        if kind != 'table':
+            continue
+        for columns in candidate_indexes(cursor, query, table, alias):
+            name = f"idx_{table}_{'_'.join(columns)}"
+            sql = f"CREATE INDEX {name} ON {table}({', '.join(columns)})"
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            cursor.execute(sql)
+            cursor.execute(f"ANALYZE {table}")
+            trial = Query(query.path, query.line, query.function, query.sql)
+            explain(cursor, trial)
+            cursor.execute(f"DROP INDEX {name}")
+            if not any(k == 'table' and t == table for k, t, _ in trial.scans):
+                query.suggestions.append(sql.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS'))
+                break
+
+
+def check_target(name, rows=ROWS):
+    """Collect, explain and advise every query of one target"""
+    schema, paths = TARGETS[name]
+    conn = generate_database(schema, rows=rows)
+    cursor = conn.cursor()
+    queries = collect_queries(paths)
+    for query in queries:
+        if not query.skipped:
+            explain(cursor, query)
+            advise(conn, query)
+    conn.close()
+    # A file opening several databases runs each statement against one of them
+    return [q for q in queries
+            if not (q.path in SHARED_FILES and q.error and q.error.startswith('no such table'))]
+
+
+def hot_path_table_scans(queries):
+    """Hot-path queries whose plan contains a full table scan"""
+    return [q for q in queries if q.hot and any(kind == 'table' for kind, _, _ in q.scans)]
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    regressions = 0
+    skipped = 0
+
+    for target in TARGETS:
+        print(f"\n{'=' * 80}\n{target} ({rows:,} rows per table)\n{'=' * 80}")
+        queries = check_target(target, rows)
+        for query in queries:
+            if query.skipped:
+                if query.hot:
+                    print(f"  - {query.location}: not literal SQL, not checked [hot path]")
+                continue
+            if query.error:
+                print(f"  ? {query.location}: {query.error}")
+                continue
+            if not query.scans:
+                continue
+            mark = '✗' if query.hot and any(k == 'table' for k, _, _ in query.scans) else '!'
+            scans = ', '.join(f"{kind} scan of {table}" for kind, table, _ in query.scans)
+            print(f"  {mark} {query.location}: {scans}{' [hot path]' if query.hot else ''}")
+            for suggestion in query.suggestions:
+                print(f"      -> {suggestion}")
+        checked = [q for q in queries if not q.skipped]
+        clean = sum(1 for q in checked if not q.scans and not q.error)
+        print(f"  ✓ {clean}/{len(checked)} queries use indexes only, {len(queries) - len(checked)} skipped")
+        regressions += len(hot_path_table_scans(checked))
+        skipped += len(queries) - len(checked)
+
+    print()
+    if regressions:
+        print(f"✗ {regressions} hot-path queries do a full table scan")
+        sys.exit(1)
+    print(f"✓ No hot-path table scans ({skipped} statements with non-literal SQL not checked)")
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Ingest
+One entry point for every frame source -> the batched dedup -> decode -> storage path
+
+Sources (picked from the argument, or --source):
+    cdp[:port]                live Chrome DevTools capture (Ctrl+C to stop)
+    capture.jsonl[.gz|.bz2|.xz]   capture_ws_cdp.py captures, plain or compressed
+    spool/ or segment-*.spool[.gz]   GUI spool segments (a directory or single files)
+    raw_tracker.log / tracker.log    GUI logs (log_replay.py)
+    csgoempire_websocket_data.json   browser-extension export (extension_import.py)
+
+Sinks (--sink): sqlite (default, --db), duckdb / parquet (sqlite plus the
+analytics sink, like the GUI's analytics_sink), null (decode only - measures
+the parse path). Every run ends with a throughput report: frames/s,
+records/s per event type, duplicates, parse failures and database time.
+This replaces the version 1 parsers' separate parse loops; their databases
+keep working, but new captures should go through here.
+
+    python ingest.py capture.jsonl.gz spool/ --db csgoempire_monitor.db
+    python ingest.py cdp:9222
+"""
+
+import bz2
+import gzip
+import json
+import lzma
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+
+from schema import DB_FILE, FRAME_KEYS_DDL
+import migrations
+from frames import Frame, RECORD_KINDS, decode_frame
+from dedup import frame_key
+from timestamps import now_ms, to_epoch_ms
+from storage import BULK_BATCH_FRAMES, StorageBackend, open_backend, store_frames
+from spool import SEGMENT_PREFIX, list_segments, read_records, segment_header
+from log_replay import LogReader
+from extension_import import ExportReader
+
+# Live frames are written in small batches (a batch waits until it is full)
+LIVE_BATCH_FRAMES = 50
+
+DEFAULT_CDP_PORT = 9222
+
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+SINKS = ('sqlite', 'duckdb', 'parquet', 'null')
+
+
+class IngestStats:
+    """Counters and timings for the report"""
+
+    def __init__(self):
+        self.records = Counter()
+        self.ignored = 0            # frames of other events (timers, seller status, ...)
+        self.decode_failures = 0    # new_item/auction_update/deleted_item frames that gave no record
+        self.source_errors = 0      # unreadable lines/entries in the source
+        self.decode_seconds = 0.0
+        self.write_seconds = 0.0
+
+    def decode(self, frame):
+        """decode_frame, counted and timed"""
+        started = time.perf_counter()
+        try:
+            records = decode_frame(frame)
+        except Exception:
+            records = []
+        self.decode_seconds += time.perf_counter() - started
+        if records:
+            for record in records:
+                self.records[record.kind] += 1
+        elif any(f'"{kind}"' in frame.payload for kind in RECORD_KINDS):
+            self.decode_failures += 1
+        else:
+            self.ignored += 1
+        return records
+
+
+class TimedBackend(StorageBackend):
+    """Wraps a backend and adds up the time spent writing"""
+
+    def __init__(self, backend, stats):
+        self.backend = backend
+        self.stats = stats
+
+    def connection(self):
+        return self.backend.connection()
+
+    def write(self, records, watermarks=None, frame_keys=None):
+        started = time.perf_counter()
+        try:
+            return self.backend.write(records, watermarks, frame_keys)
+        finally:
+            self.stats.write_seconds += time.perf_counter() - started
+
+    def flush(self):
+        started = time.perf_counter()
+        self.backend.flush()
+        self.stats.write_seconds += time.perf_counter() - started
+
+    def close(self):
+        started = time.perf_counter()
+        self.backend.close()
+        self.stats.write_seconds += time.perf_counter() - started
+
+
+class NullSink(StorageBackend):
+    """Stores nothing; frame keys go to an in-memory table so dedup still works"""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute(FRAME_KEYS_DDL.format(name='frame_keys'))
+
+    def connection(self):
+        return self.conn
+
+    def write(self, records, watermarks=None, frame_keys=None):
+        if frame_keys:
+            self.conn.executemany('INSERT OR IGNORE INTO frame_keys (frame_key, seen_ms) VALUES (?, ?)',
+                                  frame_keys)
+        return records
+
+    def close(self):
+        self.conn.close()
+
+
+def open_text(path):
+    opener = OPENERS.get(os.path.splitext(path)[1].lower(), open)
+    return opener(path, 'rt', encoding='utf-8', errors='replace')
+
+
+def jsonl_frames(path, stats):
+    """capture_ws_cdp.py capture: one {"dir", "t", "requestId", "payload"} per line"""
+    with open_text(path) as f:
+        for line in f:
+            try:
+                message = json.loads(line)
+                if message.get('dir', 'recv') != 'recv' or not isinstance(message.get('payload'), str):
+                    continue
+                t = message.get('t') or ''
+                chrome_ts = float(t.split('chrome_ts=')[1].split(')')[0]) if 'chrome_ts=' in t else None
+                ts_ms = to_epoch_ms(t)
+            except (ValueError, AttributeError, IndexError):
+                stats.source_errors += 1
+                continue
+            payload = message['payload']
+            request_id = message.get('requestId')
+            yield Frame(ts_ms, payload, request_id, chrome_ts), frame_key(payload, request_id, chrome_ts)
+
+
+def segment_frames(path, stats):
+    """Spool segments - a spool directory or single (optionally gzipped) segment files"""
+    if os.path.isdir(path):
+        paths = [segment for _, segment in list_segments(path)]
+    else:
+        paths = [path]
+    for segment in paths:
+        opener = gzip.open if segment.endswith('.gz') else open
+        with opener(segment, 'rb') as f:
+            header = segment_header(f)
+            for _, _, ts_ms, key, payload in read_records(f, header):
+                yield Frame(ts_ms, payload), key
+
+
+def log_frames(path, stats):
+    reader = LogReader(path)
+    for _, frame, key in reader:
+        yield frame, key
+    stats.source_errors += reader.lost
+
+
+def export_frames(path, stats):
+    reader = ExportReader(path)
+    yield from reader
+    # Binary frames (exported as {})
+    stats.ignored += reader.skipped
+
+
+def cdp_frames(port, stats, log=print):
+    """Live frames from the CSGOEmpire tab of a Chrome started with --remote-debugging-port"""
+    import requests
+    from websocket import create_connection
+
+    tabs = requests.get(f"http://127.0.0.1:{port}/json", timeout=5).json()
+    ws_url = next((tab.get('webSocketDebuggerUrl') for tab in tabs
+                   if 'csgoempire' in tab.get('url', '').lower()), None)
+    if not ws_url:
+        raise RuntimeError("No CSGOEmpire tab found - make sure the page is loaded")
+
+    cdp = create_connection(ws_url, timeout=None)
+    cdp.send(json.dumps({"id": 1, "method": "Network.enable"}))
+    log(f"✓ Capturing from Chrome (port {port}) - Ctrl+C to stop")
+    try:
+        while True:
+            raw = cdp.recv()
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                stats.source_errors += 1
+                continue
+            if message.get('method') != 'Network.webSocketFrameReceived':
+                continue
+            params = message.get('params', {})
+            payload = params.get('response', {}).get('payloadData')
+            if payload:
+                request_id, chrome_ts = params.get('requestId'), params.get('timestamp')
+                yield Frame(now_ms(), payload, request_id, chrome_ts), frame_key(payload, request_id, chrome_ts)
+    except KeyboardInterrupt:
+        # Ends the source; the frames received so far are still written
+        pass
+    finally:
+        cdp.close()
+
+
+SOURCES = {
+    'cdp': cdp_frames,
+    'jsonl': jsonl_frames,
+    'segment': segment_frames,
+    'log': log_frames,
+    'export': export_frames,
+}
+
+
+def detect_source(arg):
+    """Source kind of a command line argument"""
+    name = arg.lower()
+    if name == 'cdp' or name.startswith('cdp:'):
+        return 'cdp'
+    if os.path.isdir(arg) or name.endswith(('.spool', '.spool.gz')) or os.path.basename(name).startswith(SEGMENT_PREFIX):
+        return 'segment'
+    base = os.path.splitext(name)[0] if os.path.splitext(name)[1] in OPENERS else name
+    if base.endswith('.jsonl'):
+        return 'jsonl'
+    if base.endswith('.log'):
+        return 'log'
+    if base.endswith('.json'):
+        return 'export'
+    raise ValueError(f"Cannot tell the source type of {arg} - use --source {'|'.join(SOURCES)}")
+
+
+def open_sink(sink, db_file):
+    if sink == 'null':
+        return NullSink()
+    # Tables are created (or upgraded) first
+    conn = sqlite3.connect(db_file, timeout=30)
+    migrations.upgrade(conn, log=lambda message: None)
+    migrations.backfill_all(conn)
+    conn.close()
+    return open_backend(db_file, None if sink == 'sqlite' else sink)
+
+
+def ingest(arg, kind, storage, stats, on_batch=None):
+    """Store one source; returns (frames, records, duplicates skipped)"""
+    if kind == 'cdp':
+        port = int(arg.split(':', 1)[1]) if ':' in arg else DEFAULT_CDP_PORT
+        frames = cdp_frames(port, stats)
+        batch_frames = LIVE_BATCH_FRAMES
+    else:
+        frames = SOURCES[kind](arg, stats)
+        batch_frames = BULK_BATCH_FRAMES
+    return store_frames(storage, frames, batch_frames, on_batch=on_batch, decode=stats.decode)
+
+
+def report(stats, frames, duplicates, elapsed):
+    """Final report lines"""
+    elapsed = max(elapsed, 1e-6)
+    records = sum(stats.records.values())
+    other = max(elapsed - stats.decode_seconds - stats.write_seconds, 0)
+    lines = [
+        f"  Frames:          {frames:>12,}  {frames / elapsed:>10,.0f}/s",
+        f"  Records:         {records:>12,}  {records / elapsed:>10,.0f}/s",
+    ]
+    for kind in RECORD_KINDS:
+        lines.append(f"    {kind:<15}{stats.records[kind]:>12,}  {stats.records[kind] / elapsed:>10,.0f}/s")
+    lines += [
+        f"  Duplicates:      {duplicates:>12,}",
+        f"  Other events:    {stats.ignored:>12,}",
+        f"  Parse failures:  {stats.decode_failures + stats.source_errors:>12,}  "
+        f"({stats.source_errors:,} unreadable in the source, {stats.decode_failures:,} undecodable frames)",
+        f"  Time:            {elapsed:>11.1f}s  (database {stats.write_seconds:.1f}s, "
+        f"decode {stats.decode_seconds:.1f}s, read {other:.1f}s)",
+    ]
+    return lines
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    args = sys.argv[1:]
+    options = {'--sink': 'sqlite', '--db': DB_FILE, '--source': None}
+    for option in options:
+        if option in args:
+            index = args.index(option)
+            if index + 1 >= len(args):
+                print(f"ERROR - {option} needs a value")
+                sys.exit(1)
+            options[option] = args[index + 1]
+            del args[index:index + 2]
+
+    if not args or options['--sink'] not in SINKS or (options['--source'] and options['--source'] not in SOURCES):
+        print("Usage: python ingest.py SOURCE [SOURCE ...] [--source cdp|jsonl|segment|log|export] "
+              "[--sink sqlite|duckdb|parquet|null] [--db csgoempire_monitor.db]")
+        sys.exit(1)
+
+    try:
+        sources = [(arg, options['--source'] or detect_source(arg)) for arg in args]
+        for arg, kind in sources:
+            if kind != 'cdp' and not os.path.exists(arg):
+                raise FileNotFoundError(f"Source not found: {arg}")
+
+        stats = IngestStats()
+        storage = TimedBackend(open_sink(options['--sink'], options['--db']), stats)
+        started = time.time()
+        total_frames = total_duplicates = 0
+        for arg, kind in sources:
+            print(f"Ingesting {arg} ({kind})...")
+            frames, _, duplicates = ingest(
+                arg, kind, storage, stats,
+                on_batch=lambda frames, records: print(f"  {frames:,} frames, {records:,} records", end='\r')
+            )
+            print()
+            total_frames += frames
+            total_duplicates += duplicates
+        storage.close()
+
+        print(f"✓ Ingest complete ({options['--sink']}"
+              f"{'' if options['--sink'] == 'null' else ' -> ' + options['--db']})")
+        for line in report(stats, total_frames, total_duplicates, time.time() - started):
+            print(line)
+
+    except Exception as e:
+        print(f"✗ Ingest failed: {e}")
+        sys.exit(1)
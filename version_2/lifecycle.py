@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Item Lifecycle
+Listed, first bid, last bid and removed times per item, and time-to-sale percentiles from sketches
+
+advance() folds the item_snapshots, auction_updates and deleted_items rows
+added since its last pass (id watermarks in retention_state) into
+item_lifecycle, one row per item. Once both an item's listing and removal
+are folded (in either order), its time to sale (removed - listed) is added
+to time_to_sale_sketch for every dimension it belongs to (all, market_name,
+category, wear, price bucket) under its sale type and hour of removal. A
+sketch is a log-bucketed histogram of seconds (log_sketch.py), so a
+percentile read back is within SKETCH_ERROR of the exact one. Histograms
+only gain counts and merge by adding, so a percentile query over any range
+of hours reads one group's buckets instead of joining the raw rows.
+
+retention.py runs a pass before it prunes raw rows, and partitions.py
+before it moves rows out of the hot database (never past the watermarks).
+
+    python lifecycle.py [csgoempire_monitor.db]                   # advance, then overall percentiles
+    python lifecycle.py [db] --by category|wear|price|market_name [--sale-type auction_sold]
+    python lifecycle.py [db] --hours 24                           # sales removed in the last 24 hours
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+
+from schema import DB_FILE, create_schema, get_watermark, set_watermark
+from dimensions import DIMENSIONS
+from log_sketch import bucket_of, quantiles_of
+
+# Rows folded per transaction
+CHUNK_ROWS = 5000
+
+# Removals that count as sales by default - a fixed-price removal is a
+# purchase or a withdrawal, and the feed cannot tell them apart
+SOLD_TYPES = ('auction_sold', 'delisted')
+
+SALE_TYPES = ('auction_sold', 'auction_expired', 'delisted')
+
+# List price (cents) -> bucket label; the last bucket is open-ended
+PRICE_BUCKETS = [
+    (100, '<$1'),
+    (500, '$1-5'),
+    (2000, '$5-20'),
+    (10000, '$20-100'),
+    (50000, '$100-500'),
+    (None, '$500+'),
+]
+
+# Groups every sale is counted in ('all' has the single value '')
+SKETCH_DIMENSIONS = ('all', 'market_name', 'category', 'wear', 'price')
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+# Sketch counts are kept per hour of removal (removed_ms // HOUR_MS)
+HOUR_MS = 3600 * 1000
+MAX_HOUR = 2 ** 62
+
+
+def price_bucket(cents):
+    if cents is None:
+        return 'unknown'
+    for limit, label in PRICE_BUCKETS:
+        if limit is None or cents < limit:
+            return label
+
+
+def _fold_snapshots(cursor, low, high):
+    """First snapshot of each item: listing time, name, classification, list price
+
+    Returns sketch counts for items whose removal was folded before their
+    listing (their time to sale is only known now).
+    """
+    cursor.execute('''
+        SELECT item_id FROM item_lifecycle
+        WHERE item_id IN (SELECT item_id FROM item_snapshots WHERE id > ? AND id <= ?)
+            AND removed_ms IS NOT NULL AND time_to_sale_ms IS NULL
+    ''', (low, high))
+    removed = [row[0] for row in cursor.fetchall()]
+    cursor.execute('''
+        INSERT INTO item_lifecycle (item_id, market_name_id, category_id, wear_name_id, list_price, listed_ms)
+        SELECT item_id, market_name_id, category_id, wear_name_id, market_value, listed_ms
+        FROM (
+            SELECT item_id, market_name_id, category_id, wear_name_id, market_value,
+                COALESCE(published_at_ms, snapshot_time_ms) AS listed_ms,
+                ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY id) AS rank
+            FROM item_snapshots
+            WHERE id > ? AND id <= ?
+        )
+        WHERE rank = 1
+        ON CONFLICT(item_id) DO UPDATE SET
+            market_name_id = COALESCE(market_name_id, excluded.market_name_id),
+            category_id = COALESCE(category_id, excluded.category_id),
+            wear_name_id = COALESCE(wear_name_id, excluded.wear_name_id),
+            list_price = COALESCE(list_price, excluded.list_price),
+            listed_ms = COALESCE(listed_ms, excluded.listed_ms),
+            time_to_sale_ms = COALESCE(time_to_sale_ms, removed_ms - COALESCE(listed_ms, excluded.listed_ms))
+    ''', (low, high))
+    return _sale_counts(cursor, removed)
+
+
+def _fold_bids(cursor, low, high):
+    cursor.execute('''
+        INSERT INTO item_lifecycle (item_id, first_bid_ms, last_bid_ms, bid_count)
+        SELECT auction_id, MIN(update_time_ms), MAX(update_time_ms), MAX(number_of_bids)
+        FROM auction_updates
+        WHERE id > ? AND id <= ? AND number_of_bids > 0
+        GROUP BY auction_id
+        ON CONFLICT(item_id) DO UPDATE SET
+            first_bid_ms = COALESCE(MIN(first_bid_ms, excluded.first_bid_ms), first_bid_ms, excluded.first_bid_ms),
+            last_bid_ms = COALESCE(MAX(last_bid_ms, excluded.last_bid_ms), last_bid_ms, excluded.last_bid_ms),
+            bid_count = COALESCE(MAX(bid_count, excluded.bid_count), bid_count, excluded.bid_count)
+    ''', (low, high))
+
+
+def _fold_removals(cursor, low, high):
+    """Removals in the id range; returns their sketch counts"""
+    cursor.execute('''
+        SELECT item_id, deleted_at_ms, sale_type, COALESCE(final_bid_amount, original_price)
+        FROM deleted_items
+        WHERE id > ? AND id <= ? AND item_id IS NOT NULL
+        ORDER BY id
+    ''', (low, high))
+    removed = []
+    for item_id, deleted_at_ms, sale_type, final_price in cursor.fetchall():
+        # Only the first removal of an item counts (a replayed or repeated deleted_item changes nothing)
+        cursor.execute('''
+            INSERT INTO item_lifecycle (item_id, removed_ms, sale_type, final_price)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(item_id) DO UPDATE SET
+                removed_ms = excluded.removed_ms,
+                sale_type = excluded.sale_type,
+                final_price = excluded.final_price,
+                time_to_sale_ms = excluded.removed_ms - listed_ms
+            WHERE removed_ms IS NULL
+        ''', (item_id, deleted_at_ms, sale_type, final_price))
+        if cursor.rowcount > 0:
+            removed.append(item_id)
+    return _sale_counts(cursor, removed)
+
+
+def _sale_counts(cursor, item_ids):
+    """Sketch counts {(dimension, value, sale_type, hour, bucket): n} of items with a time to sale"""
+    counts = Counter()
+    for start in range(0, len(item_ids), 500):
+        ids = item_ids[start:start + 500]
+        placeholders = ', '.join('?' for _ in ids)
+        cursor.execute(f'''
+            SELECT l.time_to_sale_ms, l.removed_ms, l.sale_type, l.list_price, n.value, c.value, w.value
+            FROM item_lifecycle l
+            LEFT JOIN {DIMENSIONS['market_name']} n ON n.id = l.market_name_id
+            LEFT JOIN {DIMENSIONS['category']} c ON c.id = l.category_id
+            LEFT JOIN {DIMENSIONS['wear_name']} w ON w.id = l.wear_name_id
+            WHERE l.item_id IN ({placeholders}) AND l.time_to_sale_ms >= 0
+        ''', ids)
+        for time_to_sale_ms, removed_ms, sale_type, list_price, market_name, category, wear in cursor.fetchall():
+            hour = removed_ms // HOUR_MS
+            bucket = bucket_of(time_to_sale_ms / 1000)
+            sale_type = sale_type or 'unknown'
+            for dimension, value in (('all', ''), ('market_name', market_name), ('category', category),
+                                     ('wear', wear), ('price', price_bucket(list_price))):
+                counts[(dimension, 'unknown' if value is None else value, sale_type, hour, bucket)] += 1
+    return counts
+
+
+def _add_to_sketches(cursor, counts):
+    cursor.executemany('''
+        INSERT INTO time_to_sale_sketch (dimension, value, sale_type, hour, bucket, count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(dimension, value, sale_type, hour, bucket) DO UPDATE SET count = count + excluded.count
+    ''', [(*key, n) for key, n in counts.items()])
+
+
+def _source_end(cursor, table, key):
+    cursor.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def advance(conn, chunk_rows=CHUNK_ROWS):
+    """Fold every row added since the last pass; returns rows folded
+
+    The ends of all three sources are read first, so a removal folded in
+    this pass never precedes its item's listing or bids.
+    """
+    cursor = conn.cursor()
+    sources = [
+        ('item_snapshots', 'id', _fold_snapshots),
+        ('auction_updates', 'id', _fold_bids),
+        ('deleted_items', 'id', _fold_removals),
+    ]
+    ends = [_source_end(cursor, table, key) for table, key, _ in sources]
+    folded = 0
+    for (table, _, fold), end in zip(sources, ends):
+        name = f'lifecycle:{table}'
+        watermark = get_watermark(cursor, name)
+        while watermark < end:
+            high = min(watermark + chunk_rows, end)
+            counts = fold(cursor, watermark, high)
+            if counts:
+                _add_to_sketches(cursor, counts)
+            set_watermark(cursor, name, high)
+            conn.commit()
+            folded += high - watermark
+            watermark = high
+    return folded
+
+
+def _hour_filter(since_ms, until_ms):
+    """(SQL condition, params) selecting the sketch hours that overlap [since_ms, until_ms)"""
+    if since_ms is None and until_ms is None:
+        return '1', ()
+    first = max(since_ms // HOUR_MS, 1) if since_ms is not None else 1
+    last = (until_ms - 1) // HOUR_MS if until_ms is not None else MAX_HOUR
+    return 'hour BETWEEN ? AND ?', (first, last)
+
+
+def sketch(cursor, dimension='all', value='', sale_types=SOLD_TYPES, since_ms=None, until_ms=None):
+    """Merged histogram of one group, over all time or the hours overlapping [since_ms, until_ms): {bucket: count}"""
+    placeholders = ', '.join('?' for _ in sale_types)
+    hours, hour_params = _hour_filter(since_ms, until_ms)
+    cursor.execute(f'''
+        SELECT bucket, SUM(count) FROM time_to_sale_sketch
+        WHERE dimension = ? AND value = ? AND sale_type IN ({placeholders}) AND {hours}
+        GROUP BY bucket
+    ''', (dimension, value, *sale_types, *hour_params))
+    return dict(cursor.fetchall())
+
+
+def percentiles(cursor, dimension='all', value='', sale_types=SOLD_TYPES, quantiles=DEFAULT_QUANTILES,
+                since_ms=None, until_ms=None):
+    """Time to sale of one group: (sales, [seconds per quantile])"""
+    return quantiles_of(sketch(cursor, dimension, value, sale_types, since_ms, until_ms), quantiles)
+
+
+def breakdown(cursor, dimension, sale_types=SOLD_TYPES, quantiles=DEFAULT_QUANTILES, min_count=1, limit=None,
+              since_ms=None, until_ms=None):
+    """Every value of a dimension: [(value, sales, [seconds per quantile])], most sales first"""
+    placeholders = ', '.join('?' for _ in sale_types)
+    hours, hour_params = _hour_filter(since_ms, until_ms)
+    cursor.execute(f'''
+        SELECT value, bucket, SUM(count) FROM time_to_sale_sketch
+        WHERE dimension = ? AND sale_type IN ({placeholders}) AND {hours}
+        GROUP BY value, bucket
+    ''', (dimension, *sale_types, *hour_params))
+    groups = {}
+    for value, bucket, count in cursor.fetchall():
+        groups.setdefault(value, {})[bucket] = count
+    rows = [(value, *quantiles_of(buckets, quantiles)) for value, buckets in groups.items()]
+    rows = sorted((row for row in rows if row[1] >= min_count), key=lambda row: -row[1])
+    return rows[:limit] if limit else rows
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '-'
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f}m"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    args = sys.argv[1:]
+    options = {'--by': None, '--sale-type': None, '--hours': None}
+    for option in options:
+        if option in args:
+            index = args.index(option)
+            options[option] = args[index + 1] if index + 1 < len(args) else None
+            del args[index:index + 2]
+    db_file = args[0] if args else DB_FILE
+
+    if options['--by'] is not None and options['--by'] not in SKETCH_DIMENSIONS:
+        print(f"ERROR - --by must be one of: {', '.join(SKETCH_DIMENSIONS)}")
+        sys.exit(1)
+    if options['--sale-type'] is not None and options['--sale-type'] not in SALE_TYPES:
+        print(f"ERROR - --sale-type must be one of: {', '.join(SALE_TYPES)}")
+        sys.exit(1)
+    if options['--hours'] is not None and not options['--hours'].isdigit():
+        print("ERROR - --hours must be a whole number of hours")
+        sys.exit(1)
+    if not os.path.exists(db_file):
+        print(f"ERROR - Database not found: {db_file}")
+        sys.exit(1)
+
+    since_ms = int(time.time() * 1000) - int(options['--hours']) * HOUR_MS if options['--hours'] else None
+    sale_types = (options['--sale-type'],) if options['--sale-type'] else SOLD_TYPES
+    labels = ' '.join(f"{'p' + format(q * 100, 'g'):>8}" for q in DEFAULT_QUANTILES)
+    try:
+        conn = sqlite3.connect(db_file, timeout=30)
+        create_schema(conn.cursor())
+        started = time.time()
+        folded = advance(conn)
+        print(f"✓ {folded:,} row(s) folded in {time.time() - started:.1f}s")
+
+        cursor = conn.cursor()
+        started = time.time()
+        if options['--by']:
+            rows = breakdown(cursor, options['--by'], sale_types, limit=30, since_ms=since_ms)
+        else:
+            rows = [('all', *percentiles(cursor, 'all', '', sale_types, since_ms=since_ms))]
+        elapsed_ms = (time.time() - started) * 1000
+
+        window = f", last {options['--hours']}h" if since_ms is not None else ''
+        print(f"\nTime to sale ({', '.join(sale_types)}{window})")
+        print(f"{'':<50}{'sales':>9} {labels}")
+        for value, sales, seconds in rows:
+            print(f"{value[:49]:<50}{sales:>9,} " + ' '.join(f"{format_duration(s):>8}" for s in seconds))
+        print(f"({elapsed_ms:.1f} ms)")
+        conn.close()
+    except Exception as e:
+        print(f"✗ Lifecycle failed: {e}")
+        sys.exit(1)
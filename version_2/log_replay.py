@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Log Replay
+Rebuilds frames from raw_tracker.log (or tracker.log) and stores them like the spool consumer does
+
+raw_tracker.log holds every received frame in one of the forms log_raw()
+writes: the full payload, the payload as json.dumps(indent=2), a truncated
+payload (formatted mode placeholders, 200 characters) or a NEW ITEM box.
+Entries only carry a time of day; the date comes from the "RAW SESSION
+STARTED" header above them (a time earlier than the previous one by more than
+12 hours is the next day). Frames are rebuilt as Socket.IO payloads and go
+through dedup -> decode_frame -> storage.write in large batches, so replaying
+a log twice stores it once. Formatted entries lose fields: a NEW ITEM box
+has no type/category/auction data, a truncated auction update keeps the
+auctions that fit in 200 characters.
+
+tracker.log (processed log) is the fallback when the raw log was off: new
+items, bids of auctions whose item is known and deletions are rebuilt from
+its lines. Replay one of the two logs for a period, not both, and only
+sessions the database does not have yet (a new database, or the sessions
+after a loss) - log frames have other keys than the ones the GUI stored.
+
+    python log_replay.py list [raw_tracker.log]
+    python log_replay.py replay [raw_tracker.log] [db] [sessions, e.g. 3 or 3:5]
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+from schema import DB_FILE
+from frames import Frame
+from dedup import frame_key
+from storage import BULK_BATCH_FRAMES, open_backend, store_frames
+
+RAW_LOG_FILE = 'raw_tracker.log'
+
+# GUI event type -> Socket.IO event name
+EVENT_NAMES = {
+    'NEW_ITEM': 'new_item',
+    'AUCTION_UPDATE': 'auction_update',
+    'DELETED_ITEM': 'deleted_item',
+    'SELLER_STATUS': 'updated_seller_online_status',
+}
+
+# Formatted mode keeps the first 200 characters of a payload plus '...'
+TRUNCATED_CHARS = 200
+
+ENTRY_END = '-' * 80
+SESSION_RE = re.compile(r'^(RAW )?SESSION (STARTED|ENDED): (\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)$')
+ENTRY_RE = re.compile(r'^\[(\d\d:\d\d:\d\d\.\d{3})\] ([A-Z_]+)(?: \((?:format|parse) error: .*\))?:(?: (.*))?$')
+BOX_START_RE = re.compile(r'^\[(\d\d:\d\d:\d\d\.\d{3})\] ═+$')
+BOX_END = '└'
+
+# NEW ITEM box line -> field
+BOX_FIELDS = [
+    ('id', re.compile(r'^├─ ID: (\d+)$')),
+    ('market_name', re.compile(r'^├─ Name: (.+)$')),
+    ('wear', re.compile(r'^├─ Wear: (.*?)(?: \(([\d.]+)\))?$')),
+    ('purchase_price', re.compile(r'^│  ├─ Purchase: \$([\d,]+\.\d\d)$')),
+    ('market_value', re.compile(r'^│  ├─ Market Value: \$([\d,]+\.\d\d)$')),
+    ('suggested_price', re.compile(r'^│  ├─ Suggested: \$([\d,]+\.\d\d)$')),
+    ('above_recommended_price', re.compile(r'^│  └─ Above Recommended: ([+-][\d.]+)%$')),
+    ('user_online_status', re.compile(r'^│  ├─ Online: .*(YES|NO)$')),
+    ('delivery_rate', re.compile(r'^│  ├─ Delivery Rate: (\d+)% \(recent\) / (\d+)% \(long\)$')),
+    ('instant_deposit', re.compile(r'^│  └─ Instant Deposit: (\d+)/(\d+)$')),
+]
+
+# tracker.log lines (log_record)
+PROCESSED_RE = re.compile(r'^\[(\d\d:\d\d:\d\d)\] (.*)$')
+NEW_ITEM_RE = re.compile(r'^📦 (?:Item ID: (\d+)|(.+) - \$([\d,]+\.\d\d) \(ID: (\d+)\))$')
+BID_RE = re.compile(r'^⚔️  (.+): \$([\d,]+\.\d\d) by #(\d+) \((\d+) bids\)$')
+UNNAMED_RE = re.compile(r'^Item #(\d+)$')
+DELETED_RE = re.compile(r'^(?:🔨|⏱️|❌) .* \[ID: (\d+)\]$')
+
+
+def cents(text):
+    return int(round(float(text.replace(',', '')) * 100))
+
+
+def socketio(event, data):
+    """Socket.IO text frame as received ('42["event",data]')"""
+    return '42' + json.dumps([event, data], separators=(',', ':'), ensure_ascii=False)
+
+
+class SessionClock:
+    """Entry time of day -> epoch ms, counting midnights since the session header"""
+
+    def __init__(self, started):
+        self.day = started.date()
+        self.last = started.time()
+
+    def ms(self, text):
+        clock = datetime.strptime(text, '%H:%M:%S.%f' if '.' in text else '%H:%M:%S').time()
+        if datetime.combine(self.day, clock) < datetime.combine(self.day, self.last) - timedelta(hours=12):
+            self.day += timedelta(days=1)
+        self.last = clock
+        # Local time, like the GUI's datetime.now()
+        return int(datetime.combine(self.day, clock).timestamp() * 1000)
+
+
+class LogReader:
+    """Streams (session, Frame, key) from a raw_tracker.log or tracker.log
+
+    sessions: session numbers to read (1 = first header in the file), None
+    for all. Counters: entries read, frames rebuilt, truncated (partially
+    recovered) and lost (nothing recoverable) entries.
+    """
+
+    def __init__(self, path, sessions=None):
+        self.path = path
+        self.wanted = sessions
+        self.sessions = []      # [number, started, ended, frames]
+        self.entries = 0
+        self.frames = 0
+        self.truncated = 0
+        self.lost = 0
+
+    def __iter__(self):
+        with open(self.path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                match = SESSION_RE.match(line.rstrip('\n'))
+                if match:
+                    f.seek(0)
+                    if match.group(1):
+                        yield from self._raw_frames(f)
+                    else:
+                        yield from self._processed_frames(f)
+                    return
+
+    def _session(self, match):
+        """Session header -> clock (or None when the session is not wanted)"""
+        started = datetime.strptime(match.group(3), '%Y-%m-%d %H:%M:%S')
+        if match.group(2) == 'ENDED':
+            if self.sessions:
+                self.sessions[-1][2] = started
+            return None
+        self.sessions.append([len(self.sessions) + 1, started, None, 0])
+        if self.wanted is not None and len(self.sessions) not in self.wanted:
+            return None
+        return SessionClock(started)
+
+    def _frame(self, clock, ts_text, payload):
+        self.frames += 1
+        self.sessions[-1][3] += 1
+        number, started, _, position = self.sessions[-1]
+        # Entry position in its session - identical frames logged in the same ms stay distinct
+        key = frame_key(payload, f"log:{started:%Y-%m-%d %H:%M:%S}#{position}", ts_text)
+        return number, Frame(clock.ms(ts_text), payload), key
+
+    def _raw_frames(self, f):
+        clock = None
+        entry = None            # [ts text, event type, body lines, box]
+        for line in f:
+            line = line.rstrip('\n')
+            match = SESSION_RE.match(line)
+            if match:
+                if entry is not None:
+                    self.lost += 1      # cut off by a crash
+                    entry = None
+                clock = self._session(match)
+                continue
+            if clock is None:
+                continue
+
+            if entry is None:
+                match = BOX_START_RE.match(line)
+                if match:
+                    entry = [match.group(1), 'NEW_ITEM', [], True]
+                    continue
+                match = ENTRY_RE.match(line)
+                if match:
+                    entry = [match.group(1), match.group(2), [], False]
+                    if match.group(3) is not None:
+                        entry[2].append(match.group(3))
+                continue
+
+            if entry[3] and line.startswith(BOX_END):
+                payload = self._box_payload(entry[2])
+            elif not entry[3] and line == ENTRY_END:
+                payload = self._entry_payload(entry[1], '\n'.join(entry[2]))
+            else:
+                entry[2].append(line)
+                continue
+
+            self.entries += 1
+            if payload is None:
+                self.lost += 1
+            else:
+                yield self._frame(clock, entry[0], payload)
+            entry = None
+        if entry is not None:
+            self.lost += 1
+
+    def _entry_payload(self, event_type, text):
+        """Payload of a full, truncated or pretty-printed entry"""
+        if text.endswith('...') and len(text) <= TRUNCATED_CHARS + 3:
+            payload = text[:-3]
+            if len(payload) == TRUNCATED_CHARS:
+                # Cut after the last complete value; decode_frame finds what is left
+                self.truncated += 1
+                payload = payload[:payload.rfind(',')]
+            return payload or None
+        if text.startswith('42'):
+            return text
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return text or None
+        # The GUI pretty-prints what follows the namespace: ["event", data]
+        if isinstance(data, list) and len(data) == 2 and isinstance(data[0], str):
+            return socketio(*data)
+        return socketio(EVENT_NAMES.get(event_type, event_type.lower()), data)
+
+    def _box_payload(self, lines):
+        """new_item payload with the fields a NEW ITEM box shows"""
+        found = {}
+        for line in lines:
+            for name, pattern in BOX_FIELDS:
+                match = pattern.match(line)
+                if match:
+                    found[name] = match.groups()
+                    break
+        if 'id' not in found:
+            return None
+        self.truncated += 1
+        item = {'id': int(found['id'][0])}
+        if found.get('market_name', ('Unknown',))[0] != 'Unknown':
+            item['market_name'] = found['market_name'][0]
+        if 'wear' in found:
+            wear_name, wear = found['wear']
+            if wear_name:
+                item['wear_name'] = wear_name
+            if wear:
+                item['wear'] = float(wear)
+        # Missing prices are shown as $0.00
+        for name in ('purchase_price', 'market_value', 'suggested_price'):
+            if name in found and cents(found[name][0]):
+                item[name] = cents(found[name][0])
+        if 'above_recommended_price' in found and float(found['above_recommended_price'][0]):
+            item['above_recommended_price'] = float(found['above_recommended_price'][0])
+        if 'user_online_status' in found:
+            item['user_online_status'] = 1 if found['user_online_status'][0] == 'YES' else 0
+        if 'delivery_rate' in found:
+            item['delivery_rate_recent'] = int(found['delivery_rate'][0]) / 100
+            item['delivery_rate_long'] = int(found['delivery_rate'][1]) / 100
+        if 'instant_deposit' in found:
+            item['instant_deposit_available_amount'] = int(found['instant_deposit'][0])
+            item['instant_deposit_max_amount'] = int(found['instant_deposit'][1])
+        return socketio('new_item', [item])
+
+    def _processed_frames(self, f):
+        clock = None
+        names = {}              # market_name -> item ids seen this session
+        for line in f:
+            line = line.rstrip('\n')
+            match = SESSION_RE.match(line)
+            if match:
+                clock = self._session(match)
+                names = {}
+                continue
+            match = PROCESSED_RE.match(line)
+            if clock is None or not match:
+                continue
+            ts_text, message = match.groups()
+
+            payload = None
+            new_item = NEW_ITEM_RE.match(message)
+            bid = BID_RE.match(message)
+            deleted = DELETED_RE.match(message)
+            if new_item:
+                if new_item.group(1):
+                    payload = socketio('new_item', [{'id': int(new_item.group(1))}])
+                else:
+                    item_id = int(new_item.group(4))
+                    names.setdefault(new_item.group(2), set()).add(item_id)
+                    payload = socketio('new_item', [{
+                        'id': item_id, 'market_name': new_item.group(2), 'market_value': cents(new_item.group(3)),
+                    }])
+            elif bid:
+                # Bids name the item; only a name seen once this session identifies the auction
+                unnamed = UNNAMED_RE.match(bid.group(1))
+                ids = {int(unnamed.group(1))} if unnamed else names.get(bid.group(1), set())
+                if len(ids) == 1:
+                    payload = socketio('auction_update', [{
+                        'id': next(iter(ids)), 'auction_highest_bid': cents(bid.group(2)),
+                        'auction_highest_bidder': int(bid.group(3)), 'auction_number_of_bids': int(bid.group(4)),
+                    }])
+            elif deleted:
+                payload = socketio('deleted_item', [int(deleted.group(1))])
+            else:
+                continue
+
+            self.entries += 1
+            if payload is None:
+                self.lost += 1
+            else:
+                yield self._frame(clock, ts_text, payload)
+
+
+def replay(reader, storage, batch_frames=BULK_BATCH_FRAMES, dedup=None, log=print):
+    """Store the frames of a LogReader; returns (frames, records, duplicates skipped)"""
+    def progress(frames, records):
+        if log:
+            log(f"  session {reader.sessions[-1][0]}: {frames:,} frames, {records:,} records")
+    return store_frames(storage, ((frame, key) for _, frame, key in reader), batch_frames, dedup, progress)
+
+
+def parse_sessions(text):
+    """'3' / '3:5' / '3:' -> session number filter"""
+    first, _, last = text.partition(':')
+    if not _:
+        return {int(first)}
+    return range(int(first or 1), int(last) + 1 if last else sys.maxsize)
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    import sqlite3
+
+    import migrations
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    log_file = sys.argv[2] if len(sys.argv) > 2 else RAW_LOG_FILE
+    db_file = sys.argv[3] if len(sys.argv) > 3 else DB_FILE
+    sessions = parse_sessions(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    if command not in ('list', 'replay'):
+        print("Usage: python log_replay.py [list|replay] [raw_tracker.log|tracker.log] [db] [sessions]")
+        sys.exit(1)
+
+    if not os.path.exists(log_file):
+        print(f"ERROR - Log not found: {log_file}")
+        sys.exit(1)
+
+    reader = LogReader(log_file, sessions)
+    try:
+        if command == 'list':
+            for _ in reader:
+                pass
+            for number, started, ended, frames in reader.sessions:
+                print(f"  {number:>4}  {started:%Y-%m-%d %H:%M:%S} - "
+                      f"{f'{ended:%H:%M:%S}' if ended else 'no end':<8}  {frames:,} frame(s)")
+        else:
+            # A lost database is recreated; an old one is upgraded first
+            conn = sqlite3.connect(db_file, timeout=30)
+            migrations.upgrade(conn, log=lambda message: None)
+            migrations.backfill_all(conn)
+            conn.close()
+
+            storage = open_backend(db_file)
+            started = time.time()
+            frames, records, skipped = replay(reader, storage)
+            storage.close()
+            elapsed = time.time() - started
+            print("✓ Replay complete!")
+            print(f"  {frames:,} frame(s), {records:,} record(s) in {elapsed:.1f}s "
+                  f"({frames / max(elapsed, 1e-6):,.0f} frames/s)")
+            print(f"  {skipped:,} duplicate frame(s) skipped, {reader.truncated:,} partially recovered, "
+                  f"{reader.lost:,} lost")
+
+    except Exception as e:
+        print(f"✗ Log {command} failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Log Sketch
+Mergeable log-bucketed histogram, shared by lifecycle.py (seconds) and price_index.py (cents)
+
+Bucket i holds values between GAMMA^(i-1) and GAMMA^i (values under 1 go to
+bucket 0), so a quantile read back is within SKETCH_ERROR of the exact one
+whatever the unit. Histograms only gain counts and merge by adding them.
+"""
+
+import json
+import math
+
+# Relative error of a quantile read from a sketch
+SKETCH_ERROR = 0.01
+GAMMA = (1 + SKETCH_ERROR) / (1 - SKETCH_ERROR)
+LOG_GAMMA = math.log(GAMMA)
+
+
+def bucket_of(value):
+    """Bucket of a value (under 1: bucket 0)"""
+    return max(math.ceil(math.log(value) / LOG_GAMMA), 1) if value >= 1 else 0
+
+
+def bucket_value(bucket):
+    """Representative value of a bucket (within SKETCH_ERROR of every value in it)"""
+    return 2 * GAMMA ** bucket / (GAMMA + 1) if bucket > 0 else 0.0
+
+
+def quantiles_of(counts, quantiles):
+    """(total, [value per quantile]) of a {bucket: count} histogram; values are None when it is empty"""
+    total = sum(counts.values())
+    if not total:
+        return 0, [None for _ in quantiles]
+    ordered = sorted(counts.items())
+    results = []
+    for q in quantiles:
+        rank = q * (total - 1)
+        seen = 0
+        for bucket, count in ordered:
+            seen += count
+            if seen > rank:
+                results.append(bucket_value(bucket))
+                break
+    return total, results
+
+
+class LogSketch:
+    """In-memory histogram: add values, merge sketches, read quantiles"""
+
+    __slots__ = ('counts', 'total')
+
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+        self.total = sum(self.counts.values())
+
+    def add(self, value, count=1):
+        bucket = bucket_of(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += count
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+
+    def quantiles(self, quantiles):
+        """Values at each quantile; None when empty"""
+        return quantiles_of(self.counts, quantiles)[1]
+
+    def to_json(self):
+        return json.dumps(sorted(self.counts.items()), separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        return cls({bucket: count for bucket, count in json.loads(text)})
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Migration Script: Rebuild bidder stats from auction state transitions
+Adds bidders.auctions_won / times_outbid and recomputes every bidder counter by
+replaying auction_updates through the BidderTracker
+
+Older code added the full highest_bid to total_spent on every auction_update
+(and counted repeated updates as bids), so existing totals are replaced, not
+adjusted. Auctions whose raw updates were already pruned by retention.py are
+credited from auction_summaries (win + final bid only). The replay runs one
+auction_id range per transaction into a shadow table, with its progress in
+retention_state, and replaces the counters in bidders only at the end.
+"""
+
+import sqlite3
+import sys
+import os
+
+from schema import DB_FILE, BIDDERS_DDL, RETENTION_STATE_DDL, get_watermark, set_watermark, table_columns
+from bidder_tracker import BidderTracker, UPSERT_SQL
+
+NEW_COLUMNS = ['auctions_won', 'times_outbid']
+
+# auction_updates rows replayed per transaction (whole auctions, so a little more)
+CHUNK_ROWS = 5000
+
+# Counters are rebuilt here and swapped into bidders at the end; the baseline
+# keeps the counters being replaced, so live increments made meanwhile survive
+SHADOW_TABLE = 'bidders_rebuild'
+BASELINE_TABLE = 'bidders_baseline'
+STATE_PREFIX = 'migration:bidder_stats:'
+
+# Upper bound of the last range (everything after the previous one)
+MAX_ID = 2 ** 63 - 1
+
+
+def needs_migration(cursor):
+    """True if bidders exists without the transition-based columns"""
+    columns = table_columns(cursor, 'bidders')
+    return bool(columns) and any(column not in columns for column in NEW_COLUMNS)
+
+
+def add_columns(cursor):
+    """Add the missing counters (cheap - no table rewrite)"""
+    columns = table_columns(cursor, 'bidders')
+    for column in NEW_COLUMNS:
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE bidders ADD COLUMN {column} INTEGER DEFAULT 0")
+
+
+def _sold(cursor, after, last, deleted_id):
+    """Auctions in (after, last] sold before the rebuild started (later sales are live deltas)"""
+    cursor.execute('''
+        SELECT item_id FROM deleted_items
+        WHERE item_id > ? AND item_id <= ? AND sale_type = 'auction_sold' AND id <= ?
+    ''', (after, last, deleted_id))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _begin(cursor):
+    """First step: empty shadow table, the counters it replaces, and the replay bounds"""
+    cursor.execute(BIDDERS_DDL.format(name=SHADOW_TABLE))
+    cursor.execute(f'''
+        CREATE TABLE {BASELINE_TABLE} AS
+        SELECT bidder_id, total_bids, total_spent, auctions_won, times_outbid FROM bidders
+    ''')
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM auction_updates")
+    set_watermark(cursor, STATE_PREFIX + 'max_id', cursor.fetchone()[0])
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM deleted_items")
+    set_watermark(cursor, STATE_PREFIX + 'deleted_id', cursor.fetchone()[0])
+    set_watermark(cursor, STATE_PREFIX + 'auction_id', 0)
+
+
+def _swap(cursor):
+    """Last step: old counters out, rebuilt ones in; updates stored since the start stay counted"""
+    counters = ['total_bids', 'total_spent', 'auctions_won', 'times_outbid']
+    cursor.execute(f'''
+        UPDATE bidders SET {', '.join(
+            f"{c} = COALESCE({c}, 0) - COALESCE((SELECT b.{c} FROM {BASELINE_TABLE} b WHERE b.bidder_id = bidders.bidder_id), 0)"
+            for c in counters)}
+        WHERE bidder_id IN (SELECT bidder_id FROM {BASELINE_TABLE})
+    ''')
+    cursor.execute(f'''
+        INSERT INTO bidders (bidder_id, {', '.join(counters)}, highest_bid, first_seen_ms, last_seen_ms)
+        SELECT bidder_id, {', '.join(counters)}, highest_bid, first_seen_ms, last_seen_ms
+        FROM {SHADOW_TABLE} WHERE 1
+        ON CONFLICT(bidder_id) DO UPDATE SET
+            {', '.join(f"{c} = {c} + excluded.{c}" for c in counters)},
+            highest_bid = MAX(COALESCE(highest_bid, 0), excluded.highest_bid),
+            first_seen_ms = MIN(COALESCE(first_seen_ms, excluded.first_seen_ms), excluded.first_seen_ms),
+            last_seen_ms = MAX(COALESCE(last_seen_ms, 0), COALESCE(excluded.last_seen_ms, 0))
+    ''')
+    cursor.execute(f"DROP TABLE {SHADOW_TABLE}")
+    cursor.execute(f"DROP TABLE {BASELINE_TABLE}")
+    cursor.execute("DELETE FROM retention_state WHERE name LIKE ?", (STATE_PREFIX + '%',))
+
+
+def rebuild_step(conn, chunk_rows=CHUNK_ROWS):
+    """Replay the next auction_id range into the shadow table; returns (auctions, done)
+
+    Every range holds whole auctions and is committed with its watermark, so an
+    interrupted rebuild resumes at the next range and bidders keeps its old
+    numbers until the last step swaps the rebuilt counters in. Updates stored
+    after the first step are left to the live tracker (flush its deltas before
+    the first step).
+    """
+    cursor = conn.cursor()
+    if not table_columns(cursor, SHADOW_TABLE):
+        _begin(cursor)
+    after = get_watermark(cursor, STATE_PREFIX + 'auction_id')
+    max_id = get_watermark(cursor, STATE_PREFIX + 'max_id')
+    deleted_id = get_watermark(cursor, STATE_PREFIX + 'deleted_id')
+
+    # Whole auctions, ~chunk_rows updates; None once every auction was replayed
+    cursor.execute('''
+        SELECT MAX(auction_id) FROM (
+            SELECT auction_id FROM auction_updates WHERE auction_id > ? ORDER BY auction_id LIMIT ?
+        )
+    ''', (after, chunk_rows))
+    last = cursor.fetchone()[0]
+    upper = last if last is not None else MAX_ID
+    sold = _sold(cursor, after, upper, deleted_id)
+
+    tracker = BidderTracker()
+    replay = conn.cursor()
+    replay.execute('''
+        SELECT auction_id, highest_bidder, highest_bid, number_of_bids, ends_at, update_time_ms
+        FROM auction_updates
+        WHERE auction_id > ? AND auction_id <= ? AND id <= ?
+        ORDER BY auction_id, update_time_ms, id
+    ''', (after, upper, max_id))
+    replayed = 0
+    current = None
+    for auction_id, bidder, bid, number_of_bids, ends_at, ts_ms in replay:
+        if auction_id != current:
+            if current is not None:
+                tracker.close(None, current, current in sold)
+                replayed += 1
+            current = auction_id
+        tracker.observe(None, auction_id, bidder, bid, number_of_bids, ends_at, ts_ms)
+    if current is not None:
+        tracker.close(None, current, current in sold)
+        replayed += 1
+
+    # Auctions summarized and pruned by retention.py: only the winner is known
+    if table_columns(cursor, 'auction_summaries'):
+        cursor.execute('''
+            SELECT final_bidder, final_bid
+            FROM auction_summaries s
+            WHERE auction_id > ? AND auction_id <= ?
+              AND outcome = 'auction_sold' AND final_bidder IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM auction_updates a WHERE a.auction_id = s.auction_id)
+              AND NOT EXISTS (SELECT 1 FROM deleted_items d WHERE d.item_id = s.auction_id AND d.id > ?)
+        ''', (after, upper, deleted_id))
+        for winner, final_bid in cursor.fetchall():
+            tracker.credit_win(winner, final_bid)
+            replayed += 1
+
+    cursor.executemany(UPSERT_SQL.format(table=SHADOW_TABLE), tracker.rows())
+    if last is None:
+        _swap(cursor)
+    else:
+        set_watermark(cursor, STATE_PREFIX + 'auction_id', last)
+    conn.commit()
+    return replayed, last is None
+
+
+def rebuild(conn, chunk_rows=CHUNK_ROWS):
+    """Run every rebuild step; returns auctions replayed"""
+    replayed = 0
+    while True:
+        auctions, done = rebuild_step(conn, chunk_rows)
+        replayed += auctions
+        if done:
+            return replayed
+
+
+def migrate(conn):
+    """Add the new columns and rebuild every bidder's stats, one auction range per transaction"""
+    # Imported here - migrations.py imports this module
+    from migrations import prepare_deleted_items_id
+
+    cursor = conn.cursor()
+    add_columns(cursor)
+    cursor.execute(RETENTION_STATE_DDL.format(name='retention_state'))
+    # Sales are bounded by deleted_items.id
+    prepare_deleted_items_id(cursor)
+    conn.commit()
+    return rebuild(conn)
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    db_file = sys.argv[1] if len(sys.argv) > 1 else DB_FILE
+
+    if not os.path.exists(db_file):
+        print(f"ERROR - Database not found: {db_file}")
+        sys.exit(1)
+
+    try:
+        conn = sqlite3.connect(db_file)
+        replayed = migrate(conn)
+        conn.close()
+
+        print("✓ Migration complete!")
+        print(f"  Rebuilt bidder stats from {replayed:,} auctions")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Migration Script: Move repeated text columns into dimension tables
+Rebuilds item_snapshots and auction_updates with integer surrogate keys
+without deleting existing data
+"""
+
+import sqlite3
+import sys
+import os
+
+from dimensions import DIMENSIONS, create_dimension_tables
+from schema import DB_FILE, ITEM_SNAPSHOTS_DDL, AUCTION_UPDATES_DDL, INDEXES, VIEWS, table_columns
+from timestamps import epoch_ms_sql
+
+# Table -> (DDL, dimension columns stored in it)
+NORMALIZED_TABLES = {
+    'item_snapshots': (ITEM_SNAPSHOTS_DDL, list(DIMENSIONS)),
+    'auction_updates': (AUCTION_UPDATES_DDL, ['market_name']),
+}
+
+
+def needs_migration(cursor):
+    """True if any table still stores dimension values as TEXT"""
+    for table in NORMALIZED_TABLES:
+        columns = table_columns(cursor, table)
+        if columns and 'market_name_id' not in columns:
+            return True
+    return False
+
+
+def fill_dimensions(cursor, table, dim_columns, where=''):
+    """Add the distinct text values of a table (optionally a WHERE slice) to the dimension tables"""
+    old_columns = table_columns(cursor, table)
+    for column in dim_columns:
+        if column in old_columns:
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO {DIMENSIONS[column]} (value)
+                SELECT DISTINCT {column} FROM {table} t WHERE {column} IS NOT NULL {where}
+            ''')
+
+
+def normalized_select(cursor, table, new_columns, dim_columns):
+    """SELECT expressions (over alias t) mapping an old-layout table onto new_columns"""
+    old_columns = table_columns(cursor, table)
+    select = []
+    for column in new_columns:
+        source = column[:-3] if column.endswith('_id') else None
+        if source in dim_columns:
+            if source in old_columns:
+                select.append(f"(SELECT id FROM {DIMENSIONS[source]} WHERE value = t.{source})")
+            else:
+                # e.g. auction_updates from before the market_name column existed
+                select.append("NULL")
+        elif column in old_columns:
+            select.append(f"t.{column}")
+        elif column.endswith('_ms') and column[:-3] in old_columns:
+            # Epoch-ms columns are derived from their TEXT counterparts on copy
+            select.append(epoch_ms_sql(f"t.{column[:-3]}"))
+        else:
+            select.append("NULL")
+    return select
+
+
+def rebuild_table(cursor, table, ddl, dim_columns):
+    """Copy a table into the normalized layout, resolving text to keys in SQL"""
+    new_table = f"{table}_normalized"
+
+    # Fill the dimension tables from the distinct values first
+    fill_dimensions(cursor, table, dim_columns)
+
+    cursor.execute(f"DROP TABLE IF EXISTS {new_table}")
+    cursor.execute(ddl.format(name=new_table))
+    new_columns = table_columns(cursor, new_table)
+    select = normalized_select(cursor, table, new_columns, dim_columns)
+
+    cursor.execute(f'''
+        INSERT INTO {new_table} ({', '.join(new_columns)})
+        SELECT {', '.join(select)} FROM {table} t
+    ''')
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+
+
+def migrate(conn):
+    """Normalize an existing database in place (no-op if already migrated)"""
+    cursor = conn.cursor()
+    create_dimension_tables(cursor)
+    cursor.execute("DROP VIEW IF EXISTS item_snapshots_named")
+    cursor.execute("DROP VIEW IF EXISTS auction_updates_named")
+
+    for table, (ddl, dim_columns) in NORMALIZED_TABLES.items():
+        columns = table_columns(cursor, table)
+        if not columns or 'market_name_id' in columns:
+            continue
+        print(f"Rebuilding {table}...")
+        rebuild_table(cursor, table, ddl, dim_columns)
+        # Dropping the old table dropped its indexes
+        for sql in INDEXES:
+            if f" ON {table}(" in sql:
+                cursor.execute(sql)
+    for sql in VIEWS:
+        cursor.execute(sql)
+    conn.commit()
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    db_file = sys.argv[1] if len(sys.argv) > 1 else DB_FILE
+
+    if not os.path.exists(db_file):
+        print(f"ERROR - Database not found: {db_file}")
+        sys.exit(1)
+
+    try:
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+
+        print("Checking current schema...")
+        if not needs_migration(cursor):
+            print("✓ Dimension tables already in use")
+            conn.close()
+            sys.exit(0)
+
+        size_before = os.path.getsize(db_file)
+        migrate(conn)
+
+        # Reclaim the pages freed by the narrower rows
+        print("Compacting database...")
+        conn.execute("VACUUM")
+        conn.close()
+
+        size_after = os.path.getsize(db_file)
+        print("✓ Migration complete!")
+        print(f"  Size: {size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB")
+        for column, table in DIMENSIONS.items():
+            print(f"  {column} -> {table}")
+        print("  Views: item_snapshots_named, auction_updates_named (old column names)")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        sys.exit(1)
+
+    print("\nYou can now restart the tracker!")
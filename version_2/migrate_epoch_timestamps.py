@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Migration Script: Add integer epoch-millisecond time columns
+Backfills *_ms columns from the TEXT/seconds timestamps of any monitor schema
+(version 1 or version 2) and creates the time-window indexes
+"""
+
+import sqlite3
+import sys
+import os
+
+from schema import DB_FILE, table_columns
+from timestamps import epoch_ms_columns, EPOCH_MS_INDEXES, SUPERSEDED_INDEXES, epoch_ms_sql
+
+
+def pending_columns(cursor):
+    """(table, source, target) pairs whose epoch-ms column is missing"""
+    return [
+        (table, source, target)
+        for table, source, target in epoch_ms_columns(lambda table: table_columns(cursor, table))
+        if target not in table_columns(cursor, table)
+    ]
+
+
+def needs_migration(cursor):
+    """True if any known timestamp column has no epoch-ms counterpart yet"""
+    return bool(pending_columns(cursor))
+
+
+def add_columns(cursor):
+    """Add the missing *_ms columns (cheap - no table rewrite)"""
+    for table, source, target in pending_columns(cursor):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {target} INTEGER")
+
+
+def backfill(cursor):
+    """Fill *_ms from the source column wherever it is still NULL"""
+    filled = 0
+    for table, source, target in epoch_ms_columns(lambda table: table_columns(cursor, table)):
+        if target not in table_columns(cursor, table):
+            continue
+        cursor.execute(f'''
+            UPDATE {table} SET {target} = {epoch_ms_sql(source)}
+            WHERE {target} IS NULL AND {source} IS NOT NULL
+        ''')
+        filled += max(cursor.rowcount, 0)
+    return filled
+
+
+def create_indexes(cursor):
+    """Replace text-time indexes with epoch-ms range indexes"""
+    for name in SUPERSEDED_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    for name, table, index_columns in EPOCH_MS_INDEXES:
+        columns = table_columns(cursor, table)
+        if all(column in columns for column in index_columns):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(index_columns)})")
+
+
+def migrate(conn):
+    """Add, backfill and index every epoch-ms column; returns rows backfilled"""
+    cursor = conn.cursor()
+    add_columns(cursor)
+    filled = backfill(cursor)
+    create_indexes(cursor)
+    conn.commit()
+    return filled
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    db_file = sys.argv[1] if len(sys.argv) > 1 else DB_FILE
+
+    if not os.path.exists(db_file):
+        print(f"ERROR - Database not found: {db_file}")
+        sys.exit(1)
+
+    try:
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+
+        print("Checking current schema...")
+        for table, source, target in pending_columns(cursor):
+            print(f"  {table}.{source} -> {target}")
+
+        filled = migrate(conn)
+        cursor.execute("ANALYZE")
+        conn.close()
+
+        print("✓ Migration complete!")
+        print(f"  Backfilled {filled:,} timestamp values")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        sys.exit(1)
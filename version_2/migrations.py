@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Schema Migrations
+Versioned in-place upgrades of csgoempire_monitor.db, tracked with PRAGMA user_version
+
+Every migration has a quick prepare() - DDL only (add columns, rename an old
+table out of the way, create its replacement) - after which the tracker can
+write again. Copying or recomputing existing rows is a separate backfill,
+run CHUNK_ROWS at a time in its own transaction. Its progress is kept in
+retention_state ('migration:<name>...'), so a multi-GB upgrade needs no copy
+of the file, survives restarts, and the GUI interleaves it with ingest.
+
+    pending = upgrade(conn)            # prepare steps, then user_version = LATEST
+    while backfill_step(conn)[1]: ...  # one chunk per call
+"""
+
+import time
+from collections import namedtuple
+
+from schema import INDEXES, VIEWS, RETENTION_STATE_DDL, create_schema, get_watermark, set_watermark, table_columns
+from dimensions import DIMENSIONS, create_dimension_tables
+from timestamps import epoch_ms_columns, epoch_ms_sql
+import migrate_dimensions
+import migrate_epoch_timestamps
+import migrate_bidder_stats
+
+# Rows copied/updated per backfill transaction
+CHUNK_ROWS = 5000
+
+PENDING_PREFIX = 'migration:'
+
+# Tables of the version 1 monitors' csgoempire_monitor.db, moved aside as legacy_<table>
+LEGACY_TABLES = ['items', 'auctions', 'auction_updates', 'bidders']
+
+# prepare(cursor) -> True if a backfill is needed; backfill(conn) -> (rows, done)
+Migration = namedtuple('Migration', 'version name prepare backfill', defaults=(None,))
+
+
+def get_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def set_version(cursor, version):
+    cursor.execute(f"PRAGMA user_version = {int(version)}")
+
+
+def next_chunk(cursor, table, after, chunk_rows, key='rowid'):
+    """Last key of the next chunk after `after` (None when the table is exhausted)"""
+    cursor.execute(f'''
+        SELECT MAX({key}) FROM (SELECT {key} FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?)
+    ''', (after, chunk_rows))
+    return cursor.fetchone()[0]
+
+
+def drop_table_indexes(cursor, table):
+    """Drop the explicit indexes of a table (their names are reused by the new layout)"""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    )
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def move_aside(cursor, table, new_name):
+    """Rename a table (instant) after dropping its indexes"""
+    drop_table_indexes(cursor, table)
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {new_name}")
+
+
+def create_table_indexes(cursor, table):
+    for sql in INDEXES:
+        if f" ON {table}(" in sql:
+            cursor.execute(sql)
+
+
+# --- 1: version 1 monitor tables --------------------------------------------
+
+def is_legacy_layout(cursor):
+    """csgoempire_monitor.db written by a version 1 monitor"""
+    columns = table_columns(cursor, 'items')
+    return bool(columns) and 'total_snapshots' not in columns
+
+
+def prepare_legacy(cursor):
+    if not is_legacy_layout(cursor):
+        return False
+    for table in LEGACY_TABLES:
+        if table_columns(cursor, table):
+            move_aside(cursor, table, f"legacy_{table}")
+    create_schema(cursor)
+    return True
+
+
+def legacy_select(columns, mapping):
+    """Expressions of (source column, expression) pairs - NULL where the column is absent"""
+    return [expression if column in columns else 'NULL' for column, expression in mapping]
+
+
+def backfill_legacy(conn, chunk_rows=CHUNK_ROWS):
+    """Copy legacy_items into items + one snapshot each, then legacy_auction_updates"""
+    cursor = conn.cursor()
+    state = PENDING_PREFIX + 'legacy_v1_tables:copied'
+    after = get_watermark(cursor, state)
+
+    columns = table_columns(cursor, 'legacy_items')
+    if columns:
+        last = next_chunk(cursor, 'legacy_items', after, chunk_rows)
+        if last is None:
+            cursor.execute("DROP TABLE legacy_items")
+            set_watermark(cursor, state, 0)
+            conn.commit()
+            return 0, False
+        where = f"AND t.rowid > {int(after)} AND t.rowid <= {int(last)}"
+        migrate_dimensions.fill_dimensions(cursor, 'legacy_items', list(DIMENSIONS), where)
+        first_seen = 'created_at' if 'created_at' in columns else 'published_at'
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO items (item_id, market_name, first_seen, last_seen, total_snapshots,
+                                         first_seen_ms, last_seen_ms)
+            SELECT t.item_id, t.market_name, t.{first_seen}, t.{first_seen}, 1,
+                   {epoch_ms_sql(f't.{first_seen}')}, {epoch_ms_sql(f't.{first_seen}')}
+            FROM legacy_items t WHERE t.item_id IS NOT NULL {where}
+        ''')
+        dim = lambda column: (column, f"(SELECT id FROM {DIMENSIONS[column]} WHERE value = t.{column})")
+        plain = lambda column: (column, f"t.{column}")
+        select = legacy_select(columns, [
+            plain('item_id'), dim('market_name'), plain('market_value'), plain('suggested_price'),
+            plain('purchase_price'), plain('above_recommended_price'), dim('type'), dim('category'),
+            dim('sub_type'), dim('rarity'), plain('wear_value'), dim('wear_name'), plain('published_at'),
+            plain(first_seen), (first_seen, epoch_ms_sql(f't.{first_seen}')),
+            ('published_at', epoch_ms_sql('t.published_at')),
+        ])
+        cursor.execute(f'''
+            INSERT INTO item_snapshots (
+                item_id, market_name_id, market_value, suggested_price, purchase_price,
+                above_recommended_price, type_id, category_id, sub_type_id, rarity_id,
+                wear, wear_name_id, published_at, snapshot_time, snapshot_time_ms, published_at_ms
+            )
+            SELECT {', '.join(select)}
+            FROM legacy_items t WHERE t.item_id IS NOT NULL {where}
+        ''')
+        set_watermark(cursor, state, last)
+        conn.commit()
+        return last - after, False
+
+    columns = table_columns(cursor, 'legacy_auction_updates')
+    if columns:
+        last = next_chunk(cursor, 'legacy_auction_updates', after, chunk_rows)
+        if last is None:
+            cursor.execute("DROP TABLE legacy_auction_updates")
+            set_watermark(cursor, state, 0)
+            conn.commit()
+            return 0, False
+        time_ms = epoch_ms_sql('substr(t.timestamp, 1, 23)')
+        if 'timestamp_ms' in columns:
+            time_ms = f"COALESCE(t.timestamp_ms, {time_ms})"
+        cursor.execute(f'''
+            INSERT INTO auction_updates (
+                auction_id, item_id, market_name_id, update_time, highest_bid, highest_bidder,
+                number_of_bids, above_recommended_price, ends_at, update_time_ms
+            )
+            SELECT t.auction_id, t.auction_id,
+                   (SELECT d.id FROM items i JOIN dim_market_names d ON d.value = i.market_name
+                    WHERE i.item_id = t.auction_id),
+                   t.timestamp, t.highest_bid, t.highest_bidder, t.number_of_bids,
+                   t.above_recommended_price, t.ends_at, {time_ms}
+            FROM legacy_auction_updates t
+            WHERE t.rowid > ? AND t.rowid <= ?
+        ''', (after, last))
+        set_watermark(cursor, state, last)
+        conn.commit()
+        return last - after, False
+
+    # Bidder totals are recomputed by the bidder_stats migration
+    for table in ('legacy_auctions', 'legacy_bidders'):
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.commit()
+    return 0, True
+
+
+# --- 2: dimension tables ----------------------------------------------------
+
+def prepare_dimensions(cursor):
+    """Swap text-layout tables for empty normalized ones; old rows are copied by the backfill"""
+    pending = False
+    create_dimension_tables(cursor)
+    for table, (ddl, _) in migrate_dimensions.NORMALIZED_TABLES.items():
+        columns = table_columns(cursor, table)
+        if not columns or 'market_name_id' in columns:
+            continue
+        cursor.execute("DROP VIEW IF EXISTS item_snapshots_named")
+        cursor.execute("DROP VIEW IF EXISTS auction_updates_named")
+        move_aside(cursor, table, f"{table}_text")
+        cursor.execute(ddl.format(name=table))
+        # New rows continue after the old ids, so copied rows keep theirs
+        cursor.execute(f"SELECT MAX(id) FROM {table}_text")
+        max_id = cursor.fetchone()[0]
+        if max_id:
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, max_id))
+        create_table_indexes(cursor, table)
+        pending = True
+    if pending:
+        for sql in VIEWS:
+            cursor.execute(sql)
+    return pending
+
+
+def backfill_dimensions(conn, chunk_rows=CHUNK_ROWS):
+    cursor = conn.cursor()
+    for table, (_, dim_columns) in migrate_dimensions.NORMALIZED_TABLES.items():
+        source = f"{table}_text"
+        if not table_columns(cursor, source):
+            continue
+        state = f"{PENDING_PREFIX}dimension_tables:{table}"
+        after = get_watermark(cursor, state)
+        last = next_chunk(cursor, source, after, chunk_rows, key='id')
+        if last is None:
+            cursor.execute(f"DROP TABLE {source}")
+            conn.commit()
+            return 0, False
+        where = f"AND t.id > {int(after)} AND t.id <= {int(last)}"
+        migrate_dimensions.fill_dimensions(cursor, source, dim_columns, where)
+        new_columns = table_columns(cursor, table)
+        select = migrate_dimensions.normalized_select(cursor, source, new_columns, dim_columns)
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO {table} ({', '.join(new_columns)})
+            SELECT {', '.join(select)} FROM {source} t WHERE 1 {where}
+        ''')
+        set_watermark(cursor, state, last)
+        conn.commit()
+        return last - after, False
+    return 0, True
+
+
+# --- 3: epoch-ms columns ----------------------------------------------------
+
+def prepare_epoch_ms(cursor):
+    pending = migrate_epoch_timestamps.needs_migration(cursor)
+    migrate_epoch_timestamps.add_columns(cursor)
+    migrate_epoch_timestamps.create_indexes(cursor)
+    return pending
+
+
+def backfill_epoch_ms(conn, chunk_rows=CHUNK_ROWS):
+    """Fill NULL *_ms values one rowid range at a time, column by column"""
+    cursor = conn.cursor()
+    for table, source, target in epoch_ms_columns(lambda table: table_columns(cursor, table)):
+        if target not in table_columns(cursor, table):
+            continue
+        state = f"{PENDING_PREFIX}epoch_ms_columns:{table}.{target}"
+        after = get_watermark(cursor, state)
+        if after < 0:
+            continue
+        last = next_chunk(cursor, table, after, chunk_rows)
+        if last is None:
+            set_watermark(cursor, state, -1)
+            conn.commit()
+            continue
+        cursor.execute(f'''
+            UPDATE {table} SET {target} = {epoch_ms_sql(source)}
+            WHERE rowid > ? AND rowid <= ? AND {target} IS NULL AND {source} IS NOT NULL
+        ''', (after, last))
+        updated = max(cursor.rowcount, 0)
+        set_watermark(cursor, state, last)
+        conn.commit()
+        return updated, False
+    return 0, True
+
+
+# --- 4: bidder stats --------------------------------------------------------
+
+def prepare_bidder_stats(cursor):
+    pending = migrate_bidder_stats.needs_migration(cursor)
+    if pending:
+        migrate_bidder_stats.add_columns(cursor)
+    # Bids copied from a version 1 database are counted once the copy is done
+    return pending or bool(table_columns(cursor, 'legacy_auction_updates'))
+
+
+def backfill_bidder_stats(conn, chunk_rows=CHUNK_ROWS):
+    """Replay one auction_id range into the shadow table; the last step swaps it in"""
+    return migrate_bidder_stats.rebuild_step(conn, chunk_rows)
+
+
+# --- 5+: new tables and indexes from schema.py ------------------------------
+
+def prepare_schema(cursor):
+    create_schema(cursor)
+    return False
+
+
+# --- 9: deleted_items id ---------------------------------------------------
+
+# Watermarks kept on deleted_items rowids before it had an id column
+DELETED_ITEMS_WATERMARKS = ['lifecycle:deleted_items', 'price_index:deleted_items']
+
+
+def prepare_deleted_items_id(cursor):
+    """Rebuild deleted_items with an AUTOINCREMENT id equal to each row's old rowid
+
+    Copied here rather than in a backfill: the bidder_stats rebuild and the
+    lifecycle/price index readers all read deleted_items, and one row per
+    removed listing is small next to the snapshot and bid tables.
+    """
+    columns = table_columns(cursor, 'deleted_items')
+    if not columns or 'id' in columns:
+        create_schema(cursor)
+        return False
+    move_aside(cursor, 'deleted_items', 'deleted_items_rowid')
+    create_schema(cursor)
+    cursor.execute(f'''
+        INSERT INTO deleted_items (id, {', '.join(columns)})
+        SELECT rowid, {', '.join(columns)} FROM deleted_items_rowid
+    ''')
+    cursor.execute("DROP TABLE deleted_items_rowid")
+    # New ids continue past every rowid a watermark has seen, even if a rollover restarted them
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM deleted_items")
+    last = max([cursor.fetchone()[0]] + [get_watermark(cursor, name) for name in DELETED_ITEMS_WATERMARKS])
+    cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'deleted_items'")
+    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('deleted_items', ?)", (last,))
+    return False
+
+
+# --- 10: hourly time-to-sale sketches --------------------------------------
+
+def prepare_sketch_hours(cursor):
+    """Add the hour of removal to time_to_sale_sketch
+
+    The counts already folded cannot be split by hour; they are kept under
+    hour 0, which only a percentile over all time reads.
+    """
+    columns = table_columns(cursor, 'time_to_sale_sketch')
+    if not columns or 'hour' in columns:
+        create_schema(cursor)
+        return False
+    move_aside(cursor, 'time_to_sale_sketch', 'time_to_sale_sketch_flat')
+    create_schema(cursor)
+    cursor.execute('''
+        INSERT INTO time_to_sale_sketch (dimension, value, sale_type, hour, bucket, count)
+        SELECT dimension, value, sale_type, 0, bucket, count FROM time_to_sale_sketch_flat
+    ''')
+    cursor.execute("DROP TABLE time_to_sale_sketch_flat")
+    return False
+
+
+MIGRATIONS = [
+    Migration(1, 'legacy_v1_tables', prepare_legacy, backfill_legacy),
+    Migration(2, 'dimension_tables', prepare_dimensions, backfill_dimensions),
+    Migration(3, 'epoch_ms_columns', prepare_epoch_ms, backfill_epoch_ms),
+    Migration(4, 'bidder_stats', prepare_bidder_stats, backfill_bidder_stats),
+    Migration(5, 'schema', prepare_schema),
+    Migration(6, 'frame_keys', prepare_schema),
+    Migration(7, 'item_lifecycle', prepare_schema),
+    Migration(8, 'price_index', prepare_schema),
+    Migration(9, 'deleted_items_id', prepare_deleted_items_id),
+    Migration(10, 'time_to_sale_hours', prepare_sketch_hours),
+]
+
+LATEST = MIGRATIONS[-1].version
+
+
+def pending_backfills(cursor):
+    """Names of migrations whose backfill has not finished, in order"""
+    cursor.execute("SELECT name FROM retention_state WHERE name LIKE ?", (PENDING_PREFIX + '%',))
+    names = {row[0] for row in cursor.fetchall()}
+    return [m.name for m in MIGRATIONS if PENDING_PREFIX + m.name in names]
+
+
+def upgrade(conn, log=print):
+    """Run every pending prepare step; returns the backfills still to run"""
+    cursor = conn.cursor()
+    cursor.execute(RETENTION_STATE_DDL.format(name='retention_state'))
+    version = get_version(cursor)
+
+    if version == 0 and not table_columns(cursor, 'items'):
+        # New database - nothing to migrate
+        create_schema(cursor)
+        set_version(cursor, LATEST)
+        conn.commit()
+        return []
+
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        log(f"Migration {migration.version}: {migration.name}")
+        if migration.prepare(cursor) and migration.backfill:
+            set_watermark(cursor, PENDING_PREFIX + migration.name, 0)
+        set_version(cursor, migration.version)
+        conn.commit()
+    return pending_backfills(conn.cursor())
+
+
+def backfill_step(conn, chunk_rows=CHUNK_ROWS):
+    """Run one chunk of the first pending backfill; returns (rows, migration name or None)"""
+    cursor = conn.cursor()
+    for name in pending_backfills(cursor):
+        migration = next(m for m in MIGRATIONS if m.name == name)
+        rows, done = migration.backfill(conn, chunk_rows)
+        if done:
+            cursor.execute("DELETE FROM retention_state WHERE name = ? OR name LIKE ?",
+                           (PENDING_PREFIX + name, f"{PENDING_PREFIX}{name}:%"))
+            conn.commit()
+        return rows, name
+    return 0, None
+
+
+def backfill_all(conn, chunk_rows=CHUNK_ROWS, pause=0, log=None):
+    """Run every pending backfill to completion; returns rows processed"""
+    total = 0
+    while True:
+        rows, name = backfill_step(conn, chunk_rows)
+        if name is None:
+            return total
+        total += rows
+        if log and rows:
+            log(f"  {name}: {total:,} rows")
+        if pause:
+            time.sleep(pause)
+
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Time Partitions
+Rolls closed days/weeks out of csgoempire_monitor.db into per-period partition files
+and reads time ranges back across them
+
+The live database stays a small hot partition: the writer never changes file,
+rollover() moves rows older than the hot window into partitions/ and the
+partition files can then be compacted or archived without touching the writer.
+Incremental readers fold rows from id watermarks in the hot database, so
+rollover() advances the item lifecycle and checkpoints the price index
+first, and never moves a row above the lowest reader watermark of its table.
+"""
+
+import sqlite3
+import sys
+import os
+import gzip
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+
+from schema import DB_FILE, create_schema, get_watermark, table_columns
+from dimensions import DIMENSIONS
+from timestamps import now_ms, format_ms
+import lifecycle
+import price_index
+
+PARTITION_DIR = 'partitions'
+PARTITION_PREFIX = 'csgoempire_monitor_'
+
+# 'day' or 'week' (ISO weeks)
+DEFAULT_PERIOD = 'day'
+
+# Rows stay in the hot database for at least this long after their period
+# closes, so auctions that run over midnight still find their bids/snapshots
+HOT_KEEP_MS = 24 * 60 * 60 * 1000
+
+# Partitions older than this are gzipped by `python partitions.py archive`
+ARCHIVE_AFTER_DAYS = 30
+
+# SQLite allows 10 attached databases per connection by default
+MAX_ATTACHED = 10
+
+# Rows moved per transaction - the writer waits for one batch at most
+BATCH_SIZE = 2000
+BATCH_PAUSE = 0.01
+
+# Table -> epoch-ms column that decides its partition
+PARTITIONED_TABLES = {
+    'item_snapshots': 'snapshot_time_ms',
+    'auction_updates': 'update_time_ms',
+    'deleted_items': 'deleted_at_ms',
+    # Items leave the hot registry once they have been deleted
+    'items': 'deleted_at_ms',
+}
+
+# Table -> retention_state watermarks of the readers folding it by id
+# (lifecycle.py, price_index.py); rows above the lowest one stay hot
+READER_WATERMARKS = {
+    'item_snapshots': ['lifecycle:item_snapshots', 'price_index:item_snapshots'],
+    'auction_updates': ['lifecycle:auction_updates'],
+    'deleted_items': ['lifecycle:deleted_items', 'price_index:deleted_items'],
+}
+
+# Dimension key columns to carry over so every partition is self-contained
+PARTITION_DIM_COLUMNS = {
+    'item_snapshots': list(DIMENSIONS),
+    'auction_updates': ['market_name'],
+}
+
+
+def partition_key(ms, period=DEFAULT_PERIOD):
+    """Partition key for an epoch-ms time: '2025-01-31' (day) or '2025-W05' (week)"""
+    dt = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    if period == 'week':
+        year, week, _ = dt.isocalendar()
+        return f"{year}-W{week:02d}"
+    return dt.strftime('%Y-%m-%d')
+
+
+def partition_bounds(key):
+    """(start_ms, end_ms) covered by a partition key, end exclusive"""
+    if '-W' in key:
+        year, week = key.split('-W')
+        start = datetime.fromisocalendar(int(year), int(week), 1)
+        end = start + timedelta(weeks=1)
+    else:
+        start = datetime.strptime(key, '%Y-%m-%d')
+        end = start + timedelta(days=1)
+    start, end = start.replace(tzinfo=timezone.utc), end.replace(tzinfo=timezone.utc)
+    return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+
+def partition_path(key, directory=PARTITION_DIR):
+    """File holding one partition"""
+    return os.path.join(directory, f"{PARTITION_PREFIX}{key}.db")
+
+
+def list_partitions(directory=PARTITION_DIR, archived=False):
+    """Sorted [(key, path)] of partition files (.db.gz archives only if archived=True)"""
+    if not os.path.isdir(directory):
+        return []
+    suffixes = ('.db', '.db.gz') if archived else ('.db',)
+    partitions = []
+    for name in os.listdir(directory):
+        if name.startswith(PARTITION_PREFIX) and name.endswith(suffixes):
+            key = name[len(PARTITION_PREFIX):].split('.db', 1)[0]
+            partitions.append((key, os.path.join(directory, name)))
+    return sorted(partitions)
+
+
+def oldest_ms(cursor):
+    """Earliest partition time still held in the hot database"""
+    oldest = None
+    for table, column in PARTITIONED_TABLES.items():
+        if column not in table_columns(cursor, table):
+            continue
+        cursor.execute(f"SELECT MIN({column}) FROM main.{table}")
+        value = cursor.fetchone()[0]
+        if value is not None and (oldest is None or value < oldest):
+            oldest = value
+    return oldest
+
+
+def _attached_columns(cursor, schema, table):
+    """Column names of a table in an attached database"""
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [col[1] for col in cursor.fetchall()]
+
+
+def reader_limits(cursor):
+    """{table: highest id every reader has folded}"""
+    return {table: min(get_watermark(cursor, name) for name in names)
+            for table, names in READER_WATERMARKS.items()}
+
+
+def move_period(conn, key, directory=PARTITION_DIR, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    """Move every hot row inside one period that the readers have folded into its partition file; returns rows moved
+
+    Each batch is copied and deleted in one transaction (both files commit
+    together), so an interrupted move resumes with the rows still left.
+    """
+    start_ms, end_ms = partition_bounds(key)
+    path = partition_path(key, directory)
+    os.makedirs(directory, exist_ok=True)
+
+    # Partition files get the full schema (tables, indexes, dims, views)
+    part = sqlite3.connect(path)
+    create_schema(part.cursor())
+    part.commit()
+    part.close()
+
+    cursor = conn.cursor()
+    limits = reader_limits(cursor)
+    conn.commit()
+    cursor.execute("ATTACH DATABASE ? AS part", (path,))
+    moved = 0
+    try:
+        for table, column in PARTITIONED_TABLES.items():
+            hot_columns = table_columns(cursor, table)
+            if column not in hot_columns:
+                continue
+            part_columns = set(_attached_columns(cursor, 'part', table))
+            columns = ', '.join(c for c in hot_columns if c in part_columns)
+            where = f"{column} >= {start_ms} AND {column} < {end_ms}"
+            if table in limits:
+                where += f" AND id <= {limits[table]}"
+
+            while True:
+                cursor.execute("BEGIN")
+                # Moved rows are gone from main, so this always finds the next batch
+                cursor.execute(f"SELECT rowid FROM main.{table} WHERE {where} LIMIT ?", (batch_size,))
+                rowids = [row[0] for row in cursor.fetchall()]
+                if not rowids:
+                    conn.rollback()
+                    break
+                batch = f"rowid IN ({', '.join(str(rowid) for rowid in rowids)})"
+
+                # Same surrogate keys as the hot database - dim ids are never reused
+                for dim in PARTITION_DIM_COLUMNS.get(table, []):
+                    if f"{dim}_id" in hot_columns:
+                        cursor.execute(f'''
+                            INSERT OR IGNORE INTO part.{DIMENSIONS[dim]} (id, value)
+                            SELECT id, value FROM main.{DIMENSIONS[dim]}
+                            WHERE id IN (SELECT {dim}_id FROM main.{table} WHERE {batch})
+                        ''')
+
+                cursor.execute(f'''
+                    INSERT OR REPLACE INTO part.{table} ({columns})
+                    SELECT {columns} FROM main.{table} WHERE {batch}
+                ''')
+                cursor.execute(f"DELETE FROM main.{table} WHERE {batch}")
+                moved += max(cursor.rowcount, 0)
+                conn.commit()
+                time.sleep(pause)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("DETACH DATABASE part")
+    return moved
+
+
+def rollover(conn, period=DEFAULT_PERIOD, directory=PARTITION_DIR, keep_ms=HOT_KEEP_MS, now=None, prices=None):
+    """Move every closed period older than the hot window out of the hot database
+
+    Returns {partition_key: rows_moved}. Cheap when nothing is due: one MIN()
+    per table on the epoch-ms indexes. Before the first move the lifecycle
+    is advanced and the price index - prices, the caller's in-memory
+    PriceIndex, or the stored checkpoint - advanced and checkpointed. A
+    period with rows a reader has still not folded (e.g. another process
+    holds a newer price index) is moved up to the reader watermarks and the
+    rest waits for the next rollover.
+    """
+    cutoff = (now if now is not None else now_ms()) - keep_ms
+    cursor = conn.cursor()
+    moved = {}
+    start = oldest_ms(cursor)
+    if start is None or partition_bounds(partition_key(start, period))[1] > cutoff:
+        return moved
+    lifecycle.advance(conn)
+    if prices is None:
+        price_index.refresh(conn)
+    else:
+        prices.advance(conn)
+        prices.checkpoint(conn)
+    while start is not None:
+        key = partition_key(start, period)
+        _, end_ms = partition_bounds(key)
+        if end_ms > cutoff:
+            break
+        moved[key] = move_period(conn, key, directory)
+        start = oldest_ms(cursor)
+        if start is not None and partition_key(start, period) == key:
+            # Held back by a reader watermark
+            break
+    return moved
+
+
+def compact_partition(path):
+    """VACUUM + ANALYZE a closed partition (never the hot database)"""
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def archive_partition(path, archive_dir=None):
+    """Gzip a closed partition to <path>.gz (optionally into archive_dir) and remove it"""
+    target = path + '.gz'
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+        target = os.path.join(archive_dir, os.path.basename(target))
+    with open(path, 'rb') as src, gzip.open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+    return target
+
+
+def restore_partition(path):
+    """Unpack a .db.gz archive next to itself so the reader can attach it again"""
+    target = path[:-3]
+    with gzip.open(path, 'rb') as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    return target
+
+
+class PartitionReader:
+    """Query a time range across the hot database and the partitions it overlaps
+
+    SQL refers to <table>_range (e.g. auction_updates_range): a temp view that
+    UNION ALLs the hot table with the same table in every attached partition.
+    Dimension tables are read from the hot database, whose keys every
+    partition shares. More partitions than SQLite can attach at once are read
+    in batches, so aggregates must be combined by the caller.
+    """
+
+    def __init__(self, db_file=DB_FILE, directory=PARTITION_DIR):
+        self.db_file = db_file
+        self.directory = directory
+
+    def partitions_for(self, start_ms=None, end_ms=None):
+        """Partition files overlapping [start_ms, end_ms)"""
+        selected = []
+        for key, path in list_partitions(self.directory):
+            part_start, part_end = partition_bounds(key)
+            if start_ms is not None and part_end <= start_ms:
+                continue
+            if end_ms is not None and part_start >= end_ms:
+                continue
+            selected.append(path)
+        return selected
+
+    def query(self, sql, params=(), start_ms=None, end_ms=None):
+        """Yield result rows of sql for every batch of partitions in the range"""
+        paths = self.partitions_for(start_ms, end_ms)
+        conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True)
+        cursor = conn.cursor()
+        try:
+            # First batch includes the hot database, later batches only partitions
+            batches = [paths[i:i + MAX_ATTACHED] for i in range(0, len(paths), MAX_ATTACHED)] or [[]]
+            for n, batch in enumerate(batches):
+                schemas = [f"p{i}" for i in range(len(batch))]
+                for schema, path in zip(schemas, batch):
+                    cursor.execute(f"ATTACH DATABASE ? AS {schema}", (f"file:{path}?mode=ro",))
+                sources = (['main'] if n == 0 else []) + schemas
+                self._create_range_views(cursor, sources)
+                cursor.execute(sql, params)
+                yield from cursor
+                for schema in schemas:
+                    cursor.execute(f"DETACH DATABASE {schema}")
+        finally:
+            conn.close()
+
+    def _create_range_views(self, cursor, sources):
+        """(Re)create the <table>_range temp views over the given schemas"""
+        for table in PARTITIONED_TABLES:
+            cursor.execute(f"DROP VIEW IF EXISTS temp.{table}_range")
+            columns = _attached_columns(cursor, 'main', table)
+            selects = []
+            for schema in sources:
+                present = set(_attached_columns(cursor, schema, table))
+                select = ', '.join(c if c in present else f"NULL AS {c}" for c in columns)
+                selects.append(f"SELECT {select} FROM {schema}.{table}")
+            cursor.execute(f"CREATE TEMP VIEW {table}_range AS " + ' UNION ALL '.join(selects))
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    usage = "Usage: python partitions.py [rollover|list|compact|archive] [day|week] [db_file]"
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    period = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PERIOD
+    db_file = sys.argv[3] if len(sys.argv) > 3 else DB_FILE
+
+    if command not in ('rollover', 'list', 'compact', 'archive') or period not in ('day', 'week'):
+        print(usage)
+        sys.exit(1)
+
+    try:
+        if command == 'rollover':
+            if not os.path.exists(db_file):
+                print(f"ERROR - Database not found: {db_file}")
+                sys.exit(1)
+            conn = sqlite3.connect(db_file)
+            moved = rollover(conn, period)
+            conn.close()
+            for key, rows in moved.items():
+                print(f"  {key}: {rows:,} rows -> {partition_path(key)}")
+            print(f"✓ Rolled over {len(moved)} partition(s)")
+
+        elif command == 'list':
+            for key, path in list_partitions(archived=True):
+                start_ms, end_ms = partition_bounds(key)
+                size = os.path.getsize(path) / 1024 / 1024
+                print(f"  {key}  {format_ms(start_ms, '%Y-%m-%d')} - {format_ms(end_ms - 1, '%Y-%m-%d')}  {size:.1f} MB  {path}")
+
+        else:
+            # Only closed partitions; the hot database is never touched
+            for key, path in list_partitions():
+                if command == 'compact':
+                    compact_partition(path)
+                    print(f"  ✓ Compacted {path}")
+                elif partition_bounds(key)[1] < now_ms() - ARCHIVE_AFTER_DAYS * 86400000:
+                    print(f"  ✓ Archived {archive_partition(path)}")
+
+    except Exception as e:
+        print(f"✗ {command} failed: {e}")
+        sys.exit(1)
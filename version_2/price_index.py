@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Price Index
+Fair price per (market_name, wear_name): quantile sketch and EWMA of listing prices and auction sales, in memory
+
+A PriceIndex observes every listing price (an item_snapshots row whose
+purchase_price is new for its item) and every sale (the final bid of an
+auction_sold deleted_items row) in O(1): one bucket count, one EWMA step.
+The sketch is the log-bucketed histogram of log_sketch.py, shared with
+lifecycle.py, over cents (a quantile read back is within 1% of the exact
+one); sketches merge by adding counts, which is how a market_name's wears
+are combined. A quote is computed once per change
+and cached, so reading one is a dict lookup.
+
+advance() folds the rows added since the index's watermarks (any writer
+works, nothing is counted twice); checkpoint() saves the changed entries
+and the watermarks in one transaction to the price_index table, and
+PriceIndex.load() starts from there. The GUI advances before every batch;
+retention.py advances and checkpoints before snapshots are downsampled.
+
+    python price_index.py [csgoempire_monitor.db]                      # advance, checkpoint, most observed
+    python price_index.py [db] --name "AK-47 | Redline (Field-Tested)"
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+
+from schema import DB_FILE, create_schema, get_watermark, set_watermark
+from dimensions import DIMENSIONS
+from log_sketch import LogSketch
+
+# Rows folded per query
+CHUNK_ROWS = 5000
+
+# EWMA: every observation moves it by at least EWMA_ALPHA, more after a gap
+# (half the weight after EWMA_HALF_LIFE_MS without observations)
+EWMA_ALPHA = 0.1
+EWMA_HALF_LIFE_MS = 24 * 60 * 60 * 1000
+
+# Quantiles reported as the fair price and its range
+MEDIAN, LOW, HIGH = 0.5, 0.25, 0.75
+
+# Prices in cents; observations, fair price (median), 25th/75th percentile, EWMA, last observation
+PriceQuote = namedtuple('PriceQuote', 'observations median low high ewma last_ms')
+
+# Watermarks: source table -> id column (retention_state names 'price_index:<table>')
+SOURCES = (('item_snapshots', 'id'), ('deleted_items', 'id'))
+
+# Rows folded by every pass that led to a checkpoint - an older state never overwrites a newer one
+ROWS_WATERMARK = 'price_index:rows'
+
+
+class PriceStats:
+    """Sketch and EWMA of one (market_name, wear_name)"""
+
+    __slots__ = ('sketch', 'ewma', 'last_ms', 'quote')
+
+    def __init__(self, sketch=None, ewma=None, last_ms=None):
+        self.sketch = sketch or LogSketch()
+        self.ewma = ewma
+        self.last_ms = last_ms
+        self.quote = None
+
+    def observe(self, cents, ts_ms):
+        self.sketch.add(cents)
+        if self.ewma is None:
+            self.ewma = float(cents)
+        elif self.last_ms is None or ts_ms >= self.last_ms:
+            gap_ms = ts_ms - (self.last_ms or ts_ms)
+            alpha = max(EWMA_ALPHA, 1 - 0.5 ** (gap_ms / EWMA_HALF_LIFE_MS))
+            self.ewma += alpha * (cents - self.ewma)
+        # else: older than the last observation - counted in the sketch, but it must not
+        # become the EWMA's newest price
+        self.last_ms = ts_ms if self.last_ms is None else max(self.last_ms, ts_ms)
+        self.quote = None
+
+
+def _quote(sketch, ewma, last_ms):
+    median, low, high = sketch.quantiles((MEDIAN, LOW, HIGH))
+    return PriceQuote(sketch.total, median, low, high, ewma, last_ms)
+
+
+class PriceIndex:
+    """In-memory price index, advanced from id watermarks and checkpointed to price_index"""
+
+    def __init__(self):
+        self.entries = {}       # market_name -> {wear_name: PriceStats} ('' = no wear)
+        self.merged = {}        # market_name -> PriceQuote over every wear (cached)
+        self.watermarks = {table: 0 for table, _ in SOURCES}
+        self.rows = 0           # rows folded since the index was empty
+        self.dirty = set()      # (market_name, wear_name) changed since the last checkpoint
+
+    def __len__(self):
+        return sum(len(wears) for wears in self.entries.values())
+
+    def observe(self, market_name, wear_name, cents, ts_ms):
+        """Add one price (cents) seen at ts_ms"""
+        wear_name = wear_name or ''
+        wears = self.entries.setdefault(market_name, {})
+        stats = wears.get(wear_name)
+        if stats is None:
+            stats = wears[wear_name] = PriceStats()
+        stats.observe(cents, ts_ms)
+        self.merged.pop(market_name, None)
+        self.dirty.add((market_name, wear_name))
+
+    def quote(self, market_name, wear_name=None):
+        """PriceQuote of one wear ('' for items without one), or of every wear merged; None if never seen"""
+        wears = self.entries.get(market_name)
+        if not wears:
+            return None
+        if wear_name is not None:
+            stats = wears.get(wear_name)
+            if stats is None:
+                return None
+            if stats.quote is None:
+                stats.quote = _quote(stats.sketch, stats.ewma, stats.last_ms)
+            return stats.quote
+        quote = self.merged.get(market_name)
+        if quote is None:
+            sketch = LogSketch()
+            for stats in wears.values():
+                sketch.merge(stats.sketch)
+            # EWMA of the most recently observed wear
+            latest = max(wears.values(), key=lambda stats: stats.last_ms or 0)
+            quote = self.merged[market_name] = _quote(sketch, latest.ewma, latest.last_ms)
+        return quote
+
+    def most_observed(self, limit=20):
+        """[(market_name, wear_name, PriceQuote)] with the most observations"""
+        keys = sorted(((stats.sketch.total, name, wear) for name, wears in self.entries.items()
+                       for wear, stats in wears.items()), reverse=True)[:limit]
+        return [(name, wear, self.quote(name, wear)) for _, name, wear in keys]
+
+    @classmethod
+    def load(cls, conn):
+        """Index as of the last checkpoint (empty if there is none)"""
+        index = cls()
+        cursor = conn.cursor()
+        cursor.execute('SELECT market_name, wear_name, ewma, last_ms, sketch FROM price_index')
+        for market_name, wear_name, ewma, last_ms, sketch in cursor.fetchall():
+            index.entries.setdefault(market_name, {})[wear_name] = PriceStats(
+                LogSketch.from_json(sketch), ewma, last_ms
+            )
+        for table, _ in SOURCES:
+            index.watermarks[table] = get_watermark(cursor, f'price_index:{table}')
+        index.rows = get_watermark(cursor, ROWS_WATERMARK)
+        return index
+
+    @staticmethod
+    def _listings(cursor, low, high):
+        """[(market_name, wear_name, cents, ts_ms)] of listing prices in the id range"""
+        # A snapshot counts when its purchase_price differs from the item's previous one
+        # (previous in idx_snapshots_item_time order - no sort per row)
+        cursor.execute(f'''
+            SELECT n.value, w.value, s.purchase_price, s.snapshot_time_ms
+            FROM item_snapshots s
+            JOIN {DIMENSIONS['market_name']} n ON n.id = s.market_name_id
+            LEFT JOIN {DIMENSIONS['wear_name']} w ON w.id = s.wear_name_id
+            WHERE s.id > ? AND s.id <= ? AND s.purchase_price > 0
+              AND s.purchase_price IS NOT (
+                  SELECT p.purchase_price FROM item_snapshots p
+                  WHERE p.item_id = s.item_id AND (p.snapshot_time_ms, p.id) < (s.snapshot_time_ms, s.id)
+                  ORDER BY p.snapshot_time_ms DESC, p.id DESC
+                  LIMIT 1
+              )
+        ''', (low, high))
+        return cursor.fetchall()
+
+    @staticmethod
+    def _sales(cursor, low, high):
+        """[(market_name, wear_name, cents, ts_ms)] of auction sales in the id range"""
+        # Name and wear from the item's first snapshot
+        cursor.execute(f'''
+            SELECT n.value, w.value, d.final_bid_amount, d.deleted_at_ms
+            FROM deleted_items d
+            JOIN item_snapshots s ON s.id = (SELECT MIN(id) FROM item_snapshots WHERE item_id = d.item_id)
+            JOIN {DIMENSIONS['market_name']} n ON n.id = s.market_name_id
+            LEFT JOIN {DIMENSIONS['wear_name']} w ON w.id = s.wear_name_id
+            WHERE d.id > ? AND d.id <= ? AND d.sale_type = 'auction_sold' AND d.final_bid_amount > 0
+        ''', (low, high))
+        return cursor.fetchall()
+
+    def advance(self, conn, chunk_rows=CHUNK_ROWS):
+        """Observe every row added since the watermarks; returns rows folded (reads only)"""
+        cursor = conn.cursor()
+        reads = {'item_snapshots': self._listings, 'deleted_items': self._sales}
+        ends = {}
+        for table, key in SOURCES:
+            cursor.execute(f'SELECT COALESCE(MAX({key}), 0) FROM {table}')
+            ends[table] = cursor.fetchone()[0]
+        folded = 0
+        # One chunk of every source per round, observed in time order, so the
+        # EWMA sees listings and sales interleaved as they happened
+        while any(self.watermarks[table] < end for table, end in ends.items()):
+            observed = []
+            for table, end in ends.items():
+                low = self.watermarks[table]
+                high = min(low + chunk_rows, end)
+                if high > low:
+                    observed += reads[table](cursor, low, high)
+                    folded += high - low
+                    self.watermarks[table] = high
+            observed.sort(key=lambda row: row[3] or 0)
+            for market_name, wear_name, cents, ts_ms in observed:
+                self.observe(market_name, wear_name, cents, ts_ms)
+        self.rows += folded
+        return folded
+
+    def checkpoint(self, conn):
+        """Save changed entries and the watermarks; False if a newer checkpoint is already stored"""
+        cursor = conn.cursor()
+        # Holds the write lock: another process cannot checkpoint in between
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if get_watermark(cursor, ROWS_WATERMARK) > self.rows:
+                conn.rollback()
+                return False
+            rows = []
+            for market_name, wear_name in self.dirty:
+                stats = self.entries[market_name][wear_name]
+                rows.append((market_name, wear_name, stats.sketch.total, stats.ewma, stats.last_ms,
+                             stats.sketch.to_json()))
+            cursor.executemany('''
+                INSERT INTO price_index (market_name, wear_name, observations, ewma, last_ms, sketch)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(market_name, wear_name) DO UPDATE SET
+                    observations = excluded.observations,
+                    ewma = excluded.ewma,
+                    last_ms = excluded.last_ms,
+                    sketch = excluded.sketch
+            ''', rows)
+            for table, _ in SOURCES:
+                set_watermark(cursor, f'price_index:{table}', self.watermarks[table])
+            set_watermark(cursor, ROWS_WATERMARK, self.rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.dirty.clear()
+        return True
+
+
+def refresh(conn):
+    """Load the checkpoint, advance it and save it again; returns (index, rows folded)"""
+    index = PriceIndex.load(conn)
+    folded = index.advance(conn)
+    index.checkpoint(conn)
+    return index, folded
+
+
+def format_cents(cents):
+    return '-' if cents is None else f"${cents / 100:,.2f}"
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    args = sys.argv[1:]
+    name = None
+    if '--name' in args:
+        index = args.index('--name')
+        name = args[index + 1] if index + 1 < len(args) else None
+        del args[index:index + 2]
+        if not name:
+            print("ERROR - --name needs a market name")
+            sys.exit(1)
+    db_file = args[0] if args else DB_FILE
+
+    if not os.path.exists(db_file):
+        print(f"ERROR - Database not found: {db_file}")
+        sys.exit(1)
+
+    try:
+        conn = sqlite3.connect(db_file, timeout=30)
+        create_schema(conn.cursor())
+        started = time.time()
+        prices, folded = refresh(conn)
+        conn.close()
+        print(f"✓ {folded:,} row(s) folded in {time.time() - started:.1f}s ({len(prices):,} prices)")
+
+        if name:
+            wears = sorted(prices.entries.get(name, {}))
+            rows = [(name, wear, prices.quote(name, wear)) for wear in wears]
+            if len(wears) > 1:
+                rows.append((name, 'all wears', prices.quote(name)))
+        else:
+            rows = prices.most_observed()
+        if not rows:
+            print(f"No prices for {name}")
+            sys.exit(0)
+
+        started = time.perf_counter()
+        for market_name, wear, _ in rows:
+            prices.quote(market_name, None if wear == 'all wears' else wear)
+        elapsed_us = (time.perf_counter() - started) * 1e6 / len(rows)
+
+        print(f"\n{'':<60}{'seen':>7}{'fair':>12}{'p25':>12}{'p75':>12}{'ewma':>12}")
+        for market_name, wear, quote in rows:
+            label = f"{market_name} [{wear}]" if wear else market_name
+            print(f"{label[:59]:<60}{quote.observations:>7,}{format_cents(quote.median):>12}"
+                  f"{format_cents(quote.low):>12}{format_cents(quote.high):>12}{format_cents(quote.ewma):>12}")
+        print(f"({elapsed_us:.1f} µs per quote)")
+    except Exception as e:
+        print(f"✗ Price index failed: {e}")
+        sys.exit(1)
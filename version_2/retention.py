@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Retention Job
+Summarizes finished auctions, prunes old raw bid rows and frame keys, downsamples old snapshots
+
+Every pass works in small batches with a commit and a short pause between
+them, so the GUI writer only ever waits for one batch.
+"""
+
+import sqlite3
+import sys
+import os
+import time
+
+from schema import DB_FILE, create_schema, get_watermark, set_watermark
+from timestamps import now_ms
+from dedup import prune_frame_keys
+import lifecycle
+import price_index
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Raw auction_updates older than this are deleted (after summarizing)
+RAW_BID_MAX_AGE_MS = 30 * DAY_MS
+
+# item_snapshots older than this keep only first, last and changed rows
+SNAPSHOT_MAX_AGE_MS = 7 * DAY_MS
+
+# An auction counts as finished this long after its deleted_item event
+FINISHED_GRACE_MS = 60 * 60 * 1000
+
+BATCH_SIZE = 500
+BATCH_PAUSE = 0.05
+
+# Seconds between passes with --loop
+RUN_INTERVAL = 15 * 60
+
+# Snapshot columns compared when downsampling - a row equal to the previous
+# snapshot of the same item on all of them carries no new information
+SNAPSHOT_STATE_COLUMNS = [
+    'market_name_id', 'market_value', 'suggested_price', 'purchase_price',
+    'above_recommended_price', 'type_id', 'category_id', 'sub_type_id', 'rarity_id',
+    'wear', 'wear_name_id', 'auction_ends_at', 'auction_highest_bid',
+    'auction_highest_bidder', 'auction_number_of_bids',
+    'seller_online_status', 'seller_delivery_rate_recent', 'seller_delivery_rate_long',
+    'seller_delivery_time_recent', 'seller_delivery_time_long',
+    'seller_steam_level_min', 'seller_steam_level_max',
+    'published_at', 'is_commodity', 'price_is_unreliable',
+]
+
+SUMMARIZE_SQL = '''
+    INSERT OR IGNORE INTO auction_summaries (
+        auction_id, item_id, market_name_id,
+        open_bid, max_bid, final_bid, final_bidder,
+        bid_count, update_count, bidder_count,
+        started_at_ms, ended_at_ms, duration_ms, outcome, summarized_at_ms
+    )
+    WITH ranked AS (
+        SELECT a.*,
+            ROW_NUMBER() OVER (PARTITION BY auction_id ORDER BY update_time_ms, id) AS first_rank,
+            ROW_NUMBER() OVER (PARTITION BY auction_id ORDER BY update_time_ms DESC, id DESC) AS last_rank
+        FROM auction_updates a
+        WHERE auction_id IN ({ids})
+    ),
+    grouped AS (
+        SELECT
+            auction_id,
+            MAX(item_id) AS item_id,
+            MAX(market_name_id) AS market_name_id,
+            MAX(CASE WHEN first_rank = 1 THEN highest_bid END) AS open_bid,
+            MAX(highest_bid) AS max_bid,
+            MAX(CASE WHEN last_rank = 1 THEN highest_bid END) AS final_bid,
+            MAX(CASE WHEN last_rank = 1 THEN highest_bidder END) AS final_bidder,
+            MAX(number_of_bids) AS bid_count,
+            COUNT(*) AS update_count,
+            COUNT(DISTINCT highest_bidder) AS bidder_count,
+            MIN(update_time_ms) AS first_update_ms,
+            MAX(update_time_ms) AS last_update_ms,
+            MAX(ends_at) AS ends_at
+        FROM ranked
+        GROUP BY auction_id
+    ),
+    timed AS (
+        SELECT g.*,
+            COALESCE(
+                (SELECT MIN(published_at_ms) FROM item_snapshots s WHERE s.item_id = g.item_id),
+                g.first_update_ms
+            ) AS started_at_ms,
+            COALESCE(
+                (SELECT MAX(deleted_at_ms) FROM deleted_items d WHERE d.item_id = g.auction_id),
+                g.ends_at * 1000,
+                g.last_update_ms
+            ) AS ended_at_ms,
+            COALESCE(
+                (SELECT sale_type FROM deleted_items d WHERE d.item_id = g.auction_id
+                 ORDER BY deleted_at_ms DESC LIMIT 1),
+                'ended'
+            ) AS outcome
+        FROM grouped g
+    )
+    SELECT
+        auction_id, item_id, market_name_id,
+        open_bid, max_bid, final_bid, final_bidder,
+        bid_count, update_count, bidder_count,
+        started_at_ms, ended_at_ms, ended_at_ms - started_at_ms, outcome, ?
+    FROM timed
+'''
+
+
+def summarize_auctions(cursor, auction_ids):
+    """Write one auction_summaries row per auction from its raw updates (existing rows kept)"""
+    if not auction_ids:
+        return 0
+    placeholders = ', '.join('?' for _ in auction_ids)
+    cursor.execute(SUMMARIZE_SQL.format(ids=placeholders), (*auction_ids, now_ms()))
+    return max(cursor.rowcount, 0)
+
+
+def split_batch(rows, batch_size, cutoff):
+    """Keys to process from a (key, ms) batch and the next watermark
+
+    A full batch stops before its last millisecond (picked up again next
+    batch) unless the whole batch shares one millisecond.
+    """
+    if len(rows) < batch_size:
+        return list({key for key, _ in rows}), cutoff
+    last_ms = rows[-1][1]
+    if rows[0][1] == last_ms:
+        return list({key for key, _ in rows}), last_ms + 1
+    return list({key for key, ms in rows if ms < last_ms}), last_ms
+
+
+def summarize_finished(conn, now=None, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    """Summarize auctions whose deleted_item event is older than the grace period"""
+    cutoff = (now if now is not None else now_ms()) - FINISHED_GRACE_MS
+    cursor = conn.cursor()
+    watermark = get_watermark(cursor, 'auctions_summarized_ms')
+    total = 0
+    while watermark < cutoff:
+        cursor.execute('''
+            SELECT item_id, deleted_at_ms FROM deleted_items
+            WHERE had_bids = 1 AND deleted_at_ms >= ? AND deleted_at_ms < ?
+            ORDER BY deleted_at_ms
+            LIMIT ?
+        ''', (watermark, cutoff, batch_size))
+        auction_ids, watermark = split_batch(cursor.fetchall(), batch_size, cutoff)
+        total += summarize_auctions(cursor, auction_ids)
+        set_watermark(cursor, 'auctions_summarized_ms', watermark)
+        conn.commit()
+        time.sleep(pause)
+    return total
+
+
+def prune_auction_updates(conn, max_age_ms=RAW_BID_MAX_AGE_MS, now=None,
+                          batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    """Delete raw bid rows older than max_age_ms, summarizing their auctions first"""
+    cutoff = (now if now is not None else now_ms()) - max_age_ms
+    cursor = conn.cursor()
+    deleted = 0
+    while True:
+        cursor.execute('''
+            SELECT id, auction_id FROM auction_updates
+            WHERE update_time_ms < ?
+            ORDER BY update_time_ms
+            LIMIT ?
+        ''', (cutoff, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        # Summaries are built from the complete history, before any row goes
+        auction_ids = list({auction_id for _, auction_id in rows})
+        placeholders = ', '.join('?' for _ in auction_ids)
+        cursor.execute(
+            f"SELECT auction_id FROM auction_summaries WHERE auction_id IN ({placeholders})",
+            auction_ids
+        )
+        summarized = {row[0] for row in cursor.fetchall()}
+        summarize_auctions(cursor, [a for a in auction_ids if a not in summarized])
+
+        cursor.executemany('DELETE FROM auction_updates WHERE id = ?', [(row_id,) for row_id, _ in rows])
+        conn.commit()
+        deleted += len(rows)
+        time.sleep(pause)
+    return deleted
+
+
+def downsample_snapshots(conn, max_age_ms=SNAPSHOT_MAX_AGE_MS, now=None,
+                         batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    """Keep only the first, last and changed snapshots of items seen before the cutoff
+
+    Resumes from the retention_state watermark, so each snapshot window is
+    scanned once; items that get newer snapshots are revisited with them.
+    """
+    cutoff = (now if now is not None else now_ms()) - max_age_ms
+    cursor = conn.cursor()
+    watermark = get_watermark(cursor, 'snapshots_downsampled_ms')
+
+    unchanged = ' AND '.join(f"{c} IS LAG({c}) OVER w" for c in SNAPSHOT_STATE_COLUMNS)
+    deleted = 0
+    while watermark < cutoff:
+        cursor.execute('''
+            SELECT item_id, snapshot_time_ms FROM item_snapshots
+            WHERE snapshot_time_ms >= ? AND snapshot_time_ms < ?
+            ORDER BY snapshot_time_ms
+            LIMIT ?
+        ''', (watermark, cutoff, batch_size))
+        item_ids, watermark = split_batch(cursor.fetchall(), batch_size, cutoff)
+        if item_ids:
+            placeholders = ', '.join('?' for _ in item_ids)
+            cursor.execute(f'''
+                DELETE FROM item_snapshots WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, snapshot_time_ms,
+                            ROW_NUMBER() OVER w AS rank,
+                            COUNT(*) OVER (PARTITION BY item_id) AS total,
+                            {unchanged} AS unchanged
+                        FROM item_snapshots
+                        WHERE item_id IN ({placeholders})
+                        WINDOW w AS (PARTITION BY item_id ORDER BY snapshot_time_ms, id)
+                    )
+                    WHERE rank > 1 AND rank < total AND unchanged AND snapshot_time_ms < ?
+                )
+            ''', (*item_ids, cutoff))
+            deleted += max(cursor.rowcount, 0)
+        set_watermark(cursor, 'snapshots_downsampled_ms', watermark)
+        conn.commit()
+        time.sleep(pause)
+    return deleted
+
+
+def run(conn, now=None, bid_max_age_ms=RAW_BID_MAX_AGE_MS, snapshot_max_age_ms=SNAPSHOT_MAX_AGE_MS):
+    """One full retention pass; returns {step: rows}"""
+    create_schema(conn.cursor())
+    return {
+        # Before any raw row is pruned
+        'lifecycle_rows': lifecycle.advance(conn),
+        'price_rows': price_index.refresh(conn)[1],
+        'auctions_summarized': summarize_finished(conn, now),
+        'bid_rows_pruned': prune_auction_updates(conn, bid_max_age_ms, now=now),
+        'snapshots_downsampled': downsample_snapshots(conn, snapshot_max_age_ms, now=now),
+        'frame_keys_pruned': prune_frame_keys(conn, now=now),
+    }
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    args = sys.argv[1:]
+    options = {'--bid-max-age-days': RAW_BID_MAX_AGE_MS / DAY_MS,
+               '--snapshot-max-age-days': SNAPSHOT_MAX_AGE_MS / DAY_MS}
+    for option in options:
+        if option in args:
+            index = args.index(option)
+            try:
+                options[option] = float(args[index + 1])
+            except (IndexError, ValueError):
+                print(f"ERROR - {option} needs a number of days")
+                sys.exit(1)
+            del args[index:index + 2]
+    loop = '--loop' in args
+    args = [arg for arg in args if not arg.startswith('--')]
+    db_file = args[0] if args else DB_FILE
+    max_ages = {'bid_max_age_ms': int(options['--bid-max-age-days'] * DAY_MS),
+                'snapshot_max_age_ms': int(options['--snapshot-max-age-days'] * DAY_MS)}
+
+    if not os.path.exists(db_file):
+        print(f"ERROR - Database not found: {db_file}")
+        sys.exit(1)
+
+    try:
+        while True:
+            conn = sqlite3.connect(db_file, timeout=30)
+            results = run(conn, **max_ages)
+            conn.close()
+
+            print(f"[{time.strftime('%H:%M:%S')}] ✓ Retention pass complete")
+            for step, rows in results.items():
+                print(f"  {step}: {rows:,}")
+
+            if not loop:
+                break
+            time.sleep(RUN_INTERVAL)
+
+    except KeyboardInterrupt:
+        print("\nStopped")
+    except Exception as e:
+        print(f"✗ Retention failed: {e}")
+        sys.exit(1)
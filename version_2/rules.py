@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Deal Rules
+User-defined alert rules evaluated against every decoded new_item / auction_update record
+
+A rules file is a JSON list; every condition of a rule must hold:
+
+    [{"name": "Cheap, reliable, online seller",
+      "event": "new_item",                       # or "auction_update"
+      "category": null,                          # a category, a list of them, or null for any
+      "when": [["above_recommended_price", "<", -10],
+               ["auction_number_of_bids", "==", 0],
+               ["seller_delivery_rate_long", "==", 1],
+               ["seller_online_status", "==", 1]],
+      "once": true}]                             # one alert per item (default)
+
+Fields are the record's (frames.py); auction updates also get the market_name
+and category of their item (remembered from its new_item), and both events
+get seconds_left until the auction ends. Operators: < <= > >= == != in
+(a list) and contains (case-insensitive substring, text fields only). Values
+must suit the field - a number for numeric fields, a string for text ones - or
+the rule is rejected when loaded. A missing value never matches.
+
+Rules are compiled once into closures and indexed by (event, category), so
+a record only runs the rules that can match it - a few microseconds from
+the frame to the alert. Alerts are JSON objects sent to sinks:
+file:alerts.jsonl (one line each), unix:/path.sock (one datagram each) or
+http://host:port/path (POSTed from a background thread). --listen prints
+what a unix: or http: sink sends, as a stand-in receiver.
+
+    python rules.py rules.json SOURCE [SOURCE ...] [--sink file:alerts.jsonl]   # ingest.py sources, cdp:9222 is live
+    python rules.py --example > sniper_rules.json
+    python rules.py --listen unix:/tmp/sniper.sock | http:8765
+"""
+
+import json
+import operator
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from frames import NEW_ITEM_FIELDS, decode_frame
+
+# Fields a condition can test, per event, with their kind: str or NUMBER
+NUMBER = (int, float)
+FIELDS = {
+    'new_item': {
+        **{column: str if convert is str else NUMBER for column, _, convert in NEW_ITEM_FIELDS},
+        **dict.fromkeys(('item_id', 'is_commodity', 'price_is_unreliable', 'published_at_ms', 'seconds_left'),
+                        NUMBER),
+    },
+    'auction_update': {
+        **dict.fromkeys(('auction_id', 'highest_bid', 'highest_bidder', 'number_of_bids',
+                         'above_recommended_price', 'ends_at', 'seconds_left'), NUMBER),
+        'market_name': str,
+        'category': str,
+    },
+}
+
+# Auction end (epoch seconds) of each event, for seconds_left
+ENDS_AT = {'new_item': 'auction_ends_at', 'auction_update': 'ends_at'}
+
+COMPARISONS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+OPERATORS = (*COMPARISONS, 'in', 'contains')
+
+# Items remembered for their auction updates (name, category), and (rule, item) pairs already alerted
+ITEM_MEMORY = 100000
+
+# The sniping criteria of DATA_STRUCTURE_ANALYSIS.md, plus a knife/glove auction about to end uncontested
+EXAMPLE_RULES = [
+    {
+        'name': 'Below market, no bids, reliable online seller',
+        'event': 'new_item',
+        'category': None,
+        'when': [
+            ['above_recommended_price', '<', -10],
+            ['auction_number_of_bids', '==', 0],
+            ['seller_delivery_rate_long', '==', 1],
+            ['seller_online_status', '==', 1],
+        ],
+    },
+    {
+        'name': '★ auction ending with at most one bid',
+        'event': 'auction_update',
+        'category': 'Weapon',
+        'when': [
+            ['market_name', 'contains', '★'],
+            ['number_of_bids', '<=', 1],
+            ['seconds_left', '<', 30],
+        ],
+    },
+]
+
+Rule = namedtuple('Rule', 'name event categories test once')
+
+
+def compile_condition(field, op, value):
+    """Closure data -> bool for one [field, op, value]"""
+    if op == 'contains':
+        needle = str(value).lower()
+        return lambda data: needle in (data.get(field) or '').lower()
+    if op == 'in':
+        allowed = frozenset(value)
+        return lambda data: data.get(field) in allowed
+    compare = COMPARISONS[op]
+
+    def check(data):
+        current = data.get(field)
+        return current is not None and compare(current, value)
+    return check
+
+
+def compile_rule(spec):
+    """Rule from one rules-file entry; ValueError if it cannot match anything"""
+    name = spec.get('name') or 'unnamed'
+    event = spec.get('event')
+    if event not in FIELDS:
+        raise ValueError(f"Rule '{name}': event must be one of {', '.join(FIELDS)}")
+    conditions = spec.get('when') or []
+    checks = []
+    for condition in conditions:
+        if not isinstance(condition, list) or len(condition) != 3:
+            raise ValueError(f"Rule '{name}': a condition is [field, operator, value], got {condition!r}")
+        field, op, value = condition
+        if field not in FIELDS[event]:
+            raise ValueError(f"Rule '{name}': {event} has no field '{field}'")
+        if op not in OPERATORS:
+            raise ValueError(f"Rule '{name}': unknown operator '{op}' (use {' '.join(OPERATORS)})")
+        if op == 'in' and not isinstance(value, list):
+            raise ValueError(f"Rule '{name}': 'in' needs a list")
+        kind = FIELDS[event][field]
+        if op == 'contains' and kind is not str:
+            raise ValueError(f"Rule '{name}': 'contains' needs a text field, '{field}' is a number")
+        for item in (value if op == 'in' else [value]):
+            if not isinstance(item, kind):
+                expected = 'a string' if kind is str else 'a number'
+                raise ValueError(f"Rule '{name}': '{field}' is compared with {item!r}, expected {expected}")
+        checks.append(compile_condition(field, op, value))
+
+    def test(data):
+        for check in checks:
+            if not check(data):
+                return False
+        return True
+
+    category = spec.get('category')
+    categories = tuple(category) if isinstance(category, list) else (category,)
+    return Rule(name, event, categories, test, spec.get('once', True))
+
+
+def load_rules(path):
+    """Compiled rules of a rules file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        specs = json.load(f)
+    if not isinstance(specs, list):
+        raise ValueError(f"{path}: expected a JSON list of rules")
+    return [compile_rule(spec) for spec in specs]
+
+
+def _remember(memory, key, value):
+    """Bounded insert - the oldest entry goes first"""
+    memory[key] = value
+    if len(memory) > ITEM_MEMORY:
+        del memory[next(iter(memory))]
+
+
+class RuleEngine:
+    """Matches records against compiled rules and sends alerts to the sinks
+
+    Not thread-safe: feed it from one thread (the capture thread).
+    """
+
+    def __init__(self, rules, sinks=(), on_error=None):
+        self.index = {}         # (event, category or None) -> [Rule]
+        for rule in rules:
+            for category in rule.categories:
+                self.index.setdefault((rule.event, category), []).append(rule)
+        self.sinks = list(sinks)
+        self.on_error = on_error
+        self.items = {}         # item_id -> (market_name, category)
+        self.fired = {}         # (rule name, item_id) -> True
+        self.evaluated = 0
+        self.alerted = 0
+        self.seconds = 0.0      # time from receive to alert (or to no match)
+
+    def evaluate(self, record, received=None):
+        """Alerts (dicts) raised by one record; received: time.perf_counter() when its frame arrived"""
+        started = time.perf_counter() if received is None else received
+        kind, data = record.kind, record.data
+        if kind == 'new_item':
+            item_id, category = data['item_id'], data['category']
+            _remember(self.items, item_id, (data['market_name'], category))
+        elif kind == 'auction_update':
+            item_id = data['auction_id']
+            market_name, category = self.items.get(item_id, (None, None))
+            if data.get('market_name') is None:
+                data['market_name'] = market_name
+            data['category'] = category
+        else:
+            return []
+        ends_at = data.get(ENDS_AT[kind])
+        data['seconds_left'] = ends_at - record.ts_ms / 1000 if ends_at else None
+
+        matched = []
+        for key in ((kind, category), (kind, None)):
+            for rule in self.index.get(key, ()):
+                if rule.test(data):
+                    if rule.once:
+                        if (rule.name, item_id) in self.fired:
+                            continue
+                        _remember(self.fired, (rule.name, item_id), True)
+                    matched.append(rule)
+        self.evaluated += 1
+        elapsed = time.perf_counter() - started
+        self.seconds += elapsed
+        if not matched:
+            return []
+
+        alerts = [{
+            'rule': rule.name,
+            'event': kind,
+            'item_id': item_id,
+            'market_name': data.get('market_name'),
+            'received_ms': record.ts_ms,
+            'latency_us': round(elapsed * 1e6, 1),
+            'data': data,
+        } for rule in matched]
+        self.alerted += len(alerts)
+        for alert in alerts:
+            for sink in self.sinks:
+                try:
+                    sink.send(alert)
+                except Exception as e:
+                    if self.on_error:
+                        self.on_error(sink, e)
+        return alerts
+
+    def evaluate_frame(self, frame, received=None):
+        """Decode a frame and evaluate its records; returns the alerts"""
+        received = time.perf_counter() if received is None else received
+        alerts = []
+        for record in decode_frame(frame):
+            alerts += self.evaluate(record, received)
+        return alerts
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def _encode(alert):
+    return json.dumps(alert, ensure_ascii=False, default=str)
+
+
+class FileSink:
+    """Appends one JSON line per alert"""
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def send(self, alert):
+        self.file.write(_encode(alert) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class UnixSocketSink:
+    """One datagram per alert to a listening Unix socket (nothing listening: an error per alert)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def send(self, alert):
+        self.socket.sendto(_encode(alert).encode('utf-8'), self.path)
+
+    def close(self):
+        self.socket.close()
+
+
+class WebhookSink:
+    """POSTs each alert as JSON from a background thread - a slow endpoint never delays matching"""
+
+    def __init__(self, url, timeout=5, on_error=None):
+        self.url = url
+        self.timeout = timeout
+        self.on_error = on_error
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._post_loop, daemon=True)
+        self.thread.start()
+
+    def send(self, alert):
+        self.queue.put(_encode(alert).encode('utf-8'))
+
+    def _post_loop(self):
+        while True:
+            body = self.queue.get()
+            if body is None:
+                return
+            try:
+                request = urllib.request.Request(self.url, body, {'Content-Type': 'application/json'})
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(self, e)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=self.timeout)
+
+
+class CallbackSink:
+    """Hands each alert to a function (e.g. the GUI log)"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def send(self, alert):
+        self.callback(alert)
+
+    def close(self):
+        pass
+
+
+def open_alert_sink(spec, on_error=None):
+    """file:PATH, unix:PATH or an http(s):// URL"""
+    if spec.startswith('file:'):
+        return FileSink(spec[5:])
+    if spec.startswith('unix:'):
+        return UnixSocketSink(spec[5:])
+    if spec.startswith(('http://', 'https://')):
+        return WebhookSink(spec, on_error=on_error)
+    raise ValueError(f"Unknown alert sink: {spec} (use file:PATH, unix:PATH or http://...)")
+
+
+def format_alert(alert):
+    name = alert['market_name'] or f"Item #{alert['item_id']}"
+    return f"🎯 {alert['rule']}: {name} [ID: {alert['item_id']}] ({alert['latency_us']:.0f} µs)"
+
+
+def replay_frames(sources):
+    """Frames of ingest.py sources (files, spools, logs, exports, cdp:PORT), in order"""
+    # Imported here - only the command line replays sources
+    from ingest import DEFAULT_CDP_PORT, SOURCES, IngestStats, detect_source
+
+    stats = IngestStats()
+    for source in sources:
+        kind = detect_source(source)
+        if kind == 'cdp':
+            frames = SOURCES[kind](int(source.split(':', 1)[1]) if ':' in source else DEFAULT_CDP_PORT, stats)
+        else:
+            frames = SOURCES[kind](source, stats)
+        for frame, _ in frames:
+            yield frame
+
+
+def listen(spec):
+    """Print alerts sent to a unix:PATH or http:PORT sink until Ctrl+C"""
+    if spec.startswith('unix:'):
+        path = spec[5:]
+        if os.path.exists(path):
+            os.remove(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        server.bind(path)
+        print(f"✓ Listening on {path} - Ctrl+C to stop")
+        try:
+            while True:
+                print(format_alert(json.loads(server.recv(1 << 20))))
+        finally:
+            server.close()
+            os.remove(path)
+    elif spec.startswith('http:'):
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                print(format_alert(json.loads(body)))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', int(spec[5:])), Handler)
+        print(f"✓ Listening on http://127.0.0.1:{server.server_port}/ - Ctrl+C to stop")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+    else:
+        raise ValueError(f"Cannot listen on {spec} (use unix:PATH or http:PORT)")
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    args = sys.argv[1:]
+    if args[:1] == ['--example']:
+        print(json.dumps(EXAMPLE_RULES, indent=2))
+        sys.exit(0)
+    if args[:1] == ['--listen']:
+        if len(args) < 2:
+            print("ERROR - --listen needs unix:PATH or http:PORT")
+            sys.exit(1)
+        try:
+            listen(args[1])
+        except KeyboardInterrupt:
+            print("\nStopped")
+        except Exception as e:
+            print(f"ERROR - {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    sink_specs = []
+    while '--sink' in args:
+        index = args.index('--sink')
+        if index + 1 >= len(args):
+            print("ERROR - --sink needs a value")
+            sys.exit(1)
+        sink_specs.append(args[index + 1])
+        del args[index:index + 2]
+    if len(args) < 2:
+        print("Usage: python rules.py rules.json SOURCE [SOURCE ...] [--sink file:PATH|unix:PATH|http://...]\n"
+              "       python rules.py --example | --listen unix:PATH|http:PORT")
+        sys.exit(1)
+
+    try:
+        report_error = lambda sink, e: print(f"✗ {type(sink).__name__} error: {e}")
+        sinks = [CallbackSink(lambda alert: print(format_alert(alert)))]
+        sinks += [open_alert_sink(spec, report_error) for spec in sink_specs]
+        engine = RuleEngine(load_rules(args[0]), sinks, on_error=report_error)
+        started = time.time()
+        try:
+            for frame in replay_frames(args[1:]):
+                engine.evaluate_frame(frame)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            engine.close()
+        per_record = engine.seconds / engine.evaluated * 1e6 if engine.evaluated else 0
+        print(f"✓ {engine.evaluated:,} record(s) matched against the rules in {time.time() - started:.1f}s: "
+              f"{engine.alerted:,} alert(s), {per_record:.1f} µs per record (decode included)")
+    except Exception as e:
+        print(f"✗ Rules failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Database Schema
+Shared table, index and view definitions for csgoempire_monitor.db
+"""
+
+from dimensions import DIMENSIONS, create_dimension_tables
+
+DB_FILE = 'csgoempire_monitor.db'
+
+# Items master table - one row per unique item ID
+ITEMS_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    item_id INTEGER PRIMARY KEY,
+    market_name TEXT,
+    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total_snapshots INTEGER DEFAULT 0,
+    deleted_at TIMESTAMP DEFAULT NULL,
+    first_seen_ms INTEGER,
+    last_seen_ms INTEGER,
+    deleted_at_ms INTEGER
+)
+'''
+
+# Item snapshots - every state change
+# Repeated text columns are stored as surrogate keys into the dim_* tables
+ITEM_SNAPSHOTS_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL,
+    snapshot_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    -- Item details
+    market_name_id INTEGER REFERENCES dim_market_names(id),
+    market_value INTEGER,
+    suggested_price INTEGER,
+    purchase_price INTEGER,
+    above_recommended_price REAL,
+
+    -- Item classification
+    type_id INTEGER REFERENCES dim_types(id),
+    category_id INTEGER REFERENCES dim_categories(id),
+    sub_type_id INTEGER REFERENCES dim_sub_types(id),
+    rarity_id INTEGER REFERENCES dim_rarities(id),
+
+    -- Wear info
+    wear REAL,
+    wear_name_id INTEGER REFERENCES dim_wear_names(id),
+
+    -- Auction state
+    auction_ends_at INTEGER,
+    auction_highest_bid INTEGER,
+    auction_highest_bidder INTEGER,
+    auction_number_of_bids INTEGER,
+
+    -- Seller info
+    seller_online_status INTEGER,
+    seller_delivery_rate_recent REAL,
+    seller_delivery_rate_long REAL,
+    seller_delivery_time_recent INTEGER,
+    seller_delivery_time_long INTEGER,
+    seller_steam_level_min INTEGER,
+    seller_steam_level_max INTEGER,
+
+    -- Other
+    published_at TEXT,
+    is_commodity INTEGER,
+    price_is_unreliable INTEGER,
+
+    -- Epoch milliseconds (UTC)
+    snapshot_time_ms INTEGER,
+    published_at_ms INTEGER,
+
+    FOREIGN KEY (item_id) REFERENCES items(item_id)
+)
+'''
+
+# Auction updates - real-time bidding activity
+AUCTION_UPDATES_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    auction_id INTEGER NOT NULL,
+    item_id INTEGER,
+    market_name_id INTEGER REFERENCES dim_market_names(id),
+    update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    highest_bid INTEGER,
+    highest_bidder INTEGER,
+    number_of_bids INTEGER,
+    above_recommended_price REAL,
+    ends_at INTEGER,
+
+    -- Epoch milliseconds (UTC)
+    update_time_ms INTEGER,
+
+    FOREIGN KEY (item_id) REFERENCES items(item_id)
+)
+'''
+
+# Bidders - track bidder activity
+BIDDERS_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    bidder_id INTEGER PRIMARY KEY,
+    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total_bids INTEGER DEFAULT 0,
+    highest_bid INTEGER DEFAULT 0,
+    total_spent INTEGER DEFAULT 0,
+    auctions_won INTEGER DEFAULT 0,
+    times_outbid INTEGER DEFAULT 0,
+    first_seen_ms INTEGER,
+    last_seen_ms INTEGER
+)
+'''
+
+# Deleted items - track when items are removed with sale type classification
+DELETED_ITEMS_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    -- AUTOINCREMENT: ids never restart after a rollover empties the table,
+    -- so the incremental readers' watermarks stay valid
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    -- Sale classification
+    sale_type TEXT,
+    had_bids INTEGER DEFAULT 0,
+    final_bid_count INTEGER DEFAULT 0,
+    final_bid_amount INTEGER DEFAULT NULL,
+    final_bidder INTEGER DEFAULT NULL,
+
+    -- Original listing info
+    was_auction INTEGER DEFAULT 0,
+    original_price INTEGER,
+
+    -- Epoch milliseconds (UTC)
+    deleted_at_ms INTEGER,
+
+    FOREIGN KEY (item_id) REFERENCES items(item_id)
+)
+'''
+
+# Auction summaries - one row per finished auction (see retention.py)
+# Raw auction_updates rows may be pruned once their auction is summarized
+AUCTION_SUMMARIES_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    auction_id INTEGER PRIMARY KEY,
+    item_id INTEGER,
+    market_name_id INTEGER REFERENCES dim_market_names(id),
+
+    open_bid INTEGER,
+    max_bid INTEGER,
+    final_bid INTEGER,
+    final_bidder INTEGER,
+    bid_count INTEGER,
+    update_count INTEGER,
+    bidder_count INTEGER,
+
+    -- Epoch milliseconds (UTC)
+    started_at_ms INTEGER,
+    ended_at_ms INTEGER,
+    duration_ms INTEGER,
+
+    -- auction_sold / auction_expired / ended (no deleted_item seen)
+    outcome TEXT,
+    summarized_at_ms INTEGER
+)
+'''
+
+# Item lifecycle - one row per item, advanced incrementally by lifecycle.py
+ITEM_LIFECYCLE_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    item_id INTEGER PRIMARY KEY,
+
+    -- From the first snapshot
+    market_name_id INTEGER REFERENCES dim_market_names(id),
+    category_id INTEGER REFERENCES dim_categories(id),
+    wear_name_id INTEGER REFERENCES dim_wear_names(id),
+    list_price INTEGER,
+
+    -- Epoch milliseconds (UTC)
+    listed_ms INTEGER,
+    first_bid_ms INTEGER,
+    last_bid_ms INTEGER,
+    removed_ms INTEGER,
+
+    bid_count INTEGER,
+    sale_type TEXT,
+    final_price INTEGER,
+    time_to_sale_ms INTEGER
+)
+'''
+
+# Time-to-sale sketches - log-bucketed duration histograms per dimension value,
+# sale type and hour of removal (lifecycle.py); counts only ever grow
+TIME_TO_SALE_SKETCH_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    sale_type TEXT NOT NULL,
+    -- removed_ms // 3600000 (0: folded before sketches were hourly)
+    hour INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, value, sale_type, hour, bucket)
+) WITHOUT ROWID
+'''
+
+# Price index checkpoint - one row per (market_name, wear_name) of price_index.py:
+# observation count, EWMA and the log-bucketed price sketch as JSON [[bucket, count], ...]
+PRICE_INDEX_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    market_name TEXT NOT NULL,
+    wear_name TEXT NOT NULL,
+    observations INTEGER NOT NULL,
+    ewma REAL,
+    last_ms INTEGER,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (market_name, wear_name)
+) WITHOUT ROWID
+'''
+
+# Retention state - watermarks of the incremental passes (get_watermark / set_watermark)
+RETENTION_STATE_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    name TEXT PRIMARY KEY,
+    value INTEGER
+)
+'''
+
+# Keys of stored WebSocket frames (dedup.py) - confirms Bloom filter hits
+FRAME_KEYS_DDL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    frame_key INTEGER PRIMARY KEY,
+    seen_ms INTEGER NOT NULL
+)
+'''
+
+TABLES = [
+    ('items', ITEMS_DDL),
+    ('item_snapshots', ITEM_SNAPSHOTS_DDL),
+    ('auction_updates', AUCTION_UPDATES_DDL),
+    ('bidders', BIDDERS_DDL),
+    ('deleted_items', DELETED_ITEMS_DDL),
+    ('auction_summaries', AUCTION_SUMMARIES_DDL),
+    ('retention_state', RETENTION_STATE_DDL),
+    ('frame_keys', FRAME_KEYS_DDL),
+    ('item_lifecycle', ITEM_LIFECYCLE_DDL),
+    ('time_to_sale_sketch', TIME_TO_SALE_SKETCH_DDL),
+    ('price_index', PRICE_INDEX_DDL),
+]
+
+# Time-window indexes use the epoch-ms columns (see timestamps.EPOCH_MS_INDEXES)
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_snapshots_item_time ON item_snapshots(item_id, snapshot_time_ms)',
+    'CREATE INDEX IF NOT EXISTS idx_snapshots_time_ms ON item_snapshots(snapshot_time_ms)',
+    'CREATE INDEX IF NOT EXISTS idx_snapshots_market_name ON item_snapshots(market_name_id)',
+    'CREATE INDEX IF NOT EXISTS idx_auction_updates_item_id ON auction_updates(item_id)',
+    'CREATE INDEX IF NOT EXISTS idx_auction_updates_auction_time ON auction_updates(auction_id, update_time_ms)',
+    'CREATE INDEX IF NOT EXISTS idx_auction_updates_time_ms ON auction_updates(update_time_ms, auction_id)',
+    'CREATE INDEX IF NOT EXISTS idx_deleted_items_time_ms ON deleted_items(deleted_at_ms)',
+    'CREATE INDEX IF NOT EXISTS idx_deleted_items_item_id ON deleted_items(item_id)',
+    'CREATE INDEX IF NOT EXISTS idx_items_market_name ON items(market_name)',
+    'CREATE INDEX IF NOT EXISTS idx_frame_keys_seen_ms ON frame_keys(seen_ms)',
+]
+
+
+def compat_view_sql(view, table, columns):
+    """Build a view exposing dimension keys under their original text column names"""
+    select = ['t.*']
+    joins = []
+    for i, column in enumerate(columns):
+        alias = f"d{i}"
+        select.append(f"{alias}.value AS {column}")
+        joins.append(f"LEFT JOIN {DIMENSIONS[column]} {alias} ON {alias}.id = t.{column}_id")
+    return (
+        f"CREATE VIEW IF NOT EXISTS {view} AS\n"
+        f"SELECT {', '.join(select)}\n"
+        f"FROM {table} t\n" + "\n".join(joins)
+    )
+
+
+# Compatibility views - same rows as the base tables plus the old TEXT columns
+VIEWS = [
+    compat_view_sql('item_snapshots_named', 'item_snapshots', list(DIMENSIONS)),
+    compat_view_sql('auction_updates_named', 'auction_updates', ['market_name']),
+]
+
+
+def table_columns(cursor, table):
+    """Return the column names of a table (empty if it does not exist)"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [col[1] for col in cursor.fetchall()]
+
+
+def get_watermark(cursor, name):
+    """Progress of an incremental pass in retention_state (0 if never run)"""
+    cursor.execute("SELECT value FROM retention_state WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def set_watermark(cursor, name, value):
+    """Record the progress of an incremental pass"""
+    cursor.execute('''
+        INSERT INTO retention_state (name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value
+    ''', (name, value))
+
+
+def create_schema(cursor):
+    """Create every table, index and compatibility view (idempotent)"""
+    create_dimension_tables(cursor)
+    for name, ddl in TABLES:
+        cursor.execute(ddl.format(name=name))
+    for sql in INDEXES:
+        cursor.execute(sql)
+    for sql in VIEWS:
+        cursor.execute(sql)
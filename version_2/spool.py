@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Frame Spool
+Append-only file of received WebSocket frames, consumed into the database asynchronously
+
+The capture thread only appends (sequence number, receive time, payload) to
+spool/segment-<first seq>.spool - it never waits on SQLite. A SpoolConsumer
+thread reads frames after its checkpoint in batches of BATCH_FRAMES and
+writes each batch through the storage backend; the checkpoint
+(retention_state 'spool_seq') is stored in the same transaction as the rows,
+so a crash never loses or repeats a frame. While the database is locked the
+consumer retries and the spool grows; afterwards it catches up batch by batch.
+
+Segments start with SEGMENT_MAGIC; records carry the frame's dedup key
+(dedup.frame_key, 0 = none), which the consumer checks before decoding:
+<seq u64><ts_ms i64><length u32><crc32 u32><frame key i64><payload utf-8>
+Segments written before keys existed (no magic) have no key field and are
+still read.
+"""
+
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from schema import DB_FILE, get_watermark
+from frames import Frame, decode_frame
+from timestamps import now_ms
+from dedup import FrameDedup
+
+SPOOL_DIR = 'spool'
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.spool'
+
+# Start a new segment file after this many bytes
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+# fsync the active segment at most this often (every append is flushed to the OS)
+SYNC_SECONDS = 1.0
+
+# Frames written per database transaction
+BATCH_FRAMES = 500
+
+# Consumer sleep when the spool is drained / after a failed batch
+POLL_SECONDS = 0.2
+RETRY_SECONDS = 1.0
+
+CHECKPOINT = 'spool_seq'
+
+SEGMENT_MAGIC = b'SPOOL\x02\r\n'
+HEADER = struct.Struct('<QqIIq')
+LEGACY_HEADER = struct.Struct('<QqII')
+
+
+def segment_path(directory, first_seq):
+    return os.path.join(directory, f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}")
+
+
+def list_segments(directory):
+    """[(first seq, path)] oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    segments = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            segments.append((int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def segment_header(f):
+    """Record header of an open segment, positioned at its first record"""
+    if f.read(len(SEGMENT_MAGIC)) == SEGMENT_MAGIC:
+        return HEADER
+    f.seek(0)
+    return LEGACY_HEADER
+
+
+def read_records(f, header=HEADER):
+    """Yield (offset after record, seq, ts_ms, frame key, payload) until EOF or an incomplete/corrupt record"""
+    while True:
+        raw = f.read(header.size)
+        if len(raw) < header.size:
+            return
+        seq, ts_ms, length, crc, *key = header.unpack(raw)
+        data = f.read(length)
+        if len(data) < length or zlib.crc32(data) != crc:
+            return
+        yield f.tell(), seq, ts_ms, (key[0] if key else 0) or None, data.decode('utf-8')
+
+
+def purge_segments(directory, upto_seq):
+    """Delete segments whose frames are all <= upto_seq (never the newest one)"""
+    removed = 0
+    segments = list_segments(directory)
+    for (_, path), (next_first, _) in zip(segments, segments[1:]):
+        if next_first - 1 <= upto_seq:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+class Spool:
+    """Writer side - thread-safe append of frames to the active segment"""
+
+    def __init__(self, directory=SPOOL_DIR, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.lock = threading.Lock()
+        self.file = None
+        self.last_sync = 0
+        os.makedirs(directory, exist_ok=True)
+        self.next_seq = self._recover()
+
+    def _recover(self):
+        """Cut a torn last record (crash mid-append); returns the next sequence number"""
+        segments = list_segments(self.directory)
+        if not segments:
+            return 1
+        first_seq, path = segments[-1]
+        next_seq = first_seq
+        with open(path, 'rb') as f:
+            header = segment_header(f)
+            end = f.tell()
+            for end, seq, _, _, _ in read_records(f, header):
+                next_seq = seq + 1
+        if end < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+        # Keep appending to a keyed segment; an old one is left for a new segment
+        if header is HEADER:
+            self.file = open(path, 'ab')
+        return next_seq
+
+    def append(self, payload, ts_ms=None, key=None):
+        """Spool one frame (key: dedup.frame_key or None); returns its sequence number"""
+        data = payload.encode('utf-8')
+        with self.lock:
+            seq = self.next_seq
+            if self.file is None or self.file.tell() + HEADER.size + len(data) > self.segment_bytes:
+                self._rotate(seq)
+            record = HEADER.pack(seq, ts_ms if ts_ms is not None else now_ms(), len(data),
+                                 zlib.crc32(data), key or 0)
+            self.file.write(record + data)
+            self.file.flush()
+            if time.time() - self.last_sync >= SYNC_SECONDS:
+                os.fsync(self.file.fileno())
+                self.last_sync = time.time()
+            self.next_seq = seq + 1
+        return seq
+
+    def _rotate(self, first_seq):
+        if self.file is not None:
+            if self.file.tell() <= len(SEGMENT_MAGIC):
+                return
+            os.fsync(self.file.fileno())
+            self.file.close()
+        self.file = open(segment_path(self.directory, first_seq), 'ab')
+        if self.file.tell() == 0:
+            self.file.write(SEGMENT_MAGIC)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+
+class SpoolReader:
+    """Reader side - frames after a sequence number, remembering where it stopped"""
+
+    def __init__(self, directory=SPOOL_DIR):
+        self.directory = directory
+        self.position = None   # (last seq returned, segment path, offset after it)
+
+    def read(self, after_seq, limit=BATCH_FRAMES):
+        """[(seq, Frame, frame key)] - at most limit frames with seq > after_seq"""
+        frames = []
+        segments = list_segments(self.directory)
+        if self.position and self.position[0] == after_seq:
+            start = [(s, p) for s, p in segments if p >= self.position[1]]
+            offset = self.position[2]
+        else:
+            # From the segment holding after_seq + 1, scanned from its start
+            first = 0
+            for i, (first_seq, _) in enumerate(segments):
+                if first_seq <= after_seq + 1:
+                    first = i
+            start = segments[first:]
+            offset = 0
+
+        for first_seq, path in start:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                header = segment_header(f)
+                f.seek(max(offset, f.tell()))
+                for end, seq, ts_ms, key, payload in read_records(f, header):
+                    if seq <= after_seq:
+                        continue
+                    frames.append((seq, Frame(ts_ms, payload), key))
+                    self.position = (seq, path, end)
+                    if len(frames) >= limit:
+                        return frames
+            offset = 0
+        return frames
+
+
+class SpoolConsumer:
+    """Background thread: spool -> dedup -> decode_frame -> storage, checkpointed per batch
+
+    before_write() runs before every batch (e.g. the GUI's partition rollover);
+    on_records(records) gets every stored batch; on_error(exception) every
+    failed attempt (the batch is retried, nothing is skipped). on_idle() runs
+    when the spool is drained and returns True if it did work. Frames whose
+    key is already in frame_keys are dropped before decoding (dedup.skipped).
+    """
+
+    def __init__(self, spool_dir, storage, on_records=None, on_error=None, before_write=None,
+                 on_idle=None, batch_frames=BATCH_FRAMES, dedup=None):
+        self.reader = SpoolReader(spool_dir)
+        self.storage = storage
+        self.dedup = dedup if dedup is not None else FrameDedup()
+        self.on_records = on_records
+        self.on_error = on_error
+        self.before_write = before_write
+        self.on_idle = on_idle
+        self.batch_frames = batch_frames
+        self.seq = None
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def checkpoint(self):
+        """Last sequence number stored in the database"""
+        if self.seq is None:
+            cursor = self.storage.connection().cursor()
+            self.seq = get_watermark(cursor, CHECKPOINT)
+            self.dedup.warm(cursor)
+        return self.seq
+
+    def process_batch(self):
+        """Store the next batch; returns frames consumed (0 when drained)"""
+        frames = self.reader.read(self.checkpoint(), self.batch_frames)
+        if not frames:
+            purge_segments(self.reader.directory, self.seq)
+            return 0
+        if self.before_write:
+            self.before_write()
+        cursor = self.storage.connection().cursor()
+        records = [
+            record for _, frame, key in frames
+            if not self.dedup.is_duplicate(key, cursor, frame.ts_ms)
+            for record in decode_frame(frame)
+        ]
+        last_seq = frames[-1][0]
+        try:
+            records = self.storage.write(records, {CHECKPOINT: last_seq}, self.dedup.take_batch())
+        except Exception:
+            self.dedup.rollback()
+            raise
+        self.seq = last_seq
+        if self.on_records:
+            self.on_records(records)
+        return len(frames)
+
+    def catch_up(self):
+        """Consume everything spooled so far; returns frames consumed"""
+        consumed = 0
+        while True:
+            count = self.process_batch()
+            if not count:
+                return consumed
+            consumed += count
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                if not self.process_batch() and not (self.on_idle and self.on_idle()):
+                    self.stopping.wait(POLL_SECONDS)
+            except Exception as e:
+                # Locked/busy database or a bad batch - keep the frames, retry later
+                if self.on_error:
+                    self.on_error(e)
+                self.stopping.wait(RETRY_SECONDS)
+
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+
+def status(spool_dir, conn):
+    """(next seq, checkpoint, segments) for the CLI"""
+    segments = list_segments(spool_dir)
+    next_seq = 1
+    if segments:
+        with open(segments[-1][1], 'rb') as f:
+            next_seq = segments[-1][0]
+            for _, seq, _, _, _ in read_records(f, segment_header(f)):
+                next_seq = seq + 1
+    return next_seq, get_watermark(conn.cursor(), CHECKPOINT), segments
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    from storage import open_backend
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    spool_dir = sys.argv[2] if len(sys.argv) > 2 else SPOOL_DIR
+    db_file = sys.argv[3] if len(sys.argv) > 3 else DB_FILE
+
+    # replay: catch up without the GUI (do not run while the GUI is tracking)
+    if command not in ('status', 'replay'):
+        print("Usage: python spool.py [status|replay] [spool dir] [db]")
+        sys.exit(1)
+
+    if not os.path.exists(db_file):
+        print(f"ERROR - Database not found: {db_file}")
+        sys.exit(1)
+
+    try:
+        if command == 'status':
+            conn = sqlite3.connect(db_file)
+            next_seq, checkpoint, segments = status(spool_dir, conn)
+            conn.close()
+            print(f"Spool: {os.path.abspath(spool_dir)} ({len(segments)} segment(s))")
+            print(f"  Last spooled: {next_seq - 1:,}")
+            print(f"  Checkpoint:   {checkpoint:,}")
+            print(f"  Backlog:      {max(next_seq - 1 - checkpoint, 0):,} frame(s)")
+        else:
+            storage = open_backend(db_file)
+            started = time.time()
+            consumer = SpoolConsumer(spool_dir, storage)
+            consumed = consumer.catch_up()
+            storage.close()
+            elapsed = time.time() - started
+            print("✓ Replay complete!")
+            print(f"  {consumed:,} frame(s) in {elapsed:.1f}s - checkpoint {consumer.seq:,}")
+            print(f"  {consumer.dedup.skipped:,} duplicate frame(s) skipped")
+
+    except Exception as e:
+        print(f"✗ Spool {command} failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Storage Backends
+One write interface for decoded records: the SQLite (OLTP) database plus optional
+columnar analytics sinks (DuckDB or Parquet via pyarrow) fed the same batches
+
+    storage = open_backend(DB_FILE, analytics='duckdb')
+    storage.write(decode_frame(Frame(now_ms(), payload)))
+"""
+
+import os
+import sqlite3
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+
+from schema import DB_FILE, set_watermark
+from dimensions import DimensionCache
+from bidder_tracker import BidderTracker
+from dedup import FrameDedup, save_keys
+from frames import RECORD_KINDS, decode_frame
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+ANALYTICS_DIR = 'analytics'
+
+# Frames per transaction for bulk sources (log replay, extension exports)
+BULK_BATCH_FRAMES = 5000
+DUCKDB_FILE = 'csgoempire_analytics.duckdb'
+
+# Columnar layout of each record kind: (column, type) with type one of
+# 'int64', 'float64', 'string' - shared by the DuckDB and Parquet sinks
+ANALYTICS_COLUMNS = {
+    'new_item': [
+        ('ts_ms', 'int64'), ('item_id', 'int64'), ('market_name', 'string'),
+        ('market_value', 'int64'), ('suggested_price', 'int64'), ('purchase_price', 'int64'),
+        ('above_recommended_price', 'float64'), ('type', 'string'), ('category', 'string'),
+        ('sub_type', 'string'), ('rarity', 'string'), ('wear', 'float64'), ('wear_name', 'string'),
+        ('auction_ends_at', 'int64'), ('auction_highest_bid', 'int64'),
+        ('auction_highest_bidder', 'int64'), ('auction_number_of_bids', 'int64'),
+        ('seller_online_status', 'int64'), ('seller_delivery_rate_recent', 'float64'),
+        ('seller_delivery_rate_long', 'float64'), ('seller_delivery_time_recent', 'int64'),
+        ('seller_delivery_time_long', 'int64'), ('seller_steam_level_min', 'int64'),
+        ('seller_steam_level_max', 'int64'), ('published_at_ms', 'int64'),
+        ('is_commodity', 'int64'), ('price_is_unreliable', 'int64'),
+    ],
+    'auction_update': [
+        ('ts_ms', 'int64'), ('auction_id', 'int64'), ('market_name', 'string'),
+        ('highest_bid', 'int64'), ('highest_bidder', 'int64'), ('number_of_bids', 'int64'),
+        ('above_recommended_price', 'float64'), ('ends_at', 'int64'),
+    ],
+    'deleted_item': [
+        ('ts_ms', 'int64'), ('item_id', 'int64'), ('market_name', 'string'),
+        ('sale_type', 'string'), ('final_bid_count', 'int64'), ('final_bid_amount', 'int64'),
+        ('final_bidder', 'int64'), ('was_auction', 'int64'), ('original_price', 'int64'),
+    ],
+}
+
+DUCKDB_TYPES = {'int64': 'BIGINT', 'float64': 'DOUBLE', 'string': 'VARCHAR'}
+
+# Month-scale aggregations that the row store answers slowly
+ANALYTICS_QUERIES = {
+    'price_by_category': '''
+        SELECT category, COUNT(*) AS listings, AVG(market_value) / 100.0 AS avg_usd,
+               MEDIAN(market_value) / 100.0 AS median_usd
+        FROM new_item
+        WHERE category IS NOT NULL
+        GROUP BY category
+        ORDER BY listings DESC
+    ''',
+    'bidder_ranking': '''
+        SELECT highest_bidder AS bidder_id, COUNT(DISTINCT auction_id) AS auctions,
+               COUNT(*) AS updates, MAX(highest_bid) / 100.0 AS max_bid_usd
+        FROM auction_update
+        GROUP BY highest_bidder
+        ORDER BY auctions DESC
+        LIMIT 50
+    ''',
+    'time_to_sale': '''
+        SELECT n.category, d.sale_type, COUNT(*) AS items,
+               MEDIAN(d.ts_ms - n.first_seen_ms) / 60000.0 AS median_minutes
+        FROM deleted_item d
+        JOIN (SELECT item_id, ANY_VALUE(category) AS category, MIN(ts_ms) AS first_seen_ms
+              FROM new_item GROUP BY item_id) n ON n.item_id = d.item_id
+        GROUP BY n.category, d.sale_type
+        ORDER BY items DESC
+    ''',
+}
+
+
+class StorageBackend:
+    """Receives batches of frames.Record in arrival order"""
+
+    def write(self, records, watermarks=None, frame_keys=None):
+        """Store a batch; returns the records (possibly annotated)
+
+        watermarks: {name: value} progress markers (e.g. the spool checkpoint)
+        and frame_keys: [(frame key, seen_ms)] of the frames the batch came
+        from (dedup.py) - saved atomically with the batch by backends that can.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """Persist anything buffered"""
+
+    def close(self):
+        """Flush and release resources"""
+        self.flush()
+
+
+class SQLiteBackend(StorageBackend):
+    """The csgoempire_monitor.db writer - one transaction per batch
+
+    Annotates records with what it learned while writing (market_name of a
+    bid, sale classification of a deletion) so callers and sinks can use it.
+    The connection is opened on first use and shared across threads: the
+    spool consumer thread writes every batch, and at shutdown the GUI thread
+    advances and checkpoints the price index on it once the consumer has
+    stopped. Callers keep those uses apart - the backend does no locking.
+    Bidder stats are derived from bid transitions and flushed in batches
+    (bidder_tracker.py).
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.conn = None
+        self.dims = None
+        self.bidders = BidderTracker()
+
+    def connection(self):
+        """The writer connection (opened on first use)"""
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.dims = DimensionCache(self.conn.cursor())
+        return self.conn
+
+    def write(self, records, watermarks=None, frame_keys=None):
+        conn = self.connection()
+        cursor = conn.cursor()
+        self.bidders.begin()
+        try:
+            for record in records:
+                if record.kind == 'new_item':
+                    self._write_new_item(cursor, record)
+                elif record.kind == 'auction_update':
+                    self._write_auction_update(cursor, record)
+                elif record.kind == 'deleted_item':
+                    self._write_deleted_item(cursor, record)
+            for name, value in (watermarks or {}).items():
+                set_watermark(cursor, name, value)
+            if frame_keys:
+                save_keys(cursor, frame_keys)
+            conn.commit()
+            self.dims.commit()
+            self.bidders.commit()
+        except Exception:
+            conn.rollback()
+            self.dims.rollback()
+            self.bidders.rollback()
+            raise
+        if records and self.bidders.due(records[-1].ts_ms):
+            self.bidders.flush(conn, records[-1].ts_ms)
+        return records
+
+    def _write_new_item(self, cursor, record):
+        data = record.data
+        cursor.execute('''
+            INSERT INTO items (item_id, market_name, total_snapshots, first_seen_ms, last_seen_ms)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT(item_id) DO UPDATE SET
+                market_name = COALESCE(excluded.market_name, market_name),
+                last_seen = CURRENT_TIMESTAMP,
+                last_seen_ms = excluded.last_seen_ms,
+                total_snapshots = total_snapshots + 1
+        ''', (data['item_id'], data['market_name'], record.ts_ms, record.ts_ms))
+
+        dim = self.dims.resolve
+        cursor.execute('''
+            INSERT INTO item_snapshots (
+                item_id, market_name_id, market_value, suggested_price, purchase_price,
+                above_recommended_price, type_id, category_id, sub_type_id, rarity_id,
+                wear, wear_name_id, auction_ends_at, auction_highest_bid,
+                auction_highest_bidder, auction_number_of_bids,
+                seller_online_status, seller_delivery_rate_recent, seller_delivery_rate_long,
+                seller_delivery_time_recent, seller_delivery_time_long,
+                seller_steam_level_min, seller_steam_level_max,
+                published_at, is_commodity, price_is_unreliable,
+                snapshot_time_ms, published_at_ms
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            data['item_id'],
+            dim(cursor, 'market_name', data['market_name']),
+            data['market_value'],
+            data['suggested_price'],
+            data['purchase_price'],
+            data['above_recommended_price'],
+            dim(cursor, 'type', data['type']),
+            dim(cursor, 'category', data['category']),
+            dim(cursor, 'sub_type', data['sub_type']),
+            dim(cursor, 'rarity', data['rarity']),
+            data['wear'],
+            dim(cursor, 'wear_name', data['wear_name']),
+            data['auction_ends_at'],
+            data['auction_highest_bid'],
+            data['auction_highest_bidder'],
+            data['auction_number_of_bids'],
+            data['seller_online_status'],
+            data['seller_delivery_rate_recent'],
+            data['seller_delivery_rate_long'],
+            data['seller_delivery_time_recent'],
+            data['seller_delivery_time_long'],
+            data['seller_steam_level_min'],
+            data['seller_steam_level_max'],
+            data['published_at'],
+            data['is_commodity'],
+            data['price_is_unreliable'],
+            record.ts_ms,
+            data['published_at_ms'],
+        ))
+
+    def _write_auction_update(self, cursor, record):
+        data = record.data
+
+        # Bid transition against the auction's previous state (before this row is stored)
+        data['transition'] = self.bidders.observe(
+            cursor, data['auction_id'], data['highest_bidder'], data['highest_bid'],
+            data['number_of_bids'], data['ends_at'], record.ts_ms
+        )
+
+        # Name from the item registry (auction ID = item ID)
+        cursor.execute('SELECT market_name FROM items WHERE item_id = ?', (data['auction_id'],))
+        result = cursor.fetchone()
+        data['market_name'] = result[0] if result and result[0] else None
+
+        cursor.execute('''
+            INSERT INTO auction_updates
+            (auction_id, item_id, market_name_id, highest_bid, highest_bidder, number_of_bids,
+             above_recommended_price, ends_at, update_time_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            data['auction_id'],
+            data['auction_id'],
+            self.dims.resolve(cursor, 'market_name', data['market_name']),
+            data['highest_bid'],
+            data['highest_bidder'],
+            data['number_of_bids'],
+            data['above_recommended_price'],
+            data['ends_at'],
+            record.ts_ms,
+        ))
+
+    def _write_deleted_item(self, cursor, record):
+        data = record.data
+        item_id = data['item_id']
+
+        # Check if item had auction updates (bids)
+        cursor.execute('SELECT COUNT(*) FROM auction_updates WHERE auction_id = ?', (item_id,))
+        bid_count = cursor.fetchone()[0]
+
+        # Get original listing info
+        cursor.execute('''
+            SELECT auction_ends_at, purchase_price
+            FROM item_snapshots
+            WHERE item_id = ?
+            ORDER BY snapshot_time_ms ASC
+            LIMIT 1
+        ''', (item_id,))
+        listing_data = cursor.fetchone()
+        original_price = listing_data[1] if listing_data else None
+
+        # Determine if it was an auction:
+        # 1. If we have snapshot data, check auction_ends_at
+        # 2. If no snapshot but has auction_updates, it's an auction
+        if listing_data and listing_data[0] is not None:
+            was_auction = 1  # Has auction_ends_at in snapshot
+        elif bid_count > 0:
+            was_auction = 1  # Has bids = must be auction
+        else:
+            was_auction = 0  # No snapshot, no bids = assume fixed price
+
+        if was_auction:
+            sale_type = 'auction_sold' if bid_count > 0 else 'auction_expired'
+        else:
+            # Fixed price item deleted - seller delisted it
+            sale_type = 'delisted'
+
+        # Final state = the latest bid (not MAX(highest_bidder)); credits the winner if sold
+        final_bidder, final_bid = self.bidders.close(cursor, item_id, sale_type == 'auction_sold')
+
+        cursor.execute('''
+            INSERT INTO deleted_items (
+                item_id, sale_type, had_bids, final_bid_count,
+                final_bid_amount, final_bidder, was_auction, original_price,
+                deleted_at_ms
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            item_id,
+            sale_type,
+            1 if bid_count > 0 else 0,
+            bid_count,
+            final_bid,
+            final_bidder,
+            was_auction,
+            original_price,
+            record.ts_ms,
+        ))
+
+        cursor.execute('''
+            UPDATE items
+            SET deleted_at = CURRENT_TIMESTAMP, deleted_at_ms = ?
+            WHERE item_id = ?
+        ''', (record.ts_ms, item_id))
+
+        cursor.execute('SELECT market_name FROM items WHERE item_id = ?', (item_id,))
+        result = cursor.fetchone()
+
+        data.update({
+            'market_name': result[0] if result and result[0] else None,
+            'sale_type': sale_type,
+            'final_bid_count': bid_count,
+            'final_bid_amount': final_bid,
+            'final_bidder': final_bidder,
+            'was_auction': was_auction,
+            'original_price': original_price,
+        })
+
+    def flush(self):
+        if self.conn is not None:
+            self.bidders.flush(self.conn)
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+
+def _columnar_rows(records):
+    """{kind: {column: [values]}} for a batch, in ANALYTICS_COLUMNS order"""
+    batches = {}
+    for record in records:
+        columns = ANALYTICS_COLUMNS.get(record.kind)
+        if columns is None:
+            continue
+        batch = batches.setdefault(record.kind, {name: [] for name, _ in columns})
+        for name, _ in columns:
+            batch[name].append(record.ts_ms if name == 'ts_ms' else record.data.get(name))
+    return batches
+
+
+class DuckDBSink(StorageBackend):
+    """Appends every record batch to columnar DuckDB tables (one per record kind)"""
+
+    def __init__(self, path=DUCKDB_FILE):
+        if duckdb is None:
+            raise ImportError("DuckDB sink needs the duckdb package (pip install duckdb)")
+        self.path = path
+        self.conn = None
+
+    def connection(self):
+        if self.conn is None:
+            self.conn = duckdb.connect(self.path)
+            for kind, columns in ANALYTICS_COLUMNS.items():
+                ddl = ', '.join(f"{name} {DUCKDB_TYPES[t]}" for name, t in columns)
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {kind} ({ddl})")
+        return self.conn
+
+    def write(self, records, watermarks=None, frame_keys=None):
+        conn = self.connection()
+        for kind, batch in _columnar_rows(records).items():
+            names = ', '.join(batch)
+            if pa is not None:
+                # One vectorized INSERT ... SELECT per kind; executemany binds row by row
+                conn.register('arrow_batch', pa.Table.from_pydict(batch, schema=arrow_schema(kind)))
+                try:
+                    conn.execute(f"INSERT INTO {kind} ({names}) SELECT {names} FROM arrow_batch")
+                finally:
+                    conn.unregister('arrow_batch')
+            else:
+                conn.executemany(
+                    f"INSERT INTO {kind} ({names}) VALUES ({', '.join('?' for _ in batch)})",
+                    list(zip(*batch.values()))
+                )
+        return records
+
+    def query(self, name):
+        """Run one of ANALYTICS_QUERIES; returns (columns, rows)"""
+        result = self.connection().execute(ANALYTICS_QUERIES[name])
+        return [d[0] for d in result.description], result.fetchall()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class ParquetSink(StorageBackend):
+    """Buffers record batches and writes Parquet files partitioned by event type and day
+
+    Layout: <directory>/event_type=<kind>/day=<YYYY-MM-DD>/part-<first ts_ms>-<uuid>.parquet
+    (two flushes can start at the same ts_ms - a frame's records share it)
+    """
+
+    # Rows buffered per kind before a file is written
+    FLUSH_ROWS = 10000
+
+    def __init__(self, directory=ANALYTICS_DIR, flush_rows=FLUSH_ROWS):
+        if pa is None:
+            raise ImportError("Parquet sink needs the pyarrow package (pip install pyarrow)")
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.buffers = {kind: [] for kind in RECORD_KINDS}
+
+    def write(self, records, watermarks=None, frame_keys=None):
+        for record in records:
+            if record.kind in self.buffers:
+                self.buffers[record.kind].append(record)
+        for kind, buffered in self.buffers.items():
+            if len(buffered) >= self.flush_rows:
+                self._write_kind(kind)
+        return records
+
+    def _write_kind(self, kind):
+        records, self.buffers[kind] = self.buffers[kind], []
+        by_day = {}
+        for record in records:
+            day = datetime.fromtimestamp(record.ts_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+            by_day.setdefault(day, []).append(record)
+        schema = arrow_schema(kind)
+        for day, day_records in by_day.items():
+            batch = _columnar_rows(day_records)[kind]
+            table = pa.Table.from_pydict(batch, schema=schema)
+            directory = os.path.join(self.directory, f"event_type={kind}", f"day={day}")
+            os.makedirs(directory, exist_ok=True)
+            name = f"part-{day_records[0].ts_ms}-{uuid.uuid4().hex}.parquet"
+            pq.write_table(table, os.path.join(directory, name))
+
+    def flush(self):
+        for kind, buffered in self.buffers.items():
+            if buffered:
+                self._write_kind(kind)
+
+
+def arrow_schema(kind):
+    """pyarrow schema for one record kind"""
+    types = {'int64': pa.int64(), 'float64': pa.float64(), 'string': pa.string()}
+    return pa.schema([(name, types[t]) for name, t in ANALYTICS_COLUMNS[kind]])
+
+
+class FanoutBackend(StorageBackend):
+    """Writes to the primary backend, then hands the annotated batch to every sink
+
+    Sink failures never lose the primary write or stop it from flushing and
+    closing; they are reported via on_error.
+    """
+
+    def __init__(self, primary, sinks=(), on_error=None):
+        self.primary = primary
+        self.sinks = list(sinks)
+        self.on_error = on_error
+
+    def connection(self):
+        return self.primary.connection()
+
+    def write(self, records, watermarks=None, frame_keys=None):
+        records = self.primary.write(records, watermarks, frame_keys)
+        self._each_sink(lambda sink: sink.write(records))
+        return records
+
+    def flush(self):
+        self.primary.flush()
+        self._each_sink(lambda sink: sink.flush())
+
+    def close(self):
+        self.primary.close()
+        self._each_sink(lambda sink: sink.close())
+
+    def _each_sink(self, call):
+        for sink in self.sinks:
+            try:
+                call(sink)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(sink, e)
+
+
+def store_frames(storage, frames, batch_frames=BULK_BATCH_FRAMES, dedup=None, on_batch=None,
+                 decode=decode_frame):
+    """Bulk path for stored frames: (Frame, key) -> dedup -> decode -> write, per batch
+
+    Each batch's keys are looked up in frame_keys first, so importing the same
+    source twice stores it once. on_batch(frames, records) reports progress.
+    Returns (frames, records, duplicates skipped).
+    """
+    dedup = dedup if dedup is not None else FrameDedup()
+    cursor = storage.connection().cursor()
+    frames = iter(frames)
+    stored = 0
+    records_stored = 0
+    while True:
+        batch = list(islice(frames, batch_frames))
+        if not batch:
+            break
+        dedup.load_stored(cursor, [key for _, key in batch])
+        records = [
+            record for frame, key in batch
+            if not dedup.is_duplicate(key, cursor)
+            for record in decode(frame)
+        ]
+        try:
+            storage.write(records, None, dedup.take_batch())
+        except Exception:
+            dedup.rollback()
+            raise
+        stored += len(batch)
+        records_stored += len(records)
+        if on_batch:
+            on_batch(stored, records_stored)
+    storage.flush()
+    return stored, records_stored, dedup.skipped
+
+
+def open_backend(db_file=DB_FILE, analytics=None, on_error=None):
+    """SQLite backend, fanned out to a 'duckdb' or 'parquet' sink when requested"""
+    primary = SQLiteBackend(db_file)
+    if analytics is None:
+        return primary
+    if analytics == 'duckdb':
+        sink = DuckDBSink()
+    elif analytics == 'parquet':
+        sink = ParquetSink()
+    else:
+        raise ValueError(f"Unknown analytics sink: {analytics}")
+    return FanoutBackend(primary, [sink], on_error)
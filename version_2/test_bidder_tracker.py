@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+test_bidder_tracker.py
+Bidder stats count every bid and win exactly once, even when a batch is retried
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from frames import Record
+from migrations import upgrade
+from storage import SQLiteBackend
+
+AUCTION_ID = 9000001
+
+
+def bid(bidder, amount, count, ts_ms):
+    return Record('auction_update', ts_ms, {
+        'auction_id': AUCTION_ID,
+        'highest_bid': amount,
+        'highest_bidder': bidder,
+        'number_of_bids': count,
+        'above_recommended_price': None,
+        'ends_at': None,
+    })
+
+
+BATCH = [
+    bid(1, 100, 1, 1000),
+    bid(2, 120, 2, 2000),
+    Record('deleted_item', 3000, {'item_id': AUCTION_ID}),
+]
+
+
+def bidder_rows(db_file):
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute('''
+        SELECT bidder_id, total_bids, total_spent, auctions_won, times_outbid
+        FROM bidders ORDER BY bidder_id
+    ''').fetchall()
+    conn.close()
+    return rows
+
+
+def write_with_retry(db_file, batch):
+    """Write a batch that fails once mid-way, then retry it as the monitor does"""
+    conn = sqlite3.connect(db_file)
+    upgrade(conn, log=lambda message: None)
+    conn.close()
+
+    storage = SQLiteBackend(db_file)
+    # The last record is missing a column: the batch fails after every bid was observed
+    broken = bid(3, 150, 3, 2500)
+    del broken.data['above_recommended_price']
+    try:
+        storage.write(batch[:2] + [broken])
+    except KeyError:
+        pass
+    storage.write(batch)
+    storage.close()
+    return bidder_rows(db_file)
+
+
+def test_retried_batch_counts_once():
+    """A rolled-back batch leaves no bids, wins or outbids behind"""
+    with tempfile.TemporaryDirectory() as directory:
+        rows = write_with_retry(os.path.join(directory, 'monitor.db'), BATCH)
+    assert rows == [(1, 1, 0, 0, 1), (2, 1, 120, 1, 0)], rows
+
+
+def test_null_bidder_is_not_a_bid():
+    """An auction_update without a bidder yet creates no bidder row"""
+    with tempfile.TemporaryDirectory() as directory:
+        rows = write_with_retry(os.path.join(directory, 'monitor.db'), [bid(None, 0, 0, 500)] + BATCH)
+    assert rows == [(1, 1, 0, 0, 1), (2, 1, 120, 1, 0)], rows
+
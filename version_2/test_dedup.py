@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+test_dedup.py
+Frame keys identify a frame across capture sessions, and FrameDedup drops only real repeats
+"""
+
+import sqlite3
+
+from dedup import FrameDedup, frame_key, save_keys
+from schema import create_schema
+
+PAYLOAD = '42["auction_update",[{"id":1,"auction_highest_bid":5}]]'
+
+
+def test_frame_key_inputs():
+    """Same requestId + chrome_ts + payload = same key; any of them changed = another frame"""
+    key = frame_key(PAYLOAD, '1234.5', 1735689600.25)
+    assert key == frame_key(PAYLOAD.encode('utf-8'), '1234.5', 1735689600.25)
+    assert key != frame_key(PAYLOAD, '1234.6', 1735689600.25)
+    assert key != frame_key(PAYLOAD, '1234.5', 1735689600.5)
+    assert key != frame_key(PAYLOAD + ' ', '1234.5', 1735689600.25)
+    assert 0 < key < 2 ** 63
+
+
+def test_frame_without_metadata_has_no_key():
+    """Frames without CDP metadata are never deduplicated"""
+    assert frame_key(PAYLOAD) is None
+    dedup = FrameDedup()
+    assert not dedup.is_duplicate(None)
+    assert not dedup.is_duplicate(None)
+
+
+def test_repeats_dropped_and_rollback_forgets():
+    """A repeat is dropped in memory and against frame_keys; a failed batch's keys are forgotten"""
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    create_schema(cursor)
+    first, second = frame_key(PAYLOAD, '1', 1.0), frame_key(PAYLOAD, '1', 2.0)
+
+    dedup = FrameDedup()
+    assert not dedup.is_duplicate(first, cursor, 1000)
+    assert dedup.is_duplicate(first, cursor, 1000)
+    save_keys(cursor, dedup.take_batch())
+    conn.commit()
+
+    # A fresh process knows the stored key only through the table
+    restarted = FrameDedup()
+    assert restarted.load_stored(cursor, [first, second]) == 1
+    assert restarted.is_duplicate(first, cursor)
+
+    assert not restarted.is_duplicate(second, cursor)
+    restarted.rollback()
+    assert not restarted.is_duplicate(second, cursor), "retry of a failed batch is not a replay"
+
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+test_extension_import.py
+Extension exports are parsed one element at a time and overlapping exports store each frame once
+"""
+
+import io
+import json
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+from extension_import import ExportReader, iter_json_array
+from migrations import upgrade
+from storage import SQLiteBackend, store_frames
+
+ARRAY = ('[\n  4.5, -12e-3, 1000000, true, null, "text",\n'
+         '  {"data": "x", "timestamp": 17.25, "url": "wss://example"}, [1, [2]], {}\n]\n')
+
+
+def bid_message(n):
+    payload = (f'42["auction_update",[{{"id":{1000 + n},"auction_highest_bid":{10 + n},'
+               f'"auction_highest_bidder":7,"auction_number_of_bids":1}}]]')
+    return {'data': payload, 'url': 'wss://trade.csgoempire.com/s/?EIO=4', 'timestamp': 1735689600000 + n}
+
+
+def test_elements_survive_any_buffer_split():
+    """Every refill boundary - inside a number, a literal or an object - yields the same elements"""
+    expected = json.loads(ARRAY)
+    for chunk_chars in range(1, len(ARRAY) + 1):
+        assert list(iter_json_array(io.StringIO(ARRAY), chunk_chars)) == expected, chunk_chars
+    assert list(iter_json_array(io.StringIO(' [ ] '))) == []
+
+
+@pytest.mark.parametrize('text', ['{"data": 1}', '[1 2]', '[{"data": "x"', '[1,'])
+def test_broken_exports_raise(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 4))
+
+
+def test_overlapping_exports_store_each_frame_once():
+    """Two exports sharing messages store the shared ones once; binary messages are skipped"""
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, 'monitor.db')
+        conn = sqlite3.connect(db_file)
+        upgrade(conn, log=lambda message: None)
+        conn.close()
+
+        exports = []
+        for name, numbers in (('first.json', range(0, 4)), ('second.json', range(2, 6))):
+            path = os.path.join(directory, name)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump([bid_message(n) for n in numbers] + [{'data': {}, 'timestamp': 1}], f, indent=2)
+            exports.append(path)
+
+        storage = SQLiteBackend(db_file)
+        results = []
+        for path in exports:
+            reader = ExportReader(path)
+            results.append((store_frames(storage, reader, batch_frames=3), reader.messages, reader.skipped))
+        storage.close()
+
+        assert [(frames, skipped, messages, binary) for (frames, _, skipped), messages, binary in results] \
+            == [(4, 0, 5, 1), (4, 2, 5, 1)], results
+        conn = sqlite3.connect(db_file)
+        stored = conn.execute("SELECT COUNT(*), COUNT(DISTINCT auction_id) FROM auction_updates").fetchone()
+        conn.close()
+        assert stored == (6, 6), stored
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+test_item_search.py
+Search box text becomes a literal FTS5 query, and search() finds relisted and new items after a sync
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'version 1'))
+
+from item_search import match_query, search  # noqa: E402
+
+# The columns of the version 1 monitor's items table that the search reads
+V1_SCHEMA = '''
+CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, item_id INTEGER UNIQUE, market_name TEXT,
+                    market_value INTEGER, type TEXT, wear_name TEXT, published_at TEXT, published_at_ms INTEGER);
+'''
+
+
+def test_match_query():
+    """The last bare word is a prefix, phrases stay phrases, FTS5 syntax is taken literally"""
+    assert match_query('bayonet tiger to') == '"bayonet" AND "tiger" AND "to" *'
+    assert match_query('"tiger tooth" ★') == '"tiger tooth" AND "★" *'
+    assert match_query('AK-47 | redline') == '"AK-47" AND "redline" *'
+    assert match_query('knife "factory new"') == '"knife" AND "factory new"'
+    assert match_query('NOT OR ("') == '"NOT" AND "OR" *'
+    assert match_query(' | ™ ') is None
+
+
+def test_search_syncs_and_ranks():
+    """Matches need every word; fewer words rank first, then newer; a relisted item is found once"""
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(V1_SCHEMA)
+    names = {1: '★ Bayonet | Tiger Tooth (Factory New)',
+             2: '★ StatTrak™ Bayonet | Tiger Tooth (Factory New)',
+             3: 'AK-47 | Redline (Field-Tested)',
+             4: '★ Bayonet | Tiger Tooth (Minimal Wear)'}
+    for item_id, name in names.items():
+        conn.execute("INSERT INTO items (item_id, market_name, published_at_ms) VALUES (?, ?, ?)",
+                     (item_id, name, item_id))
+    conn.commit()
+
+    assert [row[0] for row in search(conn, 'bayonet tig', 10)] == [names[4], names[1], names[2]]
+    assert [row[0] for row in search(conn, '"factory new" stattrak', 10)] == [names[2]]
+    assert [row[0] for row in search(conn, 'ak-47')] == [names[3]]
+    assert search(conn, 'm4a4') == []
+
+    # Relisting replaces the items row; the search sees the new row without a rebuild
+    conn.execute("INSERT OR REPLACE INTO items (item_id, market_name, published_at_ms) VALUES (3, ?, 9)",
+                 ('AK-47 | Redline (Minimal Wear)',))
+    conn.commit()
+    assert [row[0] for row in search(conn, 'redline', 10)] == ['AK-47 | Redline (Minimal Wear)']
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+test_lifecycle.py
+Lifecycle passes fold every row once, in any arrival order, and sketches keep the hour of removal
+"""
+
+import sqlite3
+
+import lifecycle
+from log_sketch import SKETCH_ERROR
+from schema import create_schema, get_watermark
+
+HOUR = lifecycle.HOUR_MS
+LISTED = 1000 * HOUR
+
+
+def connect():
+    conn = sqlite3.connect(':memory:')
+    create_schema(conn.cursor())
+    return conn
+
+
+def listing(conn, item_id, listed_ms=LISTED, price=1500):
+    conn.execute("INSERT INTO item_snapshots (item_id, snapshot_time_ms, published_at_ms, market_value) "
+                 "VALUES (?, ?, ?, ?)", (item_id, listed_ms, listed_ms, price))
+    conn.commit()
+
+
+def removal(conn, item_id, removed_ms, sale_type='auction_sold'):
+    conn.execute("INSERT INTO deleted_items (item_id, deleted_at_ms, sale_type, final_bid_amount) "
+                 "VALUES (?, ?, ?, 1600)", (item_id, removed_ms, sale_type))
+    conn.commit()
+
+
+def sales(conn, **window):
+    return lifecycle.percentiles(conn.cursor(), **window)[0]
+
+
+def test_rows_fold_once():
+    """A second pass folds nothing; a repeated removal neither moves removed_ms nor counts again"""
+    conn = connect()
+    listing(conn, 1)
+    removal(conn, 1, LISTED + 600000)
+    assert lifecycle.advance(conn) == 2
+    assert lifecycle.advance(conn) == 0
+
+    removal(conn, 1, LISTED + 900000)
+    assert lifecycle.advance(conn) == 1
+    row = conn.execute("SELECT removed_ms, time_to_sale_ms FROM item_lifecycle WHERE item_id = 1").fetchone()
+    assert row == (LISTED + 600000, 600000), row
+    assert sales(conn) == 1
+
+    cursor = conn.cursor()
+    assert get_watermark(cursor, 'lifecycle:item_snapshots') == 1
+    assert get_watermark(cursor, 'lifecycle:deleted_items') == 2
+
+
+def test_removal_folded_before_listing():
+    """A removal folded in an earlier pass than its listing is counted once the listing arrives"""
+    conn = connect()
+    removal(conn, 7, LISTED + 3600000, 'delisted')
+    lifecycle.advance(conn)
+    assert sales(conn) == 0
+
+    listing(conn, 7)
+    lifecycle.advance(conn)
+    sold, seconds = lifecycle.percentiles(conn.cursor())
+    assert sold == 1
+    assert abs(seconds[0] - 3600) <= 3600 * SKETCH_ERROR, seconds
+
+    # Replaying the listing does not count the sale again
+    listing(conn, 7)
+    lifecycle.advance(conn)
+    assert sales(conn) == 1
+
+
+def test_sketches_per_dimension_and_hour():
+    """Every sale lands in each dimension; a time window reads only the hours it overlaps"""
+    conn = connect()
+    for item_id, hours in ((1, 1), (2, 5), (3, 30)):
+        listing(conn, item_id, price=1500 if item_id < 3 else 60000)
+        removal(conn, item_id, LISTED + hours * HOUR)
+    lifecycle.advance(conn)
+
+    cursor = conn.cursor()
+    assert lifecycle.percentiles(cursor, 'price', '$5-20')[0] == 2
+    assert lifecycle.percentiles(cursor, 'price', '$500+')[0] == 1
+    assert [row[:2] for row in lifecycle.breakdown(cursor, 'price')] == [('$5-20', 2), ('$500+', 1)]
+    assert sales(conn, since_ms=LISTED + 2 * HOUR) == 2
+    assert sales(conn, since_ms=LISTED, until_ms=LISTED + 6 * HOUR) == 2
+    assert sales(conn, sale_types=('delisted',)) == 0
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+test_live_dashboard.py
+The version 1 live dashboard reads only new rows and keeps its sliding windows in memory
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'version 1'))
+
+from live_dashboard import HOUR_MS, LiveDashboard  # noqa: E402
+
+MINUTE = 60 * 1000
+
+# The columns of the version 1 monitor's tables that the dashboard reads
+V1_SCHEMA = '''
+CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, item_id INTEGER UNIQUE, market_name TEXT,
+                    market_value INTEGER, type TEXT, wear_name TEXT, published_at TEXT, published_at_ms INTEGER);
+CREATE TABLE auction_updates (id INTEGER PRIMARY KEY AUTOINCREMENT, auction_id INTEGER, highest_bid INTEGER,
+                              number_of_bids INTEGER, timestamp_ms INTEGER);
+CREATE TABLE bidders (bidder_id INTEGER PRIMARY KEY, total_bids INTEGER DEFAULT 0, total_spent INTEGER DEFAULT 0);
+'''
+
+
+def listing(conn, item_id, ts_ms):
+    conn.execute("INSERT OR REPLACE INTO items (item_id, market_name, market_value, published_at_ms) "
+                 "VALUES (?, ?, 100, ?)", (item_id, f"Item {item_id}", ts_ms))
+    conn.commit()
+
+
+def update(conn, auction_id, bid, bids, ts_ms):
+    conn.execute("INSERT INTO auction_updates (auction_id, highest_bid, number_of_bids, timestamp_ms) "
+                 "VALUES (?, ?, ?, ?)", (auction_id, bid, bids, ts_ms))
+    conn.commit()
+
+
+def test_startup_reads_the_last_hour_only():
+    """Rows older than an hour at startup are never read"""
+    now = int(time.time() * 1000)
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, 'monitor.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript(V1_SCHEMA)
+        listing(conn, 1, now - 2 * HOUR_MS)
+        update(conn, 1, 50, 1, now - 2 * HOUR_MS)
+        listing(conn, 2, now - 5 * MINUTE)
+        update(conn, 2, 60, 1, now - 5 * MINUTE)
+
+        dashboard = LiveDashboard(db_file)
+        assert dashboard.poll(now) == 2
+        assert [entry[1][1] for entry in dashboard.recent] == [2]
+        assert list(dashboard.auctions) == [2]
+        assert dashboard.poll(now) == 0
+        dashboard.close()
+        conn.close()
+
+
+def test_windows_slide_and_expire():
+    """Updates leave the active window, then the hour window with their auction; bids never go down"""
+    now = int(time.time() * 1000)
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, 'monitor.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript(V1_SCHEMA)
+        dashboard = LiveDashboard(db_file, active_minutes=10)
+
+        listing(conn, 1, now)
+        update(conn, 1, 100, 1, now)
+        update(conn, 1, 90, 2, now + MINUTE)
+        update(conn, 2, 10, 1, now + MINUTE)
+        assert dashboard.poll(now + MINUTE) == 4
+        assert dashboard.auctions[1][:2] == [100, 2]
+        assert dashboard.active_counts == {1: 2, 2: 1}
+        assert dashboard.names == {1: 'Item 1', 2: None}
+        assert any('Item 1 (Auction 1)' in line for line in dashboard.lines())
+
+        dashboard.poll(now + 12 * MINUTE)
+        assert not dashboard.active_counts and dashboard.hour_counts == {1: 2, 2: 1}
+        assert len(dashboard.listed_hour) == 1
+
+        dashboard.poll(now + HOUR_MS + 2 * MINUTE)
+        assert not dashboard.hour_counts and not dashboard.auctions and not dashboard.names
+        assert not dashboard.listed_hour
+        dashboard.close()
+        conn.close()
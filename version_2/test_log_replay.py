@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+test_log_replay.py
+Raw and processed tracker logs are rebuilt into Socket.IO frames with dates from their session headers
+"""
+
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from log_replay import ENTRY_END, TRUNCATED_CHARS, LogReader, parse_sessions
+
+# Formatted mode logs the first 200 characters of a long frame
+LONG_PAYLOAD = '42["auction_update",[' + ','.join(
+    f'{{"id":{i},"auction_highest_bid":{i * 100},"auction_number_of_bids":1}}' for i in range(4, 20)) + ']]'
+
+RAW_LOG = f'''RAW SESSION STARTED: 2025-01-31 23:59:00
+[23:59:58.100] AUCTION_UPDATE: 42["auction_update",[{{"id":1,"auction_highest_bid":500}}]]
+{ENTRY_END}
+[23:59:59.200] DELETED_ITEM:
+[
+  "deleted_item",
+  [
+    2
+  ]
+]
+{ENTRY_END}
+[00:00:01.300] ═══════════════════════════════
+├─ ID: 3
+├─ Name: AWP | Asiimov (Field-Tested)
+├─ Wear: Field-Tested (0.25)
+│  ├─ Purchase: $1,234.56
+└──────────────────────────────
+[00:00:02.400] AUCTION_UPDATE: {LONG_PAYLOAD[:TRUNCATED_CHARS]}...
+{ENTRY_END}
+[00:00:03.500] AUCTION_UPDATE: 42["auction_update",[{{"id":5
+RAW SESSION STARTED: 2025-02-01 10:00:00
+[10:00:00.000] AUCTION_UPDATE: 42["auction_update",[{{"id":6}}]]
+{ENTRY_END}
+'''
+
+PROCESSED_LOG = '''SESSION STARTED: 2025-02-01 10:00:00
+[10:00:01] 📦 AWP | Asiimov (Field-Tested) - $12.34 (ID: 7)
+[10:00:02] ⚔️  AWP | Asiimov (Field-Tested): $13.00 by #99 (2 bids)
+[10:00:03] ⚔️  Unknown Skin: $1.00 by #98 (1 bids)
+[10:00:04] 🔨 AWP | Asiimov (Field-Tested) - SOLD [ID: 7]
+'''
+
+
+def read(text, sessions=None):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tracker.log')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        reader = LogReader(path, sessions)
+        frames = list(reader)
+    return reader, frames
+
+
+def events(frames):
+    return [json.loads(frame.payload[2:]) for _, frame, _ in frames]
+
+
+def test_raw_log_entries_and_midnight():
+    """Full, pretty-printed, boxed and truncated entries become frames; times cross midnight"""
+    reader, frames = read(RAW_LOG)
+    truncated = frames.pop(3)[1].payload
+    cut = LONG_PAYLOAD[:TRUNCATED_CHARS]
+    assert truncated == cut[:cut.rfind(',')]
+    first, deleted, box, later = events(frames)
+    assert first == ['auction_update', [{'id': 1, 'auction_highest_bid': 500}]]
+    assert deleted == ['deleted_item', [2]]
+    assert box == ['new_item', [{'id': 3, 'market_name': 'AWP | Asiimov (Field-Tested)',
+                                 'wear_name': 'Field-Tested', 'wear': 0.25, 'purchase_price': 123456}]]
+    assert later[1] == [{'id': 6}]
+
+    times = [frame.ts_ms for _, frame, _ in frames]
+    assert times[2] == int(datetime(2025, 2, 1, 0, 0, 1, 300000).timestamp() * 1000)
+    assert [number for number, _, _ in frames] == [1, 1, 1, 2]
+    # The entry cut off by the next session header is lost
+    assert (reader.entries, reader.frames, reader.truncated, reader.lost) == (5, 5, 2, 1)
+    assert len({key for _, _, key in frames}) == 4
+
+
+def test_session_filter_and_stable_keys():
+    """Only the wanted sessions are read, with the same frame keys as a full read"""
+    _, every = read(RAW_LOG)
+    _, second = read(RAW_LOG, parse_sessions('2'))
+    assert [key for _, _, key in second] == [every[-1][2]]
+    assert list(parse_sessions('2:3')) == [2, 3]
+
+
+def test_processed_log_lines():
+    """tracker.log lines rebuild new items, bids of named items and removals"""
+    reader, frames = read(PROCESSED_LOG)
+    assert events(frames) == [
+        ['new_item', [{'id': 7, 'market_name': 'AWP | Asiimov (Field-Tested)', 'market_value': 1234}]],
+        ['auction_update', [{'id': 7, 'auction_highest_bid': 1300, 'auction_highest_bidder': 99,
+                             'auction_number_of_bids': 2}]],
+        ['deleted_item', [7]],
+    ]
+    assert reader.lost == 1, "a bid on a name never listed this session"
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+test_log_sketch.py
+Log-bucketed sketches read quantiles back within SKETCH_ERROR and merge by adding counts
+"""
+
+import random
+
+from log_sketch import SKETCH_ERROR, LogSketch, bucket_of, bucket_value, quantiles_of
+
+
+def test_buckets_bound_the_relative_error():
+    """Every value is within SKETCH_ERROR of its bucket's value; values under 1 share bucket 0"""
+    assert bucket_of(0) == bucket_of(0.5) == 0
+    assert bucket_value(0) == 0.0
+    for value in (1, 1.5, 59, 3600, 86400 * 30, 123456789):
+        bucket = bucket_of(value)
+        assert bucket >= 1
+        assert abs(bucket_value(bucket) - value) <= SKETCH_ERROR * value + 1e-9, value
+    assert bucket_of(100) < bucket_of(103)
+
+
+def test_quantiles_match_exact_ones():
+    """p50/p90/p99 of a sketch are within SKETCH_ERROR of the sorted values' (plus rank rounding)"""
+    rng = random.Random(1)
+    values = [rng.lognormvariate(8, 1.5) for _ in range(5000)]
+    sketch = LogSketch()
+    for value in values:
+        sketch.add(value)
+    ordered = sorted(values)
+    for q, estimate in zip((0.5, 0.9, 0.99), sketch.quantiles((0.5, 0.9, 0.99))):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(estimate - exact) <= 2 * SKETCH_ERROR * exact, (q, estimate, exact)
+
+
+def test_merge_and_json_round_trip():
+    """Merging equals adding every value to one sketch; to_json/from_json keep the counts"""
+    low, high, both = LogSketch(), LogSketch(), LogSketch()
+    for value in range(1, 500):
+        (low if value < 250 else high).add(value)
+        both.add(value)
+    low.merge(high)
+    assert low.counts == both.counts and low.total == both.total == 499
+    restored = LogSketch.from_json(low.to_json())
+    assert restored.counts == low.counts and restored.total == 499
+
+
+def test_empty_sketch_has_no_quantiles():
+    assert quantiles_of({}, (0.5, 0.99)) == (0, [None, None])
+    assert LogSketch().quantiles((0.5,)) == [None]
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+test_migrations.py
+Upgrades reach the latest version, resume after an interruption, and rebuild bidder stats exactly
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import migrations
+from frames import Record
+from index_advisor import TARGETS, generate_database
+from schema import set_watermark
+from storage import SQLiteBackend
+
+QUIET = lambda message: None
+
+# Set from the clock while upgrading, not from the data
+WALL_CLOCK = {'first_seen', 'last_seen'}
+
+BIDDER_COLUMNS = 'bidder_id, total_bids, total_spent, auctions_won, times_outbid'
+
+
+def v1_database(path, rows=300):
+    """A version 1 monitor database filled with synthetic rows"""
+    schema, _ = TARGETS['v1 csgoempire_monitor.db']
+    generate_database(schema, path, rows).close()
+
+
+def upgrade(path, steps=None, chunk_rows=50):
+    """Upgrade, then run `steps` backfill chunks (all when None); returns the pending backfills"""
+    conn = sqlite3.connect(path)
+    pending = migrations.upgrade(conn, log=QUIET)
+    while pending and steps != 0:
+        if migrations.backfill_step(conn, chunk_rows)[1] is None:
+            break
+        steps = steps - 1 if steps is not None else None
+    pending = migrations.pending_backfills(conn.cursor())
+    conn.close()
+    return pending
+
+
+def dump(path):
+    """Every table's rows, in a comparable form (without wall-clock columns)"""
+    conn = sqlite3.connect(path)
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        " AND name != 'retention_state' ORDER BY name")]
+    rows = {}
+    for table in tables:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] not in WALL_CLOCK]
+        rows[table] = sorted(conn.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall(), key=repr)
+    version = migrations.get_version(conn.cursor())
+    conn.close()
+    return version, rows
+
+
+def bid(auction_id, bidder, amount, count, ts_ms):
+    return Record('auction_update', ts_ms, {
+        'auction_id': auction_id, 'highest_bid': amount, 'highest_bidder': bidder,
+        'number_of_bids': count, 'above_recommended_price': None, 'ends_at': None,
+    })
+
+
+def sold(item_id, ts_ms):
+    return Record('deleted_item', ts_ms, {'item_id': item_id})
+
+
+def test_upgrade_resumes_after_interruption():
+    """A v1 database upgraded in two sessions ends up identical to one upgraded at once"""
+    with tempfile.TemporaryDirectory() as directory:
+        once = os.path.join(directory, 'once.db')
+        twice = os.path.join(directory, 'twice.db')
+        v1_database(once)
+        shutil.copy(once, twice)
+
+        assert upgrade(once) == []
+        assert upgrade(twice, steps=3), "expected backfills left after 3 chunks"
+        assert upgrade(twice) == []
+
+        version, rows = dump(once)
+        assert version == migrations.LATEST
+        assert rows['auction_updates'] and rows['bidders']
+        assert (version, rows) == dump(twice)
+
+
+def test_bidder_rebuild_keeps_live_bids():
+    """Bids stored while the rebuild runs count once, as if no rebuild had happened"""
+    history = [bid(100 + n, 1 + n % 3, 10 * (n + 1), 1, 1000 + n) for n in range(30)]
+    history += [bid(100 + n, 4, 10 * (n + 1) + 5, 2, 2000 + n) for n in range(0, 30, 2)]
+    history += [sold(100 + n, 3000 + n) for n in range(0, 30, 3)]
+    live = [bid(100 + n, 5, 999, 3, 4000 + n) for n in range(1, 30, 4)]
+    live += [sold(100 + n, 5000 + n) for n in range(1, 30, 4)] + [bid(200, 6, 50, 1, 6000)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        expected = os.path.join(directory, 'expected.db')
+        rebuilt = os.path.join(directory, 'rebuilt.db')
+        for path in (expected, rebuilt):
+            upgrade(path)
+            storage = SQLiteBackend(path)
+            storage.write(history)
+            storage.close()
+
+        # Live rows go through the tracker while the rebuild is half done
+        conn = sqlite3.connect(rebuilt)
+        conn.execute("UPDATE bidders SET total_bids = total_bids * 7, total_spent = 123")
+        set_watermark(conn.cursor(), migrations.PENDING_PREFIX + 'bidder_stats', 0)
+        conn.commit()
+        for path in (expected, rebuilt):
+            if path == rebuilt:
+                assert migrations.backfill_step(conn, chunk_rows=10)[1] == 'bidder_stats'
+                assert migrations.pending_backfills(conn.cursor()) == ['bidder_stats']
+            storage = SQLiteBackend(path)
+            storage.write(live)
+            storage.close()
+        migrations.backfill_all(conn, chunk_rows=10)
+        conn.close()
+
+        result = {}
+        for path in (expected, rebuilt):
+            conn = sqlite3.connect(path)
+            result[path] = conn.execute(f"SELECT {BIDDER_COLUMNS} FROM bidders ORDER BY bidder_id").fetchall()
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            conn.close()
+            assert 'bidders_rebuild' not in tables and 'bidders_baseline' not in tables
+        assert result[rebuilt] == result[expected], result
+
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+test_price_index.py
+The price index observes listing price changes and auction sales once, and resumes from its checkpoint
+"""
+
+import sqlite3
+
+from dimensions import DimensionCache
+from price_index import PriceIndex, refresh
+from schema import create_schema
+
+NAME = 'AK-47 | Redline'
+
+
+def connect():
+    conn = sqlite3.connect(':memory:')
+    create_schema(conn.cursor())
+    return conn
+
+
+def snapshot(conn, item_id, price, ts_ms, wear='Field-Tested'):
+    cursor = conn.cursor()
+    keys = DimensionCache(cursor).resolve_row(cursor, {'market_name': NAME, 'wear_name': wear})
+    cursor.execute('''
+        INSERT INTO item_snapshots (item_id, snapshot_time_ms, market_name_id, wear_name_id, purchase_price)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (item_id, ts_ms, keys['market_name_id'], keys['wear_name_id'], price))
+    conn.commit()
+
+
+def sale(conn, item_id, price, ts_ms):
+    conn.execute("INSERT INTO deleted_items (item_id, deleted_at_ms, sale_type, final_bid_amount) "
+                 "VALUES (?, ?, 'auction_sold', ?)", (item_id, ts_ms, price))
+    conn.commit()
+
+
+def test_advance_counts_price_changes_and_sales():
+    """A repeated snapshot at the same price is not a new listing; an auction sale is an observation"""
+    conn = connect()
+    snapshot(conn, 1, 1000, 1000)
+    snapshot(conn, 1, 1000, 2000)
+    snapshot(conn, 1, 1200, 3000)
+    snapshot(conn, 2, 1100, 4000, wear='Minimal Wear')
+    sale(conn, 1, 1300, 5000)
+
+    index = PriceIndex()
+    assert index.advance(conn) == 5
+    assert index.advance(conn) == 0
+    field_tested = index.quote(NAME, 'Field-Tested')
+    assert field_tested.observations == 3 and field_tested.last_ms == 5000
+    assert 1000 <= field_tested.low <= field_tested.median <= field_tested.high <= 1320
+    assert index.quote(NAME).observations == 4
+    assert index.quote(NAME, 'Battle-Scarred') is None
+
+
+def test_checkpoint_resumes_and_never_goes_back():
+    """load() continues from the checkpoint; an older in-memory index cannot overwrite a newer one"""
+    conn = connect()
+    snapshot(conn, 1, 1000, 1000)
+    stale = PriceIndex.load(conn)
+    stale.advance(conn)
+
+    snapshot(conn, 2, 2000, 2000)
+    index, folded = refresh(conn)
+    assert folded == 2 and index.quote(NAME, 'Field-Tested').observations == 2
+
+    snapshot(conn, 3, 3000, 3000)
+    resumed, folded = refresh(conn)
+    assert folded == 1 and resumed.quote(NAME, 'Field-Tested').observations == 3
+
+    assert stale.checkpoint(conn) is False
+    assert PriceIndex.load(conn).quote(NAME, 'Field-Tested').observations == 3
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+test_query_plans.py
+Fails if a hot-path query (per message / per dashboard refresh) regresses to a full table scan
+"""
+
+from index_advisor import TARGETS, check_target, hot_path_table_scans
+
+# Enough rows for the planner to prefer indexes, small enough to run in seconds
+ROWS = 2000
+
+
+def test_queries_are_collected():
+    """The collector still finds the storage backend's and dedup's per-record queries"""
+    queries = check_target('v2 csgoempire_monitor.db', ROWS)
+    functions = {q.function for q in queries if not q.skipped}
+    assert '_write_deleted_item' in functions
+    assert 'is_duplicate' in functions
+    assert not [q for q in queries if q.error], [q.error for q in queries if q.error]
+
+
+def test_deleted_item_searches_by_auction_id():
+    """Deleted-item classification looks up auction_updates by index, not by scan"""
+    queries = check_target('v2 csgoempire_monitor.db', ROWS)
+    lookups = [q for q in queries if q.function == '_write_deleted_item' and 'WHERE auction_id' in q.sql]
+    assert lookups
+    for query in lookups:
+        assert any(detail.startswith('SEARCH') for detail in query.plan), query.plan
+
+
+def test_no_hot_path_table_scans():
+    """No hot-path query in any schema does a full table scan"""
+    for target in TARGETS:
+        regressions = hot_path_table_scans(check_target(target, ROWS))
+        assert not regressions, [f"{q.location}: {q.plan}" for q in regressions]
+
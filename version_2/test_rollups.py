@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+test_rollups.py
+The version 1 dashboard rollups fold every items / auction_updates row once, in chunks, from their watermarks
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'version 1'))
+
+import rollups  # noqa: E402
+
+MINUTE = rollups.MINUTE_MS
+NOW = 1_700_000_000_000 // MINUTE * MINUTE
+
+# The columns of the version 1 monitor's tables that the rollups read
+V1_SCHEMA = '''
+CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, item_id INTEGER UNIQUE, market_name TEXT,
+                    published_at_ms INTEGER);
+CREATE TABLE auction_updates (id INTEGER PRIMARY KEY AUTOINCREMENT, auction_id INTEGER, highest_bid INTEGER,
+                              highest_bidder INTEGER, number_of_bids INTEGER, ends_at INTEGER, timestamp_ms INTEGER);
+'''
+
+
+def connect():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(V1_SCHEMA)
+    return conn
+
+
+def listing(conn, item_id, ts_ms):
+    # Relisting replaces the row (new id), like the monitor's INSERT OR REPLACE
+    conn.execute("INSERT OR REPLACE INTO items (item_id, market_name, published_at_ms) VALUES (?, ?, ?)",
+                 (item_id, f"Item {item_id}", ts_ms))
+
+
+def update(conn, auction_id, bid, bids, ts_ms, bidder=7):
+    conn.execute("INSERT INTO auction_updates (auction_id, highest_bid, highest_bidder, number_of_bids, "
+                 "ends_at, timestamp_ms) VALUES (?, ?, ?, ?, ?, ?)", (auction_id, bid, bidder, bids, 99, ts_ms))
+
+
+def test_refresh_folds_each_row_once(monkeypatch):
+    """Chunked refreshes count every row once; a relisted item is one distinct item"""
+    monkeypatch.setattr(rollups, 'REFRESH_CHUNK_ROWS', 2)
+    conn = connect()
+    for item_id in (1, 2, 3):
+        listing(conn, item_id, NOW - 5 * MINUTE)
+    for n, (auction_id, bid, bids) in enumerate([(1, 100, 1), (1, 150, 2), (2, 10, 1), (1, 140, 2), (3, 5, 1)]):
+        update(conn, auction_id, bid, bids, NOW - (4 - n) * MINUTE, bidder=n)
+    conn.commit()
+
+    assert rollups.refresh(conn, NOW) == 8
+    assert rollups.refresh(conn, NOW) == 0
+    listing(conn, 2, NOW - MINUTE)
+    conn.commit()
+    assert rollups.refresh(conn, NOW) == 1
+
+    cursor = conn.cursor()
+    assert rollups.total(cursor, 'auction_updates') == 5
+    assert rollups.total(cursor, 'items') == 3
+    assert rollups.count_since(cursor, 'new_item', NOW - 10 * MINUTE) == 4
+    assert rollups.count_since(cursor, 'auction_update', NOW - 2 * MINUTE) == 3
+    # Bid and count never go down; the leader is the latest update's
+    assert conn.execute("SELECT updates, highest_bid, number_of_bids, highest_bidder FROM rollup_auctions "
+                        "WHERE auction_id = 1").fetchone() == (3, 150, 2, 3)
+
+
+def test_active_auctions_window():
+    """Active auctions are ranked by updates in the window; per-auction minutes past the keep window are dropped"""
+    conn = connect()
+    for item_id in (1, 2):
+        listing(conn, item_id, NOW - 300 * MINUTE)
+    update(conn, 1, 100, 1, NOW - 200 * MINUTE)
+    for n in range(3):
+        update(conn, 2, 10 + n, 1 + n, NOW - (3 - n) * MINUTE)
+    update(conn, 1, 120, 2, NOW - MINUTE)
+    conn.commit()
+    rollups.refresh(conn, NOW)
+
+    cursor = conn.cursor()
+    active = rollups.active_auctions(cursor, NOW - 10 * MINUTE, 5)
+    assert [(name, auction_id, updates) for name, auction_id, updates, *_ in active] == [
+        ('Item 2', 2, 3), ('Item 1', 1, 1)]
+    assert rollups.active_auction_count(cursor, NOW - 10 * MINUTE) == 2
+    oldest = conn.execute("SELECT MIN(minute_ms) FROM rollup_auction_minutes").fetchone()[0]
+    assert oldest >= NOW - rollups.ROLLUP_KEEP_MINUTES * MINUTE
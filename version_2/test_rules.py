@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+test_rules.py
+Rules are rejected when they cannot match, and only run for their event and category
+"""
+
+import pytest
+
+from frames import Record
+from rules import CallbackSink, RuleEngine, compile_rule
+
+
+def new_item(item_id, category='Weapon', **fields):
+    data = {'item_id': item_id, 'market_name': f'Item {item_id}', 'category': category,
+            'purchase_price': 1000, 'auction_number_of_bids': 0, 'auction_ends_at': None}
+    data.update(fields)
+    return Record('new_item', 1_700_000_000_000, data)
+
+
+@pytest.mark.parametrize('spec', [
+    {'event': 'deleted_item'},
+    {'event': 'new_item', 'when': [['no_such_field', '==', 1]]},
+    {'event': 'new_item', 'when': [['purchase_price', '~', 1]]},
+    {'event': 'new_item', 'when': [['purchase_price', '<', '1000']]},
+    {'event': 'new_item', 'when': [['purchase_price', 'contains', '1']]},
+    {'event': 'new_item', 'when': [['market_name', 'in', 'AWP']]},
+    {'event': 'new_item', 'when': [['market_name', 'in', ['AWP', 5]]]},
+    {'event': 'new_item', 'when': [['purchase_price', '<']]},
+])
+def test_rules_that_cannot_match_are_rejected(spec):
+    with pytest.raises(ValueError):
+        compile_rule({'name': 'bad', **spec})
+
+
+def test_conditions_and_category_index():
+    """All conditions must hold; a rule with a category never sees other categories; once alerts once"""
+    rules = [
+        compile_rule({'name': 'cheap knife', 'event': 'new_item', 'category': 'Knife',
+                      'when': [['purchase_price', '<', 5000], ['market_name', 'contains', 'item']]}),
+        compile_rule({'name': 'any cheap', 'event': 'new_item', 'category': None,
+                      'when': [['purchase_price', '<=', 1000]]}),
+        compile_rule({'name': 'unbid', 'event': 'new_item', 'category': ['Knife', 'Gloves'], 'once': False,
+                      'when': [['auction_number_of_bids', '==', 0]]}),
+    ]
+    alerts = []
+    engine = RuleEngine(rules, [CallbackSink(alerts.append)])
+
+    assert [a['rule'] for a in engine.evaluate(new_item(1, 'Knife'))] == ['cheap knife', 'unbid', 'any cheap']
+    assert [a['rule'] for a in engine.evaluate(new_item(1, 'Knife'))] == ['unbid']
+    assert [a['rule'] for a in engine.evaluate(new_item(2, 'Weapon', purchase_price=2000))] == []
+    assert [a['rule'] for a in engine.evaluate(new_item(3, 'Gloves', purchase_price=None))] == ['unbid']
+    assert len(alerts) == 5 and engine.evaluated == 4
+
+
+def test_auction_update_gets_its_item_category():
+    """An auction_update is matched with the name and category remembered from its new_item"""
+    engine = RuleEngine([compile_rule({'name': 'knife bid', 'event': 'auction_update', 'category': 'Knife',
+                                       'when': [['number_of_bids', '>=', 1]]})])
+    update = Record('auction_update', 1_700_000_000_000, {'auction_id': 9, 'number_of_bids': 1})
+    assert engine.evaluate(update) == []
+    engine.evaluate(new_item(9, 'Knife'))
+    update = Record('auction_update', 1_700_000_000_000, {'auction_id': 9, 'number_of_bids': 2})
+    alerts = engine.evaluate(update)
+    assert [a['market_name'] for a in alerts] == ['Item 9']
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+test_watchlist.py
+Watchlist entries are keyed by normalized name or class, bisected by price and reloaded when the file changes
+"""
+
+import json
+import os
+import tempfile
+
+import pytest
+
+from frames import Record
+from watchlist import WatchIndex, Watchlist
+
+
+def item(item_id, market_name, price, **fields):
+    data = {'item_id': item_id, 'market_name': market_name, 'purchase_price': price,
+            'wear_name': None, 'wear': None, 'sub_type': None, 'rarity': None}
+    data.update(fields)
+    return data
+
+
+def labels(index, data):
+    return sorted(entry.label for entry in index.matches(data, data['purchase_price']))
+
+
+def test_names_normalized_and_wear_suffix_is_a_condition():
+    """Case, '™' and spacing are ignored; '(Field-Tested)' in an entry only matches that wear"""
+    index = WatchIndex([
+        {'market_name': 'StatTrak™ AK-47 | Redline', 'max_price': 2000, 'label': 'any wear'},
+        {'market_name': 'stattrak ak-47  |  redline (Field-Tested)', 'max_price': 1500, 'label': 'ft'},
+    ])
+    name = 'StatTrak™ AK-47 | Redline (Field-Tested)'
+    assert labels(index, item(1, name, 1400, wear_name='Field-Tested')) == ['any wear', 'ft']
+    assert labels(index, item(2, 'StatTrak™ AK-47 | Redline (Minimal Wear)', 1400,
+                              wear_name='Minimal Wear')) == ['any wear']
+
+
+def test_bisect_only_reaches_entries_above_the_price():
+    """Only entries whose max_price the item is under match; a class entry may name only a rarity"""
+    index = WatchIndex([{'market_name': 'AWP | Asiimov', 'max_price': cents, 'label': str(cents)}
+                        for cents in (500, 1000, 1500, 2000)]
+                       + [{'rarity': 'Covert', 'label': 'covert', 'max_wear': 0.2}])
+    assert labels(index, item(1, 'AWP | Asiimov', 1000)) == ['1000', '1500', '2000']
+    assert labels(index, item(2, 'AWP | Asiimov', 2001)) == []
+    covert = item(3, 'M4A4 | Howl', 99999, sub_type='Rifle', rarity='covert', wear=0.15)
+    assert labels(index, covert) == ['covert']
+    assert labels(index, {**covert, 'wear': 0.3}) == []
+
+
+@pytest.mark.parametrize('spec', [
+    'AWP',
+    {'max_price': 100},
+    {'market_name': 'AWP', 'max_price': '100'},
+    {'market_name': 7},
+    {'rarity': ['Covert']},
+    {'market_name': 'AWP', 'wear_name': 1},
+])
+def test_bad_entries_are_rejected_with_their_number(spec):
+    with pytest.raises(ValueError, match='Entry 2'):
+        WatchIndex([{'market_name': 'AWP'}, spec])
+
+
+def test_reload_swaps_the_index_and_keeps_it_on_errors():
+    """A changed file is picked up; a broken one is reported once and the previous entries stay"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'watchlist.json')
+
+        def write(content, mtime):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content if isinstance(content, str) else json.dumps(content))
+            os.utime(path, ns=(mtime, mtime))
+
+        write([{'market_name': 'AWP | Asiimov', 'max_price': 1000}], 1_000_000_000)
+        errors = []
+        watchlist = Watchlist(path, on_error=lambda source, e: errors.append(e))
+        record = Record('new_item', 1_700_000_000_000, item(1, 'AWP | Asiimov', 900))
+        assert len(watchlist.match(record)) == 1
+        assert watchlist.match(record) == [], "one alert per entry and item"
+
+        write('[{"market_name": ', 2_000_000_000)
+        assert not watchlist.reload()
+        assert not watchlist.reload()
+        assert len(errors) == 1 and watchlist.index.size == 1
+
+        write([{'market_name': 'AWP | Asiimov', 'max_price': 800}], 3_000_000_000)
+        assert watchlist.reload() and watchlist.reloads == 2
+        assert watchlist.match(Record('new_item', 1_700_000_000_000, item(2, 'AWP | Asiimov', 900))) == []
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Epoch Timestamps
+All time columns are stored as integer milliseconds since the Unix epoch (UTC)
+"""
+
+import time
+from datetime import datetime, timezone
+
+# Text (or seconds) column -> integer epoch-ms column, for every schema that
+# has shared csgoempire_monitor.db / csgoempire.db / csgoempire_enhanced.db.
+# Only pairs whose table and source column exist are touched; bidders exists in
+# both layouts but only the version 2 writer maintains the *_ms columns.
+EPOCH_MS_COLUMNS = [
+    # Version 2 (GUI)
+    ('items', 'first_seen', 'first_seen_ms'),
+    ('items', 'last_seen', 'last_seen_ms'),
+    ('items', 'deleted_at', 'deleted_at_ms'),
+    ('item_snapshots', 'snapshot_time', 'snapshot_time_ms'),
+    ('item_snapshots', 'published_at', 'published_at_ms'),
+    ('auction_updates', 'update_time', 'update_time_ms'),
+    ('bidders', 'first_seen', 'first_seen_ms', 'highest_bid'),
+    ('bidders', 'last_seen', 'last_seen_ms', 'highest_bid'),
+    ('deleted_items', 'deleted_at', 'deleted_at_ms'),
+    # Version 1 (monitors and importers)
+    ('items', 'published_at', 'published_at_ms'),
+    ('auction_updates', 'timestamp', 'timestamp_ms'),
+    ('item_listings', 'timestamp', 'timestamp_ms'),
+    ('item_deletions', 'timestamp', 'timestamp_ms'),
+    ('seller_status', 'timestamp', 'timestamp_ms'),
+]
+
+
+# Indexes for the time-window queries (dashboard.py, query_database.py, GUI)
+# (name, table, columns) - created only when every column exists
+EPOCH_MS_INDEXES = [
+    ('idx_snapshots_time_ms', 'item_snapshots', ['snapshot_time_ms']),
+    ('idx_snapshots_item_time', 'item_snapshots', ['item_id', 'snapshot_time_ms']),
+    ('idx_auction_updates_time_ms', 'auction_updates', ['update_time_ms', 'auction_id']),
+    ('idx_deleted_items_time_ms', 'deleted_items', ['deleted_at_ms']),
+    # Covers "active auctions in the last N minutes" without touching the table
+    ('idx_auction_updates_timestamp_ms', 'auction_updates',
+     ['timestamp_ms', 'auction_id', 'highest_bid', 'number_of_bids']),
+    ('idx_items_published_at_ms', 'items', ['published_at_ms']),
+    ('idx_item_listings_timestamp_ms', 'item_listings', ['timestamp_ms']),
+    ('idx_item_deletions_timestamp_ms', 'item_deletions', ['timestamp_ms']),
+]
+
+# Text-time indexes superseded by the ones above
+SUPERSEDED_INDEXES = [
+    'idx_snapshots_time',
+    'idx_snapshots_item_id',
+    'idx_auction_updates_time',
+    'idx_auction_updates_timestamp',
+]
+
+
+def epoch_ms_columns(columns_of):
+    """Yield (table, source, target) pairs that apply to a database
+
+    columns_of(table) returns the existing column names of a table.
+    """
+    for table, source, target, *requires in EPOCH_MS_COLUMNS:
+        columns = columns_of(table)
+        if source in columns and all(column in columns for column in requires):
+            yield table, source, target
+
+
+def now_ms():
+    """Current time in epoch milliseconds"""
+    return int(time.time() * 1000)
+
+
+def to_epoch_ms(value):
+    """Convert any timestamp format used by the monitors to epoch milliseconds
+
+    Accepts epoch seconds/milliseconds, SQLite CURRENT_TIMESTAMP text, ISO 8601
+    (published_at) and the capture format "... (chrome_ts=...)". Naive text is UTC.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        # Seconds (e.g. auction_ends_at) vs milliseconds (extension exports)
+        return int(round(value * 1000)) if value < 1e11 else int(value)
+
+    text = str(value).split(' (', 1)[0].strip()
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    text = text.replace('T', ' ', 1)
+
+    # fromisoformat only takes 3 or 6 fractional digits before Python 3.11
+    if '.' in text:
+        head, rest = text.split('.', 1)
+        digits = ''
+        while rest and rest[0].isdigit():
+            digits, rest = digits + rest[0], rest[1:]
+        text = f"{head}.{digits[:6].ljust(6, '0')}{rest}"
+
+    dt = datetime.fromisoformat(text)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(round(dt.timestamp() * 1000))
+
+
+def epoch_ms_sql(column):
+    """SQL expression converting a text/seconds column to epoch ms (for backfills)"""
+    text = f"substr({column}, 1, instr({column} || ' (', ' (') - 1)"
+    return (
+        f"CASE WHEN typeof({column}) IN ('integer', 'real') "
+        f"THEN CAST(ROUND({column} * 1000) AS INTEGER) "
+        f"ELSE CAST(ROUND((julianday({text}) - 2440587.5) * 86400000) AS INTEGER) END"
+    )
+
+
+def format_ms(ms, fmt='%Y-%m-%d %H:%M:%S'):
+    """Format epoch ms as local time for display"""
+    if ms is None:
+        return ''
+    return datetime.fromtimestamp(ms / 1000).strftime(fmt)
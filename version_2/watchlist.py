@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Watchlist
+Alerts when a new item matches a watched skin or class under its price and wear thresholds
+
+A watchlist file is a JSON list of entries; prices are in cents, like the
+records:
+
+    [{"market_name": "AK-47 | Redline (Field-Tested)", "max_price": 1500},
+     {"market_name": "AWP | Asiimov", "max_price": 9000, "max_wear": 0.25},
+     {"sub_type": "Bayonet", "rarity": "Covert", "max_price": 30000, "label": "Cheap bayonets"}]
+
+An entry watches either a market_name or a (sub_type, rarity) class from
+item_search (one of the two may be left out). Names are normalized -
+case, '™' and spacing are ignored, and a wear suffix such as
+'(Field-Tested)' becomes a wear_name condition, so 'AWP | Asiimov' covers
+every wear. Optional conditions: wear_name (one or a list), min_wear,
+max_wear (float).
+
+Entries are indexed by key (normalized name, or class) in a dict; each key
+holds its entries sorted by max_price, so a new_item costs four hash
+lookups and one bisect however long the list is - only entries whose
+max_price the item is under are looked at. The file is re-read when it
+changes (checked every RELOAD_SECONDS); a broken file keeps the previous
+list. Latency (frame received -> matched) of the last LATENCY_SAMPLES
+items is kept for metrics(). Alerts use the sinks of rules.py.
+
+    python watchlist.py watchlist.json SOURCE [SOURCE ...] [--sink file:alerts.jsonl]   # ingest.py sources
+    python watchlist.py --check watchlist.json
+"""
+
+import bisect
+import json
+import os
+import re
+import sys
+import time
+from collections import deque, namedtuple
+
+from frames import decode_frame
+from rules import CallbackSink, format_alert, open_alert_sink, replay_frames
+
+# Seconds between checks of the file's modification time
+RELOAD_SECONDS = 1.0
+
+# Match latencies kept for the percentiles
+LATENCY_SAMPLES = 10000
+
+# (entry, item) pairs already alerted - a listing's repeated new_item frames alert once
+ALERT_MEMORY = 100000
+
+WEAR_NAMES = ('Factory New', 'Minimal Wear', 'Field-Tested', 'Well-Worn', 'Battle-Scarred')
+WEAR_SUFFIX_RE = re.compile(r'\s*\((' + '|'.join(WEAR_NAMES) + r')\)\s*$', re.I)
+
+# label, max_price (inf = any), wear_names (casefolded frozenset or None), min_wear, max_wear
+WatchEntry = namedtuple('WatchEntry', 'label max_price wear_names min_wear max_wear')
+
+
+def normalize(text):
+    """Lookup form of a name or class value"""
+    return ' '.join(text.replace('™', '').casefold().split()) if text else None
+
+
+def split_wear(market_name):
+    """(normalized name without the wear suffix, wear_name or None)"""
+    match = WEAR_SUFFIX_RE.search(market_name)
+    if not match:
+        return normalize(market_name), None
+    return normalize(market_name[:match.start()]), match.group(1)
+
+
+def _entry(spec, number):
+    """(index key, WatchEntry) of one watchlist-file entry"""
+    where = f"Entry {number}"
+    if not isinstance(spec, dict):
+        raise ValueError(f"{where}: expected an object, got {spec!r}")
+    for field in ('market_name', 'sub_type', 'rarity', 'label'):
+        value = spec.get(field)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{where}: {field} must be a string, got {value!r}")
+    wear_names = spec.get('wear_name')
+    if isinstance(wear_names, str):
+        wear_names = [wear_names]
+    if wear_names is not None and not (isinstance(wear_names, list)
+                                       and all(isinstance(wear, str) for wear in wear_names)):
+        raise ValueError(f"{where}: wear_name must be a string or a list of strings, got {spec['wear_name']!r}")
+    if spec.get('market_name'):
+        name, suffix_wear = split_wear(spec['market_name'])
+        if suffix_wear:
+            wear_names = (wear_names or []) + [suffix_wear]
+        key = ('name', name)
+        label = spec['market_name']
+    elif spec.get('sub_type') or spec.get('rarity'):
+        key = ('class', normalize(spec.get('sub_type')), normalize(spec.get('rarity')))
+        label = ' '.join(value for value in (spec.get('sub_type'), spec.get('rarity')) if value)
+    else:
+        raise ValueError(f"{where}: needs a market_name, or a sub_type and/or rarity")
+
+    values = {}
+    for field in ('max_price', 'min_wear', 'max_wear'):
+        value = spec.get(field)
+        if value is not None and not isinstance(value, (int, float)):
+            raise ValueError(f"{where}: {field} must be a number, got {value!r}")
+        values[field] = value
+    max_price = values['max_price'] if values['max_price'] is not None else float('inf')
+    return key, WatchEntry(
+        spec.get('label') or label,
+        max_price,
+        frozenset(normalize(wear) for wear in wear_names) if wear_names else None,
+        values['min_wear'],
+        values['max_wear'],
+    )
+
+
+class WatchIndex:
+    """Entries by key, each key's entries sorted by max_price (with a parallel threshold array)"""
+
+    def __init__(self, specs):
+        grouped = {}
+        for number, spec in enumerate(specs, 1):
+            key, entry = _entry(spec, number)
+            grouped.setdefault(key, []).append(entry)
+        self.keys = {}          # key -> (thresholds, entries), both ascending by max_price
+        for key, entries in grouped.items():
+            entries.sort(key=lambda entry: entry.max_price)
+            self.keys[key] = ([entry.max_price for entry in entries], entries)
+        self.size = sum(len(entries) for entries in grouped.values())
+
+    def matches(self, data, price):
+        """Entries a new_item record satisfies"""
+        sub_type, rarity = normalize(data.get('sub_type')), normalize(data.get('rarity'))
+        keys = [('name', split_wear(data['market_name'])[0] if data.get('market_name') else None),
+                ('class', sub_type, rarity)]
+        if sub_type and rarity:
+            # Entries that name only one of the two
+            keys += [('class', sub_type, None), ('class', None, rarity)]
+        wear_name, wear = normalize(data.get('wear_name')), data.get('wear')
+        found = []
+        for key in keys:
+            bucket = self.keys.get(key)
+            if bucket is None:
+                continue
+            thresholds, entries = bucket
+            # Entries with max_price >= price
+            for entry in entries[bisect.bisect_left(thresholds, price):]:
+                if entry.wear_names is not None and wear_name not in entry.wear_names:
+                    continue
+                if entry.min_wear is not None and (wear is None or wear < entry.min_wear):
+                    continue
+                if entry.max_wear is not None and (wear is None or wear > entry.max_wear):
+                    continue
+                found.append(entry)
+        return found
+
+
+def load_watchlist(path):
+    """WatchIndex of a watchlist file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        specs = json.load(f)
+    if not isinstance(specs, list):
+        raise ValueError(f"{path}: expected a JSON list of entries")
+    return WatchIndex(specs)
+
+
+class Watchlist:
+    """Matches new_item records against a watchlist file, reloaded when it changes
+
+    Not thread-safe: feed it from one thread (the capture thread).
+    """
+
+    def __init__(self, path, sinks=(), on_error=None, on_reload=None):
+        self.path = path
+        self.sinks = list(sinks)
+        self.on_error = on_error        # (source, exception): a sink, or the watchlist itself for a bad file
+        self.on_reload = on_reload      # (WatchIndex) after every successful (re)load
+        self.mtime = None
+        self.next_check = 0.0
+        self.index = WatchIndex([])
+        self.alerted = {}               # (label, item_id) -> True
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.checked = 0
+        self.matched = 0
+        self.reloads = 0
+        self.reload_errors = 0
+        self.failing = False
+        self.reload()
+
+    def reload(self):
+        """Re-read the file if it changed; the current index stays on any error"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self.mtime:
+                return False
+            self.mtime = mtime
+            # Built aside and swapped in one assignment
+            self.index = load_watchlist(self.path)
+        except Exception as e:
+            # Reported once until the next successful load (a missing file fails every check)
+            if not self.failing and self.on_error:
+                self.on_error(self, e)
+            self.failing = True
+            self.reload_errors += 1
+            return False
+        self.failing = False
+        self.reloads += 1
+        if self.on_reload:
+            self.on_reload(self.index)
+        return True
+
+    def match(self, record, received=None):
+        """Alerts (dicts) raised by one record; received: time.perf_counter() when its frame arrived"""
+        started = time.perf_counter() if received is None else received
+        if record.kind != 'new_item':
+            return []
+        if started >= self.next_check:
+            self.next_check = started + RELOAD_SECONDS
+            self.reload()
+        data = record.data
+        price = data.get('purchase_price') or data.get('market_value')
+        if price is None:
+            return []
+        found = self.index.matches(data, price)
+        item_id = data['item_id']
+        fresh = []
+        for entry in found:
+            if (entry.label, item_id) not in self.alerted:
+                self.alerted[(entry.label, item_id)] = True
+                if len(self.alerted) > ALERT_MEMORY:
+                    del self.alerted[next(iter(self.alerted))]
+                fresh.append(entry)
+        elapsed = time.perf_counter() - started
+        self.latencies.append(elapsed)
+        self.checked += 1
+        if not fresh:
+            return []
+
+        self.matched += len(fresh)
+        alerts = [{
+            'rule': f"Watch: {entry.label}",
+            'event': 'new_item',
+            'item_id': item_id,
+            'market_name': data.get('market_name'),
+            'price': price,
+            'max_price': entry.max_price if entry.max_price != float('inf') else None,
+            'received_ms': record.ts_ms,
+            'latency_us': round(elapsed * 1e6, 1),
+            'data': data,
+        } for entry in fresh]
+        for alert in alerts:
+            for sink in self.sinks:
+                try:
+                    sink.send(alert)
+                except Exception as e:
+                    if self.on_error:
+                        self.on_error(sink, e)
+        return alerts
+
+    def match_frame(self, frame, received=None):
+        """Decode a frame and match its records; returns the alerts"""
+        received = time.perf_counter() if received is None else received
+        alerts = []
+        for record in decode_frame(frame):
+            alerts += self.match(record, received)
+        return alerts
+
+    def metrics(self):
+        """Counters and latency percentiles (µs) of the recent matches"""
+        ordered = sorted(self.latencies)
+
+        def percentile(q):
+            return ordered[int(q * (len(ordered) - 1))] * 1e6 if ordered else None
+        return {
+            'entries': self.index.size,
+            'keys': len(self.index.keys),
+            'checked': self.checked,
+            'matched': self.matched,
+            'reloads': self.reloads,
+            'reload_errors': self.reload_errors,
+            'p50_us': percentile(0.5),
+            'p99_us': percentile(0.99),
+            'max_us': ordered[-1] * 1e6 if ordered else None,
+        }
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def format_metrics(metrics):
+    if metrics['p50_us'] is None:
+        latency = "no items yet"
+    else:
+        latency = f"p50 {metrics['p50_us']:.1f} µs, p99 {metrics['p99_us']:.1f} µs, max {metrics['max_us']:.1f} µs"
+    return (f"{metrics['checked']:,} item(s) checked against {metrics['entries']:,} entries "
+            f"({metrics['keys']:,} keys): {metrics['matched']:,} match(es), {latency}")
+
+
+if __name__ == "__main__":
+    # Fix encoding
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    args = sys.argv[1:]
+    if args[:1] == ['--check']:
+        if len(args) < 2:
+            print("ERROR - --check needs a watchlist file")
+            sys.exit(1)
+        try:
+            index = load_watchlist(args[1])
+        except Exception as e:
+            print(f"✗ {args[1]}: {e}")
+            sys.exit(1)
+        print(f"✓ {index.size:,} entries under {len(index.keys):,} keys")
+        sys.exit(0)
+
+    sink_specs = []
+    while '--sink' in args:
+        index = args.index('--sink')
+        if index + 1 >= len(args):
+            print("ERROR - --sink needs a value")
+            sys.exit(1)
+        sink_specs.append(args[index + 1])
+        del args[index:index + 2]
+    if len(args) < 2:
+        print("Usage: python watchlist.py watchlist.json SOURCE [SOURCE ...] [--sink file:PATH|unix:PATH|http://...]\n"
+              "       python watchlist.py --check watchlist.json")
+        sys.exit(1)
+    if not os.path.exists(args[0]):
+        print(f"ERROR - Watchlist not found: {args[0]}")
+        sys.exit(1)
+
+    try:
+        report_error = lambda source, e: print(f"✗ {type(source).__name__} error: {e}")
+        sinks = [CallbackSink(lambda alert: print(format_alert(alert)))]
+        sinks += [open_alert_sink(spec, report_error) for spec in sink_specs]
+        watchlist = Watchlist(args[0], sinks, on_error=report_error,
+                              on_reload=lambda index: print(f"✓ Watchlist loaded: {index.size:,} entries"))
+        started = time.time()
+        try:
+            for frame in replay_frames(args[1:]):
+                watchlist.match_frame(frame)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watchlist.close()
+        print(f"✓ {format_metrics(watchlist.metrics())} in {time.time() - started:.1f}s (decode included)")
+    except Exception as e:
+        print(f"✗ Watchlist failed: {e}")
+        sys.exit(1)